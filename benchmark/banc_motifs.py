@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai du noyau de motifs (validation/motifs.py).
+
+Compare, sur les valeurs du générateur et sur des cas limites (saut de ligne
+final, espaces ASCII rares, chiffres et espaces Unicode, valeurs vides ou
+nulles), le noyau vectorisé à la référence : str.match avec le module `re`
+puis diagnostic Python de regles.py sur les valeurs non conformes. Masques et
+types d'erreur doivent être identiques pour chaque type de colonne (objets
+Python, chaînes Arrow, catégories).
+
+Rapporte aussi la durée des deux chemins ; le banc échoue au moindre écart.
+Les modules de la validation doivent être importables :
+
+    PYTHONPATH=../validation python banc_motifs.py --lignes 1e6
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from generer_donnees import personne
+from motifs import chiffres_seuls, verifier, verifier_regex
+from regles import (
+    DIAGNOSTICS_MOTIF, REGEX_DOSSIER_MEDICAL, REGEX_EMAIL, REGEX_NON_CHIFFRE, REGEX_PHONE_FR, REGEX_POSTAL_FR,
+    compiler_regex,
+)
+from typage import TYPE_TEXTE
+
+CAS_LIMITES = {
+    'telephone': ["01 23 45 67 89\n", "0123456789\n\n", "01\x0b23 45 67 89", "01\x1c23456789", "01 23 45 67 89 ",
+                  " 0123456789", "0033123456789", "00330123456789", "+33 1 23 45 67 89", "+330123456789",
+                  "01  23456789", "0 123456789", "01 2 345 6789", "０1 23 45 67 89", "01 23 45 67 8٩",
+                  "01 23 45 67 89", "", "+", "0", "01 23 45 67 89 00"],
+    'email': ["a@b.fr\n", "a@b.fr\n\n", "a@.fr", "@b.fr", "a@b.f", "a@b..fr", "a@b.fr1", "a@b-c.fr", "a@@b.fr",
+              "a.b.fr", "a b@c.fr", "é@b.fr", "a@b.fré", "a@b\n.fr", "", "a@b.c.d.fr", "a+b%c@d.fr"],
+    'code_postal': ["75 001", "75-001", "7500١", "٣5001", "75001\n", "", "0", "1234567", "A75001"],
+    'numero_dossier_medical': ["MRN-12345", "MRN-12345\n", "MRN-1234", "mrn-12345", "MRN-1234a", "MRN-١2345",
+                               "MRN12345", "", "MRN-123456"],
+}
+
+REGEX = {
+    'telephone': REGEX_PHONE_FR,
+    'email': REGEX_EMAIL,
+    'code_postal': REGEX_POSTAL_FR,
+    'numero_dossier_medical': REGEX_DOSSIER_MEDICAL,
+}
+
+
+def dossiers_medicaux(rng, n, taux):
+    """MRN-12345 ; 1 nul, 2 préfixe invalide, 3 longueur invalide."""
+    erreur = np.where(rng.random(n) < 3 * taux, rng.integers(1, 4, n), 0)
+    valeurs = "MRN-" + pd.Series(rng.integers(10000, 100000, n)).astype(str)
+    valeurs = valeurs.where(erreur != 2, valeurs.str.replace("MRN-", "MRN", regex=False))
+    valeurs = valeurs.where(erreur != 3, valeurs.str[:-1])
+    return valeurs.astype(object).where(erreur != 1, None)
+
+
+def corpus(lignes, taux, graine):
+    """{colonne: valeurs (objets Python)} : valeurs générées puis cas limites."""
+    rng = np.random.default_rng(graine)
+    colonnes, _ = personne(rng, lignes, taux, 2025)
+    colonnes['numero_dossier_medical'] = dossiers_medicaux(rng, lignes, taux)
+    return {nom: list(pd.Series(colonnes[nom], dtype=object)) + CAS_LIMITES[nom] for nom in REGEX}
+
+
+def ancien(valeurs, regex, nettoyer):
+    """Chemin pandas d'origine : nettoyage, str.match puis diagnostic des valeurs non conformes."""
+    if nettoyer:
+        if isinstance(valeurs.dtype, pd.CategoricalDtype):
+            valeurs = valeurs.astype(object)
+        valeurs = valeurs.fillna('').astype(str).str.replace(REGEX_NON_CHIFFRE, '', regex=True)
+    masque = valeurs.str.match(compiler_regex(regex), na=False)
+    echec = ~masque.to_numpy(dtype=bool) & valeurs.notna().to_numpy()
+    if echec.any():
+        DIAGNOSTICS_MOTIF[regex](valeurs[echec].astype(str))
+    return masque
+
+
+def nouveau(valeurs, regex, nettoyer):
+    return verifier(chiffres_seuls(valeurs) if nettoyer else valeurs, regex)
+
+
+def comparer(nom, valeurs, type_colonne):
+    """Écarts du noyau à la référence `re` : [(valeur, attendu, obtenu)]."""
+    regex, nettoyer = REGEX[nom], nom == 'code_postal'
+    if nettoyer:
+        valeurs_ref = [compiler_regex(REGEX_NON_CHIFFRE).sub('', v) if isinstance(v, str) else '' for v in valeurs]
+    else:
+        valeurs_ref = valeurs
+    masque_ref, erreurs_ref = verifier_regex(valeurs_ref, regex)
+    masque, erreurs = nouveau(pd.Series(valeurs, dtype=type_colonne), regex, nettoyer)
+    ecarts = np.flatnonzero((masque != masque_ref) | (erreurs != erreurs_ref))
+    return [(valeurs[i], (masque_ref[i], erreurs_ref[i]), (masque[i], erreurs[i])) for i in ecarts]
+
+
+def chronometrer(fonction, *args, repetitions=3):
+    meilleur = float('inf')
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction(*args)
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai du noyau de motifs (téléphone, e-mail, code postal, dossier médical)")
+    parser.add_argument("--lignes", type=float, default=1e6, help="Valeurs générées par colonne")
+    parser.add_argument("--taux", type=float, default=0.02, help="Taux de chaque type d'erreur injecté")
+    parser.add_argument("--graine", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("=" * 70)
+    print("🏁 BANC D'ESSAI DU NOYAU DE MOTIFS")
+    print("=" * 70)
+    valeurs = corpus(int(args.lignes), args.taux, args.graine)
+    types = {'objet': object, 'arrow': TYPE_TEXTE, 'catégorie': 'category'}
+
+    print("\n🔍 JUSTESSE (référence : module re et diagnostics de regles.py)")
+    ecarts = 0
+    for nom in REGEX:
+        for libelle, type_colonne in types.items():
+            differences = comparer(nom, valeurs[nom], type_colonne)
+            ecarts += len(differences)
+            etat = "✓" if not differences else "❌"
+            print(f"  {etat} {nom:24} {libelle:10} : {len(valeurs[nom]):,} valeurs, {len(differences)} écart(s)")
+            for valeur, attendu, obtenu in differences[:5]:
+                print(f"      {valeur!r} : attendu {attendu}, obtenu {obtenu}")
+
+    print("\n⏱️  DURÉE (meilleure de 3, masque et types d'erreur)")
+    for nom in REGEX:
+        for libelle, type_colonne in (('objet', object), ('arrow', TYPE_TEXTE)):
+            serie = pd.Series(valeurs[nom], dtype=type_colonne)
+            nettoyer = nom == 'code_postal'
+            avant = chronometrer(ancien, serie, REGEX[nom], nettoyer)
+            apres = chronometrer(nouveau, serie, REGEX[nom], nettoyer)
+            print(f"  • {nom:24} {libelle:10} : pandas {avant:7.3f} s, noyau {apres:7.3f} s (×{avant / apres:.1f})")
+
+    if ecarts:
+        print(f"\n❌ ÉCHEC : {ecarts} écart(s) avec la référence")
+        return 1
+    print("\n✅ NOYAU IDENTIQUE À LA RÉFÉRENCE")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
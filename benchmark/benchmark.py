@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai de la validation (Couche 3) et du profiling (Couche 2).
+
+Pour chaque échelle, les tables *_raw sont générées (generer_donnees.py) dans
+une base locale, puis chaque mode de validation est exécuté dans un processus
+séparé. Le banc rapporte :
+
+    - le temps horloge et le débit (lignes validées par seconde),
+    - le pic de mémoire résidente du processus (wait4),
+    - le temps par étape (chargement, pilier) lu dans le profil d'exécution,
+    - la justesse : échecs de chaque règle comparés aux erreurs injectées.
+
+Les mesures sont comparées à la référence versionnée `baseline.json`
+(régénérée par `--update-baseline`) : le banc échoue si une règle diverge, si
+le temps ou la mémoire dépassent la référence de plus de `--tolerance`, ou si
+une mesure n'a pas de référence (sauf `--sans-reference`).
+
+Base locale : PostgreSQL embarqué (paquet `pgserver`) si disponible, sinon
+SQLite (backend SQL, mode incrémental et profiling indisponibles).
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+RACINE = Path(__file__).resolve().parent.parent
+GENERATEUR = Path(__file__).resolve().parent / "generer_donnees.py"
+VALIDATION = RACINE / "validation" / "validation.py"
+PROFILING = RACINE / "exploration" / "src" / "profiling.py"
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+
+# =========================
+# BASE LOCALE
+# =========================
+
+def base_locale(dossier):
+    """(URL SQLAlchemy, serveur) d'une base jetable : PostgreSQL embarqué, sinon SQLite (serveur None)."""
+    try:
+        import pgserver
+    except ImportError:
+        print("  ⚠️  pgserver non installé : base SQLite")
+        return f"sqlite:///{dossier / 'benchmark.db'}", None
+    # Répertoire de données propre au serveur, supprimé à son arrêt
+    serveur = pgserver.get_server(tempfile.mkdtemp(prefix="dq_pgdata_"), cleanup_mode="delete")
+    return serveur.get_uri().replace("postgresql://", "postgresql+psycopg2://", 1), serveur
+
+
+# =========================
+# EXÉCUTION MESURÉE
+# =========================
+
+def executer(commande, env, journal):
+    """Lance `commande` ; renvoie (code retour, durée en s, pic de mémoire en Mo)."""
+    debut = time.perf_counter()
+    with open(journal, 'w', encoding='utf-8') as sortie:
+        processus = subprocess.Popen(commande, env=env, stdout=sortie, stderr=subprocess.STDOUT)
+        # wait4 : ressources du processus et de ses enfants attendus (workers compris)
+        _, statut, ressources = os.wait4(processus.pid, 0)
+    duree = time.perf_counter() - debut
+    processus.returncode = os.waitstatus_to_exitcode(statut)
+    facteur = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss en Ko sous Linux
+    return processus.returncode, duree, ressources.ru_maxrss * facteur / 2 ** 20
+
+
+def generer(url, echelle, taux, dossier):
+    """Génère les tables dans un processus séparé ; renvoie le résultat de generer_donnees.generer.
+
+    Sous Linux, ru_maxrss est hérité à travers fork et exec : générées dans le banc,
+    les données gonfleraient le pic de mémoire de chaque exécution mesurée ensuite.
+    """
+    attendus = dossier / f"attendus_{echelle}.json"
+    sys.stdout.flush()
+    subprocess.run([sys.executable, str(GENERATEUR), "--database-url", url, "--echelle", str(echelle),
+                    "--taux", str(taux), "--attendus", str(attendus)], check=True)
+    return json.loads(attendus.read_text(encoding='utf-8'))
+
+
+def environnement(url, dossier, variables):
+    env = {
+        **os.environ,
+        'DATABASE_URL': url,
+        'RESULTS_DIR': str(dossier / "results"),
+        'REPORTS_DIR': str(dossier / "reports"),
+        'DATA_DIR': str(dossier / "data"),
+        'SNAPSHOT_DIR': '',
+        'HISTORY_DB': '0',
+        'PYTHONPATH': os.pathsep.join(filter(None, [str(RACINE / "commun"), os.environ.get('PYTHONPATH')])),
+        **variables,
+    }
+    (dossier / "data").mkdir(parents=True, exist_ok=True)
+    return env
+
+
+def verifier(resultats_dir, attendus):
+    """Règles dont les échecs diffèrent des erreurs injectées : [(règle, obtenu, attendu)]."""
+    metriques = pd.read_csv(resultats_dir / "validation_history.csv")
+    obtenus = {f"{l.table_name}.{l.rule_name}": int(l.checks_failed) for l in metriques.itertuples()}
+    return [(regle, obtenus.get(regle), n) for regle, n in attendus.items() if obtenus.get(regle) != n]
+
+
+def etapes(resultats_dir):
+    """Temps horloge par étape (chargement, requête SQL, pilier) lu dans le profil d'exécution."""
+    fichiers = sorted((resultats_dir / "run_profile").rglob("*.parquet"))
+    if not fichiers:
+        return {}
+    profil = pd.read_parquet(fichiers[-1])
+    profil = profil[profil['stage'].isin(['chargement', 'requete_sql', 'pilier'])]
+    noms = profil['stage'].where(profil['stage'] != 'pilier', 'pilier:' + profil['pilier'].fillna(''))
+    return profil.groupby(noms)['wall_s'].sum().round(3).to_dict()
+
+
+def mesurer_validation(url, mode, variables, dossier, lignes, attendus):
+    dossier.mkdir(parents=True)
+    env = environnement(url, dossier, variables)
+    code, duree, memoire = executer([sys.executable, str(VALIDATION)], env, dossier / "validation.log")
+    mesure = {'mode': mode, 'code': code, 'duree_s': round(duree, 2), 'memoire_mo': round(memoire, 1),
+              'debit_lignes_s': round(lignes / duree), 'etapes': {}, 'ecarts': []}
+    if code == 0:
+        mesure['etapes'] = etapes(dossier / "results")
+        mesure['ecarts'] = verifier(dossier / "results", attendus)
+    return mesure
+
+
+def mesurer_profiling(url, dossier, lignes):
+    dossier.mkdir(parents=True)
+    env = environnement(url, dossier, {'OUTPUT_PATH': str(dossier / "html")})
+    code, duree, memoire = executer([sys.executable, str(PROFILING), "--force"], env, dossier / "profiling.log")
+    return {'mode': 'profiling', 'code': code, 'duree_s': round(duree, 2), 'memoire_mo': round(memoire, 1),
+            'debit_lignes_s': round(lignes / duree), 'etapes': {}, 'ecarts': []}
+
+
+# =========================
+# RÉFÉRENCE
+# =========================
+
+def comparer(mesures, reference, tolerance):
+    """Régressions de temps ou de mémoire par rapport à la référence : liste de messages."""
+    regressions = []
+    for cle, mesure in mesures.items():
+        ref = reference.get(cle)
+        if ref is None:
+            regressions.append(f"{cle} : absent de la référence")
+            continue
+        for indicateur, libelle in (('duree_s', 'durée'), ('memoire_mo', 'mémoire')):
+            if mesure[indicateur] > ref[indicateur] * (1 + tolerance):
+                regressions.append(f"{cle} : {libelle} {mesure[indicateur]} > {ref[indicateur]} "
+                                   f"(+{mesure[indicateur] / ref[indicateur] - 1:.0%})")
+    return regressions
+
+
+def afficher(cle, mesure):
+    etat = "✓" if mesure['code'] == 0 and not mesure['ecarts'] else "❌"
+    print(f"  {etat} {cle:32} : {mesure['duree_s']:8.2f} s, {mesure['debit_lignes_s']:>10,} lignes/s, "
+          f"pic {mesure['memoire_mo']:,.0f} Mo")
+    for etape, duree in mesure['etapes'].items():
+        print(f"      {etape:28} {duree:8.3f} s")
+    for regle, obtenu, attendu in mesure['ecarts']:
+        print(f"      ❌ {regle} : {obtenu} échecs, {attendu} attendus")
+
+
+# Modes mesurés : variables d'environnement du service validation
+MODES = {
+    'memory': {'VALIDATION_MODE': 'memory'},
+    'streaming': {'VALIDATION_MODE': 'streaming'},
+    'parallel': {'VALIDATION_MODE': 'memory', 'VALIDATION_WORKERS': '4'},
+    'sql': {'VALIDATION_BACKEND': 'sql'},
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des pipelines de validation et de profiling")
+    parser.add_argument("--echelles", type=float, nargs="+", default=[1e5],
+                        help="Nombres totaux de lignes générées (ex. 1e5 1e6 1e7)")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=['memory', 'streaming'])
+    parser.add_argument("--profiling", action="store_true", help="Mesure aussi profiling.py (PostgreSQL uniquement)")
+    parser.add_argument("--database-url", help="Base à utiliser, dont les tables *_raw sont remplacées (défaut : base locale jetable)")
+    parser.add_argument("--taux", type=float, default=0.02, help="Taux de chaque type d'erreur injecté")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Enregistre les mesures comme référence")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Dépassement toléré de la référence")
+    parser.add_argument("--sans-reference", action="store_true",
+                        help="Mesures seules, sans comparaison à la référence (échelles ou machine non couvertes)")
+    parser.add_argument("--sortie", type=Path, help="Fichier JSON des mesures")
+    parser.add_argument("--garder", action="store_true", help="Conserve le dossier de travail (journaux, résultats)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    travail = Path(tempfile.mkdtemp(prefix="dq_benchmark_"))
+    print("=" * 70)
+    print("🏁 BANC D'ESSAI DES PIPELINES QUALITÉ")
+    print(f"📁 Dossier de travail : {travail}")
+    print("=" * 70)
+    url, serveur = (args.database_url, None) if args.database_url else base_locale(travail)
+    try:
+        postgres = create_engine(url).dialect.name == "postgresql"
+        mesures, ecarts = {}, 0
+        for echelle in map(int, args.echelles):
+            print(f"\n🧪 ÉCHELLE {echelle:,} LIGNES")
+            debut = time.perf_counter()
+            donnees = generer(url, echelle, args.taux, travail)
+            print(f"  ⏱️  Génération : {time.perf_counter() - debut:.1f} s")
+            lignes = sum(donnees['lignes'].values())
+
+            for mode in args.modes:
+                if mode == 'sql' and not postgres:
+                    print(f"  ⚠️  {mode} ignoré : PostgreSQL requis")
+                    continue
+                mesure = mesurer_validation(url, mode, MODES[mode], travail / f"{echelle}" / mode,
+                                            lignes, donnees['echecs_attendus'])
+                mesures[f"{mode}@{echelle}"] = mesure
+                afficher(f"{mode}@{echelle}", mesure)
+                ecarts += bool(mesure['ecarts']) or mesure['code'] != 0
+
+            if args.profiling and postgres:
+                mesure = mesurer_profiling(url, travail / f"{echelle}" / "profiling", lignes)
+                mesures[f"profiling@{echelle}"] = mesure
+                afficher(f"profiling@{echelle}", mesure)
+                ecarts += mesure['code'] != 0
+
+        machine = {'python': platform.python_version(), 'machine': platform.machine(),
+                   'processeurs': os.cpu_count(), 'base': create_engine(url).dialect.name}
+        if args.sortie:
+            args.sortie.write_text(json.dumps({'machine': machine, 'mesures': mesures}, indent=2,
+                                              ensure_ascii=False), encoding='utf-8')
+
+        print("\n📏 COMPARAISON À LA RÉFÉRENCE")
+        if args.update_baseline:
+            reference = json.loads(args.baseline.read_text(encoding='utf-8')) if args.baseline.exists() else {}
+            reference.update({'machine': machine, 'taux': args.taux, 'mesures': {**reference.get('mesures', {}), **{
+                cle: {'duree_s': m['duree_s'], 'memoire_mo': m['memoire_mo']}
+                for cle, m in mesures.items() if m['code'] == 0 and not m['ecarts']
+            }}})
+            args.baseline.write_text(json.dumps(reference, indent=2, ensure_ascii=False), encoding='utf-8')
+            print(f"  ✓ Référence enregistrée : {args.baseline}")
+            regressions = []
+        elif args.sans_reference:
+            print("  ⚠️  Comparaison désactivée (--sans-reference)")
+            regressions = []
+        elif args.baseline.exists():
+            reference = json.loads(args.baseline.read_text(encoding='utf-8'))
+            regressions = comparer(mesures, reference.get('mesures', {}), args.tolerance)
+            if reference.get('taux', args.taux) != args.taux:
+                regressions.insert(0, f"taux d'erreur {args.taux} différent de la référence ({reference['taux']})")
+            for regression in regressions:
+                print(f"  ❌ {regression}")
+            if not regressions:
+                print(f"  ✓ Aucune régression (tolérance {args.tolerance:.0%})")
+        else:
+            regressions = [f"pas de référence ({args.baseline}) : la créer avec --update-baseline "
+                           f"ou relancer avec --sans-reference"]
+            print(f"  ❌ {regressions[0]}")
+
+        if ecarts or regressions:
+            print(f"\n❌ ÉCHEC : {ecarts} exécution(s) en erreur ou incorrecte(s), {len(regressions)} régression(s)")
+            return 1
+        print("\n✅ BANC D'ESSAI TERMINÉ")
+        return 0
+    finally:
+        if serveur is not None:
+            serveur.cleanup()
+        if args.garder:
+            print(f"📁 Résultats conservés : {travail}")
+        else:
+            shutil.rmtree(travail, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Générateur de données hospitalières synthétiques pour le banc d'essai.
+
+Produit les cinq tables *_raw à l'échelle voulue (de 1e5 à 1e8 lignes au
+total), par blocs, avec des erreurs injectées à taux contrôlé pour chaque
+pilier : téléphones et e-mails mal formés, codes postaux invalides, valeurs
+hors domaine ou hors plage, âges incohérents, dates inversées, clés
+étrangères orphelines, clés en double.
+
+Chaque ligne générée porte, pour chaque règle du registre, un indicateur
+« en échec » : les doublons recopient la ligne et ses indicateurs. Le nombre
+d'échecs attendu par règle est ainsi exact et écrit dans un fichier JSON,
+comparé par le banc d'essai aux métriques de la validation.
+
+Cible : PostgreSQL (COPY, schéma de db-init/01_schema.sql) ou SQLite (to_sql).
+"""
+
+import argparse
+import io
+import json
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+RACINE = Path(__file__).resolve().parent.parent
+SCHEMA_SQL = RACINE / "db-init" / "01_schema.sql"
+
+# Répartition des lignes entre les tables (total = échelle)
+REPARTITION = {
+    'staff': 0.10,
+    'patients': 0.25,
+    'consultations': 0.50,
+    'staff_schedule': 0.14,
+    'services_weekly': 0.01,
+}
+TAILLE_BLOC = 500_000
+SEUIL_REMPLISSAGE_TELEPHONE = 0.7  # identique à validation/regles.py
+
+SERVICES = np.array(['emergency', 'surgery', 'general_medicine', 'ICU', 'cardiology', 'neurology', 'pediatrics'])
+ROLES = np.array(['doctor', 'nurse', 'nursing_assistant'])
+GENRES = np.array(['Male', 'Female', 'Other'])
+
+
+# =========================
+# OUTILS
+# =========================
+
+def categories(rng, n, taux, nombre):
+    """Catégorie d'erreur de chaque ligne : 0 = valide, 1..nombre = erreur (chacune au taux `taux`)."""
+    tirage = (rng.random(n) / taux).astype(np.int64) + 1
+    return np.where(tirage <= nombre, tirage, 0)
+
+
+def texte(prefixe, valeurs):
+    return prefixe + pd.Series(valeurs).astype(str)
+
+
+def chiffres(rng, n, largeur):
+    return pd.Series(rng.integers(0, 10 ** largeur, n)).astype(str).str.zfill(largeur)
+
+
+def dates(annees, rng):
+    mois = rng.integers(1, 13, len(annees))
+    jours = rng.integers(1, 29, len(annees))
+    return pd.to_datetime({'year': annees, 'month': mois, 'day': jours}).dt.strftime('%Y-%m-%d')
+
+
+def avec_nuls(serie, masque):
+    return serie.astype(object).where(~np.asarray(masque), None)
+
+
+class Bloc:
+    """Colonnes d'un bloc et indicateurs d'échec par règle, recopiés ensemble.
+
+    `cles_distinctes` : clés d'unicité distinctes et non nulles du bloc avant les copies
+    (les clés de base sont uniques par construction, d'un bloc à l'autre).
+    """
+
+    def __init__(self, colonnes, echecs, cles_distinctes=0):
+        self.df = pd.DataFrame(colonnes)
+        self.echecs = {regle: np.asarray(masque, dtype=bool) for regle, masque in echecs.items()}
+        self.cles_distinctes = int(cles_distinctes)
+
+    def dupliquer(self, positions, modifier=None):
+        """Ajoute une copie des lignes `positions` ; `modifier(copie)` peut en altérer les colonnes."""
+        copie = self.df.iloc[positions].copy()
+        if modifier is not None:
+            modifier(copie)
+        self.df = pd.concat([self.df, copie], ignore_index=True)
+        for regle, masque in self.echecs.items():
+            self.echecs[regle] = np.concatenate([masque, masque[positions]])
+
+
+# =========================
+# COLONNES PARTAGÉES (staff, patients)
+# =========================
+
+def personne(rng, n, taux, annee):
+    """Téléphone, e-mail, code postal, genre, âge et date de naissance, avec leurs échecs."""
+    tel = categories(rng, n, taux, 3)           # 1 nul, 2 préfixe invalide, 3 longueur invalide
+    telephone = ("0" + pd.Series(rng.integers(1, 10, n)).astype(str) + " "
+                 + chiffres(rng, n, 2) + " " + chiffres(rng, n, 2) + " "
+                 + chiffres(rng, n, 2) + " " + chiffres(rng, n, 2))
+    telephone = telephone.where(tel != 2, "+44 " + telephone.str[1:])
+    telephone = telephone.where(tel != 3, telephone.str[:11])
+    mail = categories(rng, n, taux, 3)          # 1 nul, 2 arobase manquante, 3 plusieurs arobases
+    email = texte("user", rng.integers(0, 10 ** 9, n)) + "@hopital.fr"
+    email = email.where(mail != 2, email.str.replace("@", ".", regex=False))
+    email = email.where(mail != 3, email.str.replace("@", "@@", regex=False))
+    cp = categories(rng, n, taux, 3)            # 1 nul, 2 commence par 0, 3 longueur invalide
+    code_postal = pd.Series(rng.integers(10000, 100000, n)).astype(str)
+    code_postal = code_postal.where(cp != 2, "0" + code_postal.str[1:])
+    code_postal = code_postal.where(cp != 3, code_postal.str[:4])
+    gen = categories(rng, n, taux, 2)           # 1 nul, 2 hors domaine
+    genre = pd.Series(rng.choice(GENRES, n)).where(gen != 2, "Unknown")
+    # Âge : 1 nul, 2 hors plage (cohérent avec la naissance), 3 incohérent, 4 naissance nulle
+    ag = categories(rng, n, taux, 4)
+    age = rng.integers(18, 76, n).astype(float)
+    age = np.where(ag == 2, rng.integers(76, 100, n), age)
+    naissance = annee - age.astype(np.int64) - np.where(ag == 3, 10, 0)
+    colonnes = {
+        'telephone': avec_nuls(telephone, tel == 1),
+        'email': avec_nuls(email, mail == 1),
+        'code_postal': avec_nuls(code_postal, cp == 1),
+        'genre': avec_nuls(genre, gen == 1),
+        'age': np.where(ag == 1, np.nan, age),
+        'date_naissance': avec_nuls(dates(naissance, rng), ag == 4),
+    }
+    echecs = {
+        'telephone_format_FR': tel >= 2,
+        'telephone_nul': tel == 1,  # remplissage (seuil), calculé sur le cumul
+        'email_format_rfc5322': mail >= 2,
+        'code_postal_5chiffres_sans0': cp >= 1,
+        'genre_in_allowed_values': gen >= 1,
+        'age_date_naissance_coherent': (ag == 1) | (ag >= 3),
+        'age_range_18_75': (ag == 1) | (ag == 2),
+    }
+    return colonnes, echecs
+
+
+def ajouter_cles(bloc, rng, taux, colonne_id):
+    """Doublons et identifiants nuls : lignes ajoutées, copies de lignes du bloc."""
+    n = len(bloc.df)
+    bloc.cles_distinctes = n
+    bloc.echecs[f'{colonne_id}_not_null'] = np.zeros(n, dtype=bool)
+    bloc.dupliquer(rng.choice(n, int((rng.random(n) < taux).sum())))
+    nuls = rng.choice(n, int((rng.random(n) < taux).sum()))
+
+    def vider(copie):
+        copie[colonne_id] = None
+    debut = len(bloc.df)
+    bloc.dupliquer(nuls, vider)
+    bloc.echecs[f'{colonne_id}_not_null'][debut:] = True
+
+
+# =========================
+# TABLES
+# =========================
+
+def staff(rng, debut, n, taux, contexte):
+    colonnes, echecs = personne(rng, n, taux, contexte['annee'])
+    role = categories(rng, n, taux, 2)          # 1 nul, 2 hors domaine
+    service = categories(rng, n, taux, 1)       # 1 hors domaine
+    colonnes.update({
+        'staff_id': texte("S", np.arange(debut, debut + n)),
+        'staff_name': "Agent",
+        'role': avec_nuls(pd.Series(rng.choice(ROLES, n)).where(role != 2, "intern"), role == 1),
+        'service': pd.Series(rng.choice(SERVICES, n)).where(service != 1, "unknown"),
+    })
+    echecs.update({'role_in_allowed_values': role >= 1, 'service_in_allowed_values': service >= 1})
+    bloc = Bloc(colonnes, echecs)
+    ajouter_cles(bloc, rng, taux, 'staff_id')
+    return bloc
+
+
+def patients(rng, debut, n, taux, contexte):
+    colonnes, echecs = personne(rng, n, taux, contexte['annee'])
+    echecs.pop('age_range_18_75')  # pas de règle de plage d'âge sur patients
+    satisfaction = categories(rng, n, taux, 2)  # 1 nul, 2 hors plage
+    service = categories(rng, n, taux, 1)
+    # Séjour : 1 départ nul (valide), 2 départ avant l'arrivée, 3 arrivée avant 2020, 4 arrivée nulle
+    sejour = categories(rng, n, taux, 4)
+    arrivee = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365, n), unit='D')
+    arrivee = arrivee.where(sejour != 3, arrivee - pd.Timedelta(days=8 * 365))
+    duree = pd.to_timedelta(rng.integers(0, 30, n), unit='D')
+    depart = np.where(sejour == 2, arrivee - duree - pd.Timedelta(days=1), arrivee + duree)
+    colonnes.update({
+        'patient_id': texte("P", np.arange(debut, debut + n)),
+        'name': "Patient",
+        'arrival_date': avec_nuls(pd.Series(arrivee.strftime('%Y-%m-%d')), sejour == 4),
+        'departure_date': avec_nuls(pd.Series(pd.DatetimeIndex(depart).strftime('%Y-%m-%d')), sejour == 1),
+        'service': pd.Series(rng.choice(SERVICES, n)).where(service != 1, "unknown"),
+        'satisfaction': np.where(satisfaction == 1, np.nan,
+                                 np.where(satisfaction == 2, 120.0, rng.integers(0, 101, n))),
+    })
+    echecs.update({
+        'satisfaction_range_0_100': satisfaction >= 1,
+        'service_in_allowed_values': service >= 1,
+        'departure_after_arrival': (sejour == 2) | (sejour == 4),
+        'arrival_date_since_2020': sejour >= 3,
+    })
+    bloc = Bloc(colonnes, echecs)
+    ajouter_cles(bloc, rng, taux, 'patient_id')
+    return bloc
+
+
+def consultations(rng, debut, n, taux, contexte):
+    """Clé (patient, date, heure) unique par construction : patient = i mod N, jour = i div N."""
+    n_patients, n_staff = contexte['patients'], contexte['staff']
+    i = np.arange(debut, debut + n)
+    date = categories(rng, n, taux, 1)          # 1 date nulle
+    patient = categories(rng, n, taux, 1)       # 1 orphelin
+    personnel = categories(rng, n, taux, 1)     # 1 orphelin
+    jour = pd.Timestamp('2021-01-01') + pd.to_timedelta(i // n_patients, unit='D')
+    bloc = Bloc({
+        'patientid': texte("P", i % n_patients).where(patient != 1, texte("X", i)),
+        'staffid': texte("S", rng.integers(0, n_staff, n)).where(personnel != 1, texte("X", i)),
+        'consultationdate': avec_nuls(pd.Series(jour.strftime('%Y-%m-%d')), date == 1),
+        'consultationtime': "08:00:00",
+        'description': "Consultation",
+    }, {
+        'consultationdate_not_null': date == 1,
+        'patientid_fk_valid': patient == 1,
+        'staffid_fk_valid': personnel == 1,
+    }, cles_distinctes=(date != 1).sum())
+    bloc.dupliquer(rng.choice(n, int((rng.random(n) < taux).sum())))
+    return bloc
+
+
+def staff_schedule(rng, debut, n, taux, contexte):
+    """Clé (semaine, staff_id) unique par construction : staff = i div 52, semaine = i mod 52 + 1."""
+    i = np.arange(debut, debut + n)
+    semaine = categories(rng, n, taux, 1)       # 1 semaine > 52
+    present = categories(rng, n, taux, 1)       # 1 valeur hors {0, 1}
+    bloc = Bloc({
+        'week': np.where(semaine == 1, 53 + i % 52, i % 52 + 1),
+        'staff_id': texte("S", i // 52),
+        'staff_name': "Agent",
+        'role': rng.choice(ROLES, n),
+        'service': rng.choice(SERVICES, n),
+        'present': np.where(present == 1, 2, rng.integers(0, 2, n)),
+    }, {
+        'week_range_1_52': semaine == 1,
+        'present_binary_valid': present == 1,
+    }, cles_distinctes=n)
+    bloc.dupliquer(rng.choice(n, int((rng.random(n) < taux).sum())))
+    return bloc
+
+
+def services_weekly(rng, debut, n, taux, contexte):
+    i = np.arange(debut, debut + n)
+    service = categories(rng, n, taux, 1)
+    lits = categories(rng, n, taux, 1)          # 1 lits disponibles négatifs
+    demandes = categories(rng, n, taux, 1)      # 1 admis + refusés > demandes
+    admis = rng.integers(0, 40, n)
+    refuses = rng.integers(0, 20, n)
+    return Bloc({
+        'week': i % 52 + 1,
+        'month': (i % 52) // 4 % 12 + 1,
+        'service': pd.Series(rng.choice(SERVICES, n)).where(service != 1, "unknown"),
+        'availablebeds': np.where(lits == 1, -rng.integers(1, 5, n), rng.integers(0, 50, n)),
+        'patientsrequest': np.where(demandes == 1, admis + refuses - 1, admis + refuses + rng.integers(0, 10, n)),
+        'patientsadmitted': admis,
+        'patientsrefused': refuses,
+        'event': "none",
+    }, {
+        'service_in_allowed_values': service == 1,
+        'availablebeds_non_negative': lits == 1,
+        'admitted_refused_le_requested': demandes == 1,
+    })
+
+
+GENERATEURS = {
+    'staff': staff,
+    'patients': patients,
+    'consultations': consultations,
+    'staff_schedule': staff_schedule,
+    'services_weekly': services_weekly,
+}
+
+# Règle d'unicité de chaque table : échecs = lignes - clés distinctes non nulles
+UNICITE = {
+    'staff': 'staff_id_unique',
+    'patients': 'patient_id_unique',
+    'consultations': 'patient_consultation_unique',
+    'staff_schedule': 'week_staff_id_combination_unique',
+}
+
+
+# =========================
+# ÉCRITURE
+# =========================
+
+def preparer_base(engine):
+    """PostgreSQL : crée le schéma si besoin et vide les tables *_raw."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.exec_driver_sql(SCHEMA_SQL.read_text(encoding='utf-8'))
+        conn.execute(text(f"TRUNCATE {', '.join(f'{t}_raw' for t in GENERATEURS)}"))
+
+
+def ecrire(engine, table, df, premier):
+    if engine.dialect.name == "postgresql":
+        tampon = io.StringIO()
+        df.to_csv(tampon, index=False, header=False)
+        tampon.seek(0)
+        with engine.begin() as conn:
+            conn.connection.cursor().copy_expert(
+                f"COPY {table} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", tampon)
+    else:
+        df.to_sql(table, engine, if_exists='replace' if premier else 'append', index=False)
+
+
+def generer(engine, echelle, taux=0.02, graine=42, annee=None, taille_bloc=TAILLE_BLOC):
+    """Génère les cinq tables ; renvoie les lignes par table et les échecs attendus par règle."""
+    annee = annee or datetime.now().year
+    tailles = {t: max(int(echelle * part), 52) for t, part in REPARTITION.items()}
+    contexte = {'annee': annee, **tailles}
+    preparer_base(engine)
+
+    lignes, attendus = {}, {}
+    for numero, (table, generateur) in enumerate(GENERATEURS.items()):
+        total, distinctes, echecs = 0, 0, {}
+        for debut in range(0, tailles[table], taille_bloc):
+            rng = np.random.default_rng([graine, numero, debut])
+            n = min(taille_bloc, tailles[table] - debut)
+            bloc = generateur(rng, debut, n, taux, contexte)
+            ecrire(engine, f"{table}_raw", bloc.df, debut == 0)
+            total += len(bloc.df)
+            distinctes += bloc.cles_distinctes
+            for regle, masque in bloc.echecs.items():
+                echecs[regle] = echecs.get(regle, 0) + int(masque.sum())
+        if table in UNICITE:
+            echecs[UNICITE[table]] = total - distinctes
+        if 'telephone_nul' in echecs:
+            remplis = total - echecs.pop('telephone_nul')
+            echecs['telephone_70pct_filled'] = total - max(int(total * SEUIL_REMPLISSAGE_TELEPHONE), remplis)
+        lignes[table] = total
+        attendus.update({f"{table}.{regle}": n for regle, n in echecs.items()})
+        print(f"  ✓ {table:20} : {total:,} lignes")
+    return {'echelle': echelle, 'taux': taux, 'graine': graine, 'annee': annee,
+            'lignes': lignes, 'echecs_attendus': attendus}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Génère les tables *_raw synthétiques")
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--echelle", type=float, default=1e5, help="Nombre total de lignes (ex. 1e6)")
+    parser.add_argument("--taux", type=float, default=0.02, help="Taux de chaque type d'erreur injecté")
+    parser.add_argument("--graine", type=int, default=42)
+    parser.add_argument("--attendus", type=Path, help="Fichier JSON des échecs attendus par règle")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"🧪 GÉNÉRATION DES DONNÉES SYNTHÉTIQUES ({int(args.echelle):,} lignes, erreurs à {args.taux:.1%})")
+    resultat = generer(create_engine(args.database_url), int(args.echelle), args.taux, args.graine)
+    if args.attendus:
+        args.attendus.write_text(json.dumps(resultat, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"  ✓ Échecs attendus : {args.attendus}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
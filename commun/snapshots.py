@@ -0,0 +1,104 @@
+"""
+Cache local d'instantanés Parquet des tables *_raw, partagé par le profiling
+(Couche 2) et la validation (Couche 3).
+
+Chaque table est extraite une fois dans un fichier Parquet nommé d'après une
+empreinte peu coûteuse (relfilenode + compteurs pg_stat : insertions, mises à
+jour, suppressions). Tant que l'empreinte ne change pas, les lectures se font
+en mémoire mappée avec projection de colonnes, sans aller-retour vers la base.
+Les instantanés périmés d'une table sont supprimés dès qu'un nouveau est écrit.
+
+Les compteurs pg_stat sont publiés à la fin des transactions (avec un délai
+d'au plus une seconde sous PostgreSQL 15+) : une écriture concurrente très
+récente peut ne pas encore être visible.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+TYPES_ARROW = {
+    'text': pa.string(),
+    'character varying': pa.string(),
+    'character': pa.string(),
+    'double precision': pa.float64(),
+    'real': pa.float64(),
+    'numeric': pa.float64(),
+    'integer': pa.int64(),
+    'smallint': pa.int64(),
+    'bigint': pa.int64(),
+    'boolean': pa.bool_(),
+    'date': pa.date32(),
+    'time without time zone': pa.time64('us'),
+    'timestamp without time zone': pa.timestamp('us'),
+}
+
+
+def empreinte_table(conn, table_name):
+    """Empreinte lue dans le catalogue uniquement (aucun parcours de la table)."""
+    ligne = conn.execute(text(
+        "SELECT c.relfilenode, s.n_tup_ins, s.n_tup_upd, s.n_tup_del "
+        "FROM pg_class c JOIN pg_stat_user_tables s ON s.relid = c.oid "
+        "WHERE c.relname = :table"
+    ), {'table': table_name}).one()
+    return hashlib.sha1(":".join(str(v) for v in ligne).encode()).hexdigest()[:16]
+
+
+def schema_arrow(conn, table_name):
+    colonnes = conn.execute(text(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_name = :table ORDER BY ordinal_position"
+    ), {'table': table_name})
+    return pa.schema([(nom, TYPES_ARROW.get(type_sql, pa.string())) for nom, type_sql in colonnes])
+
+
+def _extraire(engine, table_name, chemin, schema, taille_bloc):
+    """Copie la table dans `chemin` par blocs (curseur côté serveur), puis renommage atomique."""
+    temporaire = chemin.with_name(f".{chemin.name}.{os.getpid()}.tmp")
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=taille_bloc) as conn, \
+            pq.ParquetWriter(temporaire, schema) as writer:
+        for bloc in pd.read_sql(text(f"SELECT * FROM {table_name}"), conn, chunksize=taille_bloc):
+            for champ in schema:
+                if pa.types.is_floating(champ.type):
+                    bloc[champ.name] = pd.to_numeric(bloc[champ.name], errors='coerce')
+            writer.write_table(pa.Table.from_pandas(bloc, schema=schema, preserve_index=False))
+    os.replace(temporaire, chemin)
+
+
+def obtenir_snapshot(engine, table_name, dossier, taille_bloc=100_000):
+    """Chemin d'un instantané à jour de la table (extrait si nécessaire)."""
+    dossier = Path(dossier)
+    dossier.mkdir(parents=True, exist_ok=True)
+    with engine.connect() as conn:
+        empreinte = empreinte_table(conn, table_name)
+        chemin = dossier / f"{table_name}-{empreinte}.parquet"
+        if chemin.exists():
+            return chemin
+        schema = schema_arrow(conn, table_name)
+
+    print(f"  📸 Instantané {table_name} : extraction vers {chemin.name}")
+    _extraire(engine, table_name, chemin, schema, taille_bloc)
+
+    for perime in dossier.glob(f"{table_name}-*.parquet"):
+        if perime != chemin:
+            perime.unlink(missing_ok=True)
+    return chemin
+
+
+def lire_snapshot(engine, table_name, dossier, colonnes=None):
+    """Table complète depuis l'instantané (mémoire mappée, colonnes projetées)."""
+    chemin = obtenir_snapshot(engine, table_name, dossier)
+    return pq.read_table(chemin, columns=colonnes, memory_map=True).to_pandas()
+
+
+def iterer_snapshot(engine, table_name, dossier, colonnes=None, taille_bloc=100_000):
+    """Blocs de `taille_bloc` lignes lus depuis l'instantané."""
+    chemin = obtenir_snapshot(engine, table_name, dossier)
+    fichier = pq.ParquetFile(chemin, memory_map=True)
+    for batch in fichier.iter_batches(batch_size=taille_bloc, columns=colonnes):
+        yield batch.to_pandas()
@@ -66,6 +66,27 @@ CREATE TABLE IF NOT EXISTS services_weekly_raw (
     event TEXT
 );
 
+-- Notification à chaque modification d'une table *_raw (une par instruction,
+-- COPY compris) : le service de validation (validation/service.py) écoute ce
+-- canal et ne réévalue que les règles des tables modifiées.
+CREATE OR REPLACE FUNCTION notifier_modification_raw() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('dq_raw_changes', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER patients_raw_notifier AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON patients_raw FOR EACH STATEMENT EXECUTE FUNCTION notifier_modification_raw();
+CREATE OR REPLACE TRIGGER staff_raw_notifier AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON staff_raw FOR EACH STATEMENT EXECUTE FUNCTION notifier_modification_raw();
+CREATE OR REPLACE TRIGGER consultations_raw_notifier AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON consultations_raw FOR EACH STATEMENT EXECUTE FUNCTION notifier_modification_raw();
+CREATE OR REPLACE TRIGGER staff_schedule_raw_notifier AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON staff_schedule_raw FOR EACH STATEMENT EXECUTE FUNCTION notifier_modification_raw();
+CREATE OR REPLACE TRIGGER services_weekly_raw_notifier AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON services_weekly_raw FOR EACH STATEMENT EXECUTE FUNCTION notifier_modification_raw();
+
 -----------------------
 -- Tables de validation
 -----------------------
@@ -97,5 +118,124 @@ CREATE TABLE IF NOT EXISTS superset_validation_metrics (
     erreurs    TEXT
 );
 
+CREATE INDEX IF NOT EXISTS idx_validation_history_run_date ON validation_history (run_date);
+-- Dernière mesure d'une règle (export du catalogue, validation/catalogue.py)
+CREATE INDEX IF NOT EXISTS idx_validation_history_regle ON validation_history (table_name, column_name, pilier, rule_name, run_date);
+
+-----------------------
+-- Agrégats Superset (tenus à jour par validation/rollups.py)
+-----------------------
+
+CREATE TABLE IF NOT EXISTS validation_rollup_run_pilier (
+    run_date      TIMESTAMP     NOT NULL,
+    pilier        VARCHAR(50)   NOT NULL,
+    nb_regles     INTEGER       NOT NULL,
+    checks_passed BIGINT        NOT NULL,
+    checks_failed BIGINT        NOT NULL,
+    pct_succes    NUMERIC(6,2)  NOT NULL,
+    pct_moyen     NUMERIC(6,2)  NOT NULL,
+    PRIMARY KEY (run_date, pilier)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_run_pilier_pilier ON validation_rollup_run_pilier (pilier, run_date);
+
+CREATE TABLE IF NOT EXISTS validation_rollup_run_table (
+    run_date      TIMESTAMP     NOT NULL,
+    table_name    VARCHAR(100)  NOT NULL,
+    nb_regles     INTEGER       NOT NULL,
+    checks_passed BIGINT        NOT NULL,
+    checks_failed BIGINT        NOT NULL,
+    pct_succes    NUMERIC(6,2)  NOT NULL,
+    pct_moyen     NUMERIC(6,2)  NOT NULL,
+    PRIMARY KEY (run_date, table_name)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_run_table_table ON validation_rollup_run_table (table_name, run_date);
+
+CREATE TABLE IF NOT EXISTS validation_rollup_jour_regle (
+    jour          DATE          NOT NULL,
+    table_name    VARCHAR(100)  NOT NULL,
+    column_name   VARCHAR(200)  NOT NULL,
+    pilier        VARCHAR(50)   NOT NULL,
+    rule_name     VARCHAR(200)  NOT NULL,
+    nb_runs       INTEGER       NOT NULL,
+    checks_passed BIGINT        NOT NULL,
+    checks_failed BIGINT        NOT NULL,
+    pct_succes    NUMERIC(6,2)  NOT NULL,
+    pct_moyen     NUMERIC(6,2)  NOT NULL,
+    pct_min       NUMERIC(6,2)  NOT NULL,
+    PRIMARY KEY (jour, table_name, column_name, pilier, rule_name)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_jour_regle_pilier ON validation_rollup_jour_regle (pilier, jour);
+CREATE INDEX IF NOT EXISTS idx_rollup_jour_regle_table ON validation_rollup_jour_regle (table_name, jour);
+
+-----------------------
+-- Lignes en échec (échantillon par règle, alimenté par validation/echecs.py)
+-----------------------
+
+CREATE TABLE IF NOT EXISTS validation_failures (
+    id          BIGSERIAL     PRIMARY KEY,
+    run_date    TIMESTAMP     NOT NULL,
+    table_name  VARCHAR(100)  NOT NULL,
+    column_name VARCHAR(200)  NOT NULL,
+    pilier      VARCHAR(50)   NOT NULL,
+    rule_name   VARCHAR(200)  NOT NULL,
+    error_type  VARCHAR(200)  NOT NULL,
+    row_key     TEXT          NOT NULL,
+    row_values  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_failures_run_regle ON validation_failures (run_date, table_name, rule_name);
+CREATE INDEX IF NOT EXISTS idx_failures_cle ON validation_failures (table_name, row_key);
+
+CREATE TABLE IF NOT EXISTS validation_failure_counts (
+    run_date    TIMESTAMP     NOT NULL,
+    table_name  VARCHAR(100)  NOT NULL,
+    column_name VARCHAR(200)  NOT NULL,
+    pilier      VARCHAR(50)   NOT NULL,
+    rule_name   VARCHAR(200)  NOT NULL,
+    error_type  VARCHAR(200)  NOT NULL,
+    nb_lignes   BIGINT        NOT NULL,
+    PRIMARY KEY (run_date, table_name, column_name, pilier, rule_name, error_type)
+);
+CREATE INDEX IF NOT EXISTS idx_failure_counts_type ON validation_failure_counts (table_name, rule_name, run_date);
 
+-----------------------
+-- Profil d'exécution de la validation (validation/profil.py)
+-----------------------
 
+CREATE TABLE IF NOT EXISTS validation_run_profile (
+    id                BIGSERIAL     PRIMARY KEY,
+    run_date          TIMESTAMP     NOT NULL,
+    stage             VARCHAR(20)   NOT NULL,
+    table_name        VARCHAR(100),
+    column_name       VARCHAR(200),
+    pilier            VARCHAR(50),
+    rule_name         VARCHAR(200),
+    calls             INTEGER       NOT NULL,
+    wall_s            NUMERIC(12,4) NOT NULL,
+    cpu_s             NUMERIC(12,4) NOT NULL,
+    rows              BIGINT        NOT NULL,
+    peak_mem_delta_mb NUMERIC(10,1) NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_run_profile_stage ON validation_run_profile (run_date, stage);
+CREATE INDEX IF NOT EXISTS idx_run_profile_regle ON validation_run_profile (table_name, rule_name, run_date);
+
+-----------------------
+-- Dérives de qualité par règle (validation/derive.py)
+-----------------------
+
+CREATE TABLE IF NOT EXISTS validation_drift (
+    run_date      TIMESTAMP     NOT NULL,
+    table_name    VARCHAR(100)  NOT NULL,
+    column_name   VARCHAR(200)  NOT NULL,
+    pilier        VARCHAR(50)   NOT NULL,
+    rule_name     VARCHAR(200)  NOT NULL,
+    success_rate  NUMERIC(6,2)  NOT NULL,
+    ewma_mean     NUMERIC(8,4),
+    ewma_std      NUMERIC(8,4),
+    baseline_mean NUMERIC(8,4),
+    baseline_std  NUMERIC(8,4),
+    z_score       NUMERIC(12,4),
+    cusum         NUMERIC(12,4) NOT NULL,
+    alert         VARCHAR(20),
+    PRIMARY KEY (run_date, table_name, column_name, pilier, rule_name)
+);
+CREATE INDEX IF NOT EXISTS idx_drift_alert ON validation_drift (alert, run_date) WHERE alert IS NOT NULL;
@@ -1,4 +1,8 @@
 -- 02_load_data.sql : chargement des CSV dans les 7 tables
+--
+-- Les tables *_raw peuvent aussi être rechargées sans ce script par la
+-- validation (VALIDATION_MODE=ingest, validation/ingestion.py) : mêmes
+-- fichiers, COPY parallèle et métriques calculées pendant le chargement.
 
 -------------------------
 -- 1) tables *_raw
@@ -184,4 +188,42 @@ SELECT
     failed_raw::bigint,
     REPLACE(pct_succes_raw, '%', '')::NUMERIC,
     erreurs
-FROM superset_validation_metrics_raw;
\ No newline at end of file
+FROM superset_validation_metrics_raw;
+
+
+-----------------------------------
+-- 4) Agrégats Superset
+-----------------------------------
+
+-- Reconstruction complète depuis l'historique chargé ci-dessus ; les
+-- exécutions suivantes ne recalculent que leur run et leur jour
+-- (validation/rollups.py).
+
+TRUNCATE TABLE validation_rollup_run_pilier, validation_rollup_run_table, validation_rollup_jour_regle;
+
+INSERT INTO validation_rollup_run_pilier
+    (run_date, pilier, nb_regles, checks_passed, checks_failed, pct_succes, pct_moyen)
+SELECT run_date, pilier, COUNT(*), SUM(checks_passed), SUM(checks_failed),
+       ROUND(COALESCE(100.0 * SUM(checks_passed) / NULLIF(SUM(checks_passed + checks_failed), 0), 0), 2),
+       ROUND(AVG(success_rate), 2)
+FROM validation_history
+GROUP BY run_date, pilier;
+
+INSERT INTO validation_rollup_run_table
+    (run_date, table_name, nb_regles, checks_passed, checks_failed, pct_succes, pct_moyen)
+SELECT run_date, table_name, COUNT(*), SUM(checks_passed), SUM(checks_failed),
+       ROUND(COALESCE(100.0 * SUM(checks_passed) / NULLIF(SUM(checks_passed + checks_failed), 0), 0), 2),
+       ROUND(AVG(success_rate), 2)
+FROM validation_history
+GROUP BY run_date, table_name;
+
+INSERT INTO validation_rollup_jour_regle
+    (jour, table_name, column_name, pilier, rule_name,
+     nb_runs, checks_passed, checks_failed, pct_succes, pct_moyen, pct_min)
+SELECT run_date::date, table_name, column_name, pilier, rule_name,
+       COUNT(*), SUM(checks_passed), SUM(checks_failed),
+       ROUND(COALESCE(100.0 * SUM(checks_passed) / NULLIF(SUM(checks_passed + checks_failed), 0), 0), 2),
+       ROUND(AVG(success_rate), 2),
+       MIN(success_rate)
+FROM validation_history
+GROUP BY run_date::date, table_name, column_name, pilier, rule_name;
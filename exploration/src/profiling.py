@@ -1,8 +1,21 @@
+import argparse
+import json
 import os
+import pickle
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from ydata_profiling import ProfileReport
+from ydata_profiling.config import Settings
+from ydata_profiling.model.summarizer import ProfilingSummarizer
+from ydata_profiling.model.typeset import ProfilingTypeSet
+
+from esquisses import KLL, CountMin, HyperLogLog, hacher_valeurs
+from snapshots import empreinte_table, iterer_snapshot, lire_snapshot
 
 
 # =========================
@@ -16,6 +29,24 @@ DATABASE_URL = os.getenv(
 
 OUTPUT_PATH = os.getenv("OUTPUT_PATH", "/exploration/html")
 
+# Cache d'instantanés Parquet partagé avec la validation (vide = lecture directe dans PostgreSQL)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "")
+
+# Échantillonnage : "none" (table complète), "tablesample" (TABLESAMPLE BERNOULLI dans
+# PostgreSQL) ou "reservoir" (tirage uniforme en un parcours, compatible avec SNAPSHOT_DIR)
+PROFILE_SAMPLE_METHOD = os.getenv("PROFILE_SAMPLE_METHOD", "none")
+PROFILE_SAMPLE_ROWS = int(os.getenv("PROFILE_SAMPLE_ROWS", "100000"))
+PROFILE_SAMPLE_SEED = int(os.getenv("PROFILE_SAMPLE_SEED", "42"))
+CHUNK_SIZE = 100_000
+
+# Esquisses de la table complète (commun/esquisses.py) calculées pendant l'échantillonnage :
+# distinctes (HyperLogLog), quantiles des colonnes numériques (KLL), valeurs fréquentes (Count-Min)
+PROFILE_SKETCHES = os.getenv("PROFILE_SKETCHES", "0") == "1"
+SKETCH_QUANTILES = (0.01, 0.25, 0.5, 0.75, 0.99)
+
+# Nombre de tables profilées en parallèle (un processus par table)
+PROFILE_WORKERS = int(os.getenv("PROFILE_WORKERS", "1"))
+
 TABLES_TO_PROFILE = [
     "patients_raw",
     "staff_raw",
@@ -24,6 +55,163 @@ TABLES_TO_PROFILE = [
     "services_weekly_raw"
 ]
 
+# Types sans MIN/MAX dans PostgreSQL
+UNORDERED_TYPES = {"boolean", "json", "jsonb", "bytea", "ARRAY", "USER-DEFINED"}
+
+
+# =========================
+# Cache
+# =========================
+
+class CachedSummarizer(ProfilingSummarizer):
+    """Reuses the stored summary of columns whose content fingerprint did not change."""
+
+    def __init__(self, cached: dict):
+        super().__init__(ProfilingTypeSet(Settings()))
+        self.cached = cached  # column -> (inferred type, summary)
+        self.summaries = {}
+        self.reused = set()
+
+    def summarize(self, config, series, dtype):
+        hit = self.cached.get(series.name)
+        if hit is not None and hit[0] == str(dtype):
+            summary = hit[1]
+            self.reused.add(series.name)
+        else:
+            summary = super().summarize(config, series, dtype)
+        self.summaries[series.name] = (str(dtype), summary)
+        return summary
+
+
+def cache_paths(output_dir: str, table_name: str) -> dict:
+    base = os.path.join(output_dir, table_name)
+    return {
+        "html": f"{base}.html",
+        "json": f"{base}.json",
+        "manifest": f"{base}.fingerprint.json",
+        "columns": f"{base}.columns.pkl",
+        "sketches": f"{base}.sketches.pkl",
+        "sketches_summary": f"{base}.sketches.json",
+    }
+
+
+def column_fingerprints(engine, table_name: str) -> dict:
+    """Per-column content hash (order-independent sum of value hashes), computed in a single scan."""
+    with engine.connect() as conn:
+        columns = conn.execute(text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = :table ORDER BY ordinal_position"
+        ), {"table": table_name}).scalars().all()
+        aggregates = [f"""COUNT("{c}")::text || ':' || COALESCE(SUM(hashtextextended("{c}"::text, 0)::numeric), 0)::text"""
+                      for c in columns]
+        row = conn.execute(text(f"SELECT COUNT(*), {', '.join(aggregates)} FROM {table_name}")).one()
+    return {c: f"{row[0]}:{h}" for c, h in zip(columns, row[1:])}
+
+
+def load_manifest(paths: dict) -> dict:
+    if not all(os.path.exists(paths[k]) for k in ("html", "json", "manifest")):
+        return {}
+    with open(paths["manifest"], encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load_column_summaries(paths: dict, reusable: set) -> dict:
+    if not reusable or not os.path.exists(paths["columns"]):
+        return {}
+    with open(paths["columns"], "rb") as f:
+        return {c: v for c, v in pickle.load(f).items() if c in reusable}
+
+
+# =========================
+# Sketches
+# =========================
+
+class TableSketches:
+    """Mergeable per-column sketches of a whole table, filled chunk by chunk in bounded memory."""
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = {}  # column -> {"distinct": HyperLogLog, "quantiles": KLL, "top": CountMin}
+
+    def update(self, chunk: pd.DataFrame):
+        self.rows += len(chunk)
+        for name, series in chunk.items():
+            sketches = self.columns.setdefault(name, {"distinct": HyperLogLog()})
+            if not series.notna().any():
+                continue
+            sketches["distinct"].ajouter(hacher_valeurs(series))
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                sketches.setdefault("quantiles", KLL()).ajouter(series.to_numpy(dtype=float, na_value=np.nan))
+            else:
+                sketches.setdefault("top", CountMin()).ajouter(series)
+
+    def feed(self, chunks):
+        """Passes `chunks` through unchanged, updating the sketches on the way."""
+        for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+
+    def merge(self, other: "TableSketches"):
+        self.rows += other.rows
+        for name, sketches in other.columns.items():
+            mine = self.columns.setdefault(name, {})
+            for kind, sketch in sketches.items():
+                if kind in mine:
+                    mine[kind].fusionner(sketch)
+                else:
+                    mine[kind] = sketch
+        return self
+
+    def summary(self) -> dict:
+        """Approximate statistics with their error bounds (JSON-serializable)."""
+        columns = {}
+        for name, sketches in self.columns.items():
+            distinct = sketches["distinct"]
+            stats = {"distinct_estimate": int(round(distinct.estimer())),
+                     "distinct_relative_std_error": round(distinct.erreur_relative(), 4)}
+            if "quantiles" in sketches:
+                kll = sketches["quantiles"]
+                stats["quantiles"] = dict(zip((f"p{round(q * 100)}" for q in SKETCH_QUANTILES),
+                                              kll.quantiles(SKETCH_QUANTILES)))
+                stats["quantile_rank_error_99"] = round(kll.erreur_rang(), 4)
+            if "top" in sketches:
+                cm = sketches["top"]
+                stats["top_values"] = [[str(v), n] for v, n in cm.plus_frequentes()]
+                stats["top_values_max_overcount"] = int(np.ceil(cm.erreur_absolue()))
+                stats["top_values_confidence"] = round(cm.confiance(), 4)
+            columns[name] = stats
+        return {"rows": self.rows, "columns": columns}
+
+
+def describe_sketches(summary: dict) -> dict:
+    """Per-variable description lines for the sketch statistics."""
+    descriptions = {}
+    for name, s in summary["columns"].items():
+        parts = [f"distinctes ≈ {s['distinct_estimate']:,} (erreur type {s['distinct_relative_std_error']:.2%})"]
+        if "quantiles" in s:
+            quantiles = ", ".join(f"{q} = {v:g}" for q, v in s["quantiles"].items())
+            parts.append(f"quantiles {quantiles} (erreur de rang ≤ {s['quantile_rank_error_99']:.2%} à 99 %)")
+        if s.get("top_values"):
+            top = ", ".join(f"{v} (≤ {n:,})" for v, n in s["top_values"][:5])
+            parts.append(f"valeurs fréquentes {top} (surestimation ≤ {s['top_values_max_overcount']:,} "
+                         f"à {s['top_values_confidence']:.0%})")
+        descriptions[name] = f"Approché (table complète, esquisses) : {' ; '.join(parts)}."
+    return descriptions
+
+
+def write_sketches(paths: dict, sketches: TableSketches) -> dict:
+    summary = sketches.summary()
+    write_atomic(paths["sketches"], pickle.dumps(sketches, protocol=pickle.HIGHEST_PROTOCOL))
+    write_atomic(paths["sketches_summary"], json.dumps(summary, indent=2, ensure_ascii=False, default=str).encode())
+    return summary
+
 
 # =========================
 # Utils
@@ -35,55 +223,249 @@ def ensure_output_dir(path: str):
 
 def load_table(engine, table_name: str) -> pd.DataFrame:
     print(f"📥 Chargement de la table : {table_name}")
+    if SNAPSHOT_DIR:
+        return lire_snapshot(engine, table_name, SNAPSHOT_DIR)
     query = f"SELECT * FROM {table_name}"
     return pd.read_sql(query, engine)
 
 
-def generate_profile(df: pd.DataFrame, table_name: str, output_dir: str):
+def iter_chunks(engine, table_name: str):
+    if SNAPSHOT_DIR:
+        yield from iterer_snapshot(engine, table_name, SNAPSHOT_DIR, taille_bloc=CHUNK_SIZE)
+        return
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=CHUNK_SIZE) as conn:
+        yield from pd.read_sql(text(f"SELECT * FROM {table_name}"), conn, chunksize=CHUNK_SIZE)
+
+
+def reservoir_sample(chunks, max_rows: int, seed: int) -> pd.DataFrame:
+    """Uniform sample without replacement in a single pass: keeps the `max_rows` smallest random keys."""
+    rng = np.random.default_rng(seed)
+    reservoir, keys = None, np.empty(0)
+    for chunk in chunks:
+        chunk_keys = rng.random(len(chunk))
+        if reservoir is None:
+            reservoir, keys = chunk, chunk_keys
+        else:
+            reservoir = pd.concat([reservoir, chunk], ignore_index=True)
+            keys = np.concatenate([keys, chunk_keys])
+        if len(reservoir) > max_rows:
+            kept = np.sort(np.argpartition(keys, max_rows)[:max_rows])
+            reservoir, keys = reservoir.iloc[kept].reset_index(drop=True), keys[kept]
+    return reservoir if reservoir is not None else pd.DataFrame()
+
+
+def load_sample(engine, table_name: str, total_rows: int, method: str, max_rows: int, seed: int,
+                sketches: TableSketches = None):
+    """Returns (sample, method actually used).
+
+    `sketches` is filled over the whole table: during the reservoir pass, or in an extra
+    streamed pass for TABLESAMPLE.
+    """
+    if SNAPSHOT_DIR:
+        method = "reservoir"  # TABLESAMPLE n'existe que côté PostgreSQL
+    print(f"📥 Échantillonnage de la table : {table_name} ({method}, {max_rows:,} lignes max, seed={seed})")
+    if method == "tablesample":
+        # Marge de 10 % pour que le tirage de Bernoulli atteigne le plafond. L'excédent est retiré
+        # au hasard : un LIMIT garderait le début du tas et écarterait les lignes ajoutées en dernier
+        percent = min(100.0, max_rows / total_rows * 110)
+        query = f"SELECT * FROM {table_name} TABLESAMPLE BERNOULLI ({percent}) REPEATABLE ({seed})"
+        if sketches is not None:
+            for chunk in iter_chunks(engine, table_name):
+                sketches.update(chunk)
+        sample = pd.read_sql(text(query), engine)
+        if len(sample) > max_rows:
+            sample = sample.sample(n=max_rows, random_state=seed).sort_index().reset_index(drop=True)
+        return sample, method
+    chunks = iter_chunks(engine, table_name)
+    if sketches is not None:
+        chunks = sketches.feed(chunks)
+    return reservoir_sample(chunks, max_rows, seed), method
+
+
+def exact_statistics(engine, table_name: str) -> dict:
+    """Full-table statistics computed in SQL: null counts, min/max, and the planner's distinct estimate."""
+    with engine.connect() as conn:
+        columns = conn.execute(text(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_name = :table ORDER BY ordinal_position"
+        ), {"table": table_name}).all()
+
+        aggregates = []
+        for name, data_type in columns:
+            aggregates.append(f'COUNT(*) - COUNT("{name}")')
+            if data_type in UNORDERED_TYPES:
+                aggregates += ["NULL", "NULL"]
+            else:
+                aggregates += [f'MIN("{name}")::text', f'MAX("{name}")::text']
+        row = conn.execute(text(f"SELECT COUNT(*), {', '.join(aggregates)} FROM {table_name}")).one()
+
+        # n_distinct < 0 : fraction du nombre de lignes (statistiques de ANALYZE)
+        n_distinct = dict(conn.execute(text(
+            "SELECT attname, n_distinct FROM pg_stats WHERE tablename = :table"
+        ), {"table": table_name}).all())
+
+    rows = row[0]
+    stats = {}
+    for i, (name, _) in enumerate(columns):
+        distinct = n_distinct.get(name)
+        if distinct is not None and distinct < 0:
+            distinct = -distinct * rows
+        stats[name] = {
+            "nulls": row[1 + 3 * i],
+            "min": row[2 + 3 * i],
+            "max": row[3 + 3 * i],
+            "distinct_estimate": None if distinct is None else int(round(distinct)),
+        }
+    return {"rows": rows, "columns": stats}
+
+
+def describe_sampling(exact: dict, sample_rows: int, method: str, seed: int, sketches: dict = None):
+    """Dataset and per-variable descriptions stating which statistics are exact, approximate
+    (`sketches` summary) and sampled."""
+    dataset = {
+        "description": (
+            f"Échantillon de {sample_rows:,} lignes sur {exact['rows']:,} (méthode {method}, seed={seed}). "
+            "Exact (table complète, calculé en SQL) : nombre de lignes, valeurs manquantes, min/max, "
+            "estimation du nombre de valeurs distinctes (pg_stats), indiqués dans la description de chaque variable. "
+            "Échantillonné : toutes les autres statistiques du rapport (distributions, histogrammes, "
+            "valeurs fréquentes, corrélations, doublons)."
+        )
+    }
+    approximate = describe_sketches(sketches) if sketches else {}
+    if approximate:
+        dataset["description"] += (
+            " Approché (table complète, esquisses fusionnables, bornes d'erreur indiquées) : "
+            "valeurs distinctes, quantiles des colonnes numériques, valeurs les plus fréquentes."
+        )
+    variables = {}
+    for name, s in exact["columns"].items():
+        distinct = "inconnu (table non analysée)" if s["distinct_estimate"] is None else f"≈ {s['distinct_estimate']:,}"
+        variables[name] = (
+            f"Exact : {s['nulls']:,} valeurs manquantes sur {exact['rows']:,}, "
+            f"min = {s['min']}, max = {s['max']}, distinctes {distinct}."
+        )
+        if name in approximate:
+            variables[name] += " " + approximate[name]
+    return dataset, {"descriptions": variables}
+
+
+def generate_profile(df: pd.DataFrame, table_name: str, output_dir: str, dataset=None, variables=None,
+                     summarizer=None):
     print(f"📊 Génération du profiling : {table_name}")
 
+    # Métadonnées passées seulement si présentes (valeurs par défaut de ydata sinon)
+    metadata = {k: v for k, v in {"dataset": dataset, "variables": variables, "summarizer": summarizer}.items()
+                if v is not None}
     profile = ProfileReport(
         df,
         title=f"{table_name} – Data Profiling Report",
         explorative=True,
-        minimal=True
+        minimal=True,
+        **metadata
     )
 
-    output_file = os.path.join(output_dir, f"{table_name}.html")
-    profile.to_file(output_file)
+    paths = cache_paths(output_dir, table_name)
+    profile.to_file(paths["html"])
+    profile.to_file(paths["json"])
+
+    print(f"✅ Rapport généré : {paths['html']}")
+
+
+def profile_table(table: str, force: bool = False) -> bool:
+    """Profiles one table with its own engine (runs in a worker process); returns False on error.
+
+    The report is skipped when the table fingerprint (pg_stat counters) or, failing that, every
+    column content hash matches the cached manifest. Otherwise only changed columns are summarized
+    again; per-column reuse is limited to full-table profiles, since a new sample changes every column.
+    """
+    try:
+        engine = create_engine(DATABASE_URL)
+        paths = cache_paths(OUTPUT_PATH, table)
+        settings = {"method": PROFILE_SAMPLE_METHOD, "rows": PROFILE_SAMPLE_ROWS, "seed": PROFILE_SAMPLE_SEED,
+                    "sketches": PROFILE_SKETCHES}
+        manifest = {} if force else load_manifest(paths)
+        same_settings = manifest.get("settings") == settings
+
+        with engine.connect() as conn:
+            fingerprint = empreinte_table(conn, table)
+        if same_settings and manifest.get("fingerprint") == fingerprint:
+            print(f"⏭️ Table inchangée : {table} — rapport en cache")
+            return True
+
+        columns = column_fingerprints(engine, table)
+        if same_settings and manifest.get("columns") == columns:
+            manifest["fingerprint"] = fingerprint
+            write_atomic(paths["manifest"], json.dumps(manifest, indent=2).encode())
+            print(f"⏭️ Contenu inchangé : {table} — rapport en cache")
+            return True
+
+        reusable = {c for c, h in columns.items() if same_settings and manifest.get("columns", {}).get(c) == h}
+        dataset, variables = None, None
+        if PROFILE_SAMPLE_METHOD == "none":
+            df = load_table(engine, table)
+        else:
+            exact = exact_statistics(engine, table)
+            if exact["rows"] <= PROFILE_SAMPLE_ROWS:
+                df = load_table(engine, table)
+                dataset = {"description": f"Table complète ({exact['rows']:,} lignes) : toutes les statistiques sont exactes."}
+            else:
+                sketches = TableSketches() if PROFILE_SKETCHES else None
+                df, method = load_sample(engine, table, exact["rows"], PROFILE_SAMPLE_METHOD, PROFILE_SAMPLE_ROWS,
+                                         PROFILE_SAMPLE_SEED, sketches)
+                summary = write_sketches(paths, sketches) if sketches is not None else None
+                dataset, variables = describe_sampling(exact, len(df), method, PROFILE_SAMPLE_SEED, summary)
+                reusable = set()
+
+        if df.empty:
+            print(f"⚠️ Table vide : {table} — profiling ignoré")
+            return True
+
+        summarizer = CachedSummarizer(load_column_summaries(paths, reusable))
+        generate_profile(df, table, OUTPUT_PATH, dataset=dataset, variables=variables, summarizer=summarizer)
+        if summarizer.reused:
+            print(f"   ↳ {len(summarizer.reused)}/{len(df.columns)} colonnes réutilisées depuis le cache")
 
-    print(f"✅ Rapport généré : {output_file}")
+        write_atomic(paths["columns"], pickle.dumps(summarizer.summaries, protocol=pickle.HIGHEST_PROTOCOL))
+        manifest = {"fingerprint": fingerprint, "settings": settings, "columns": columns}
+        write_atomic(paths["manifest"], json.dumps(manifest, indent=2).encode())
+        return True
+
+    except Exception as e:
+        print(f"❌ Erreur sur la table {table}")
+        print(e)
+        return False
 
 
 # =========================
 # Main
 # =========================
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Profiling automatique des tables *_raw - Couche 2")
+    parser.add_argument("--force", action="store_true",
+                        help="Régénère tous les rapports, même pour les tables inchangées")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
     print("🚀 Démarrage du profiling automatique")
 
     ensure_output_dir(OUTPUT_PATH)
 
     try:
-        engine = create_engine(DATABASE_URL)
+        create_engine(DATABASE_URL)
     except Exception as e:
         print("❌ Impossible de se connecter à la base de données")
         print(e)
         sys.exit(1)
 
-    for table in TABLES_TO_PROFILE:
-        try:
-            df = load_table(engine, table)
-
-            if df.empty:
-                print(f"⚠️ Table vide : {table} — profiling ignoré")
-                continue
-
-            generate_profile(df, table, OUTPUT_PATH)
-
-        except Exception as e:
-            print(f"❌ Erreur sur la table {table}")
-            print(e)
+    if PROFILE_WORKERS > 1:
+        with ProcessPoolExecutor(max_workers=PROFILE_WORKERS) as executor:
+            list(executor.map(partial(profile_table, force=args.force), TABLES_TO_PROFILE))
+    else:
+        for table in TABLES_TO_PROFILE:
+            profile_table(table, force=args.force)
 
     print("🎉 Profiling terminé avec succès")
 
@@ -0,0 +1,213 @@
+"""
+Export du catalogue de données depuis les statistiques système de PostgreSQL.
+
+Les métadonnées de colonnes (type, nullabilité, fraction de NULL, nombre de
+valeurs distinctes, valeurs les plus fréquentes, largeur moyenne, corrélation)
+sont lues dans `information_schema` et `pg_stats` (statistiques de ANALYZE),
+l'estimation du nombre de lignes dans `pg_stat_user_tables`, et la dernière
+mesure de chaque règle de qualité dans `validation_history` : aucune table de
+données n'est parcourue. Seules les tables sources (*_raw) sont cataloguées :
+les tables du pipeline (historique, échecs, profils, dérives, agrégats)
+changent à chaque exécution et réécriraient le catalogue à chaque fois.
+
+L'export est incrémental : une empreinte par table (fichier, lignes vivantes,
+dates d'ANALYZE, définition des colonnes, dernière validation) est comparée à
+celle du manifeste, et seules les tables modifiées voient leur fichier JSON
+réécrit. Le CSV à plat (une ligne par colonne) est régénéré depuis les JSON,
+pour l'import dans OpenMetadata ou un autre outil de catalogue.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import time
+
+from sqlalchemy import text
+
+COLONNES_CATALOGUE = [
+    'table_name', 'column_name', 'ordinal_position', 'data_type', 'is_nullable', 'max_length',
+    'row_estimate', 'null_frac', 'n_distinct', 'most_common_values', 'most_common_freqs',
+    'avg_width', 'correlation', 'last_analyze', 'quality_rules', 'quality_min_success_rate',
+    'quality_run_date',
+]
+
+REQUETE_TABLES = """
+SELECT c.relname, c.relfilenode, s.n_live_tup, s.last_analyze, s.last_autoanalyze
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_stat_user_tables s ON s.relid = c.oid
+WHERE n.nspname = :schema AND c.relkind IN ('r', 'p') AND c.relname = ANY(:tables)
+ORDER BY c.relname
+"""
+
+REQUETE_COLONNES = """
+SELECT i.table_name, i.column_name, i.ordinal_position, i.data_type, i.is_nullable = 'YES',
+       i.character_maximum_length, s.null_frac, s.n_distinct,
+       s.most_common_vals::text::text[], s.most_common_freqs, s.avg_width, s.correlation
+FROM information_schema.columns i
+LEFT JOIN pg_stats s
+       ON s.schemaname = i.table_schema AND s.tablename = i.table_name
+      AND s.attname = i.column_name AND NOT s.inherited
+WHERE i.table_schema = :schema AND i.table_name = ANY(:tables)
+ORDER BY i.table_name, i.ordinal_position
+"""
+
+# Dernière mesure de chaque règle du registre : une descente d'index par règle
+# (idx_validation_history_regle), quelle que soit la taille de l'historique
+REQUETE_QUALITE = """
+SELECT r.table_name, r.column_name, r.pilier, r.rule_name, h.run_date, h.success_rate
+FROM unnest(CAST(:tables AS text[]), CAST(:colonnes AS text[]), CAST(:piliers AS text[]),
+            CAST(:regles AS text[])) AS r(table_name, column_name, pilier, rule_name)
+CROSS JOIN LATERAL (
+    SELECT v.run_date, v.success_rate FROM validation_history v
+    WHERE v.table_name = r.table_name AND v.column_name = r.column_name
+      AND v.pilier = r.pilier AND v.rule_name = r.rule_name
+    ORDER BY v.run_date DESC LIMIT 1
+) h
+"""
+
+
+def _texte(valeur):
+    return None if valeur is None else str(valeur)
+
+
+def _ecrire_atomique(chemin, contenu):
+    temporaire = chemin.with_name(f".{chemin.name}.tmp")
+    temporaire.write_text(contenu, encoding='utf-8')
+    os.replace(temporaire, chemin)
+
+
+def lire_qualite(conn, regles, tables_raw):
+    """{table SQL: {colonne: [mesures]}} : dernière mesure de chaque règle, rattachée à ses colonnes."""
+    if conn.execute(text("SELECT to_regclass('validation_history')")).scalar() is None:
+        return {}
+    cles = [regle.cle() for regle in regles]
+    lignes = conn.execute(text(REQUETE_QUALITE), {
+        'tables': [c[0] for c in cles], 'colonnes': [c[1] for c in cles],
+        'piliers': [c[2] for c in cles], 'regles': [c[3] for c in cles],
+    })
+    qualite = {}
+    for alias, colonne, pilier, regle, run_date, taux in lignes:
+        table_name = tables_raw.get(alias, alias)
+        for nom in colonne.split(','):
+            qualite.setdefault(table_name, {}).setdefault(nom, []).append({
+                'rule_name': regle, 'pilier': pilier, 'success_rate': float(taux),
+                'run_date': run_date.isoformat(sep=' '),
+            })
+    return qualite
+
+
+def _colonne(ligne, lignes_estimees, mesures):
+    (_, nom, position, type_sql, nullable, longueur, null_frac, n_distinct,
+     valeurs, frequences, largeur, correlation) = ligne
+    # n_distinct < 0 : fraction du nombre de lignes
+    if n_distinct is not None and n_distinct < 0:
+        n_distinct = -n_distinct * lignes_estimees
+    return {
+        'column_name': nom,
+        'ordinal_position': position,
+        'data_type': type_sql,
+        'is_nullable': nullable,
+        'max_length': longueur,
+        'null_frac': null_frac,
+        'n_distinct': None if n_distinct is None else int(round(n_distinct)),
+        'most_common_values': [{'value': v, 'freq': round(f, 6)} for v, f in zip(valeurs or [], frequences or [])],
+        'avg_width': largeur,
+        'correlation': correlation,
+        'quality': mesures,
+    }
+
+
+def _empreinte(table, colonnes):
+    signature = [table['relfilenode'], table['row_estimate'], table['last_analyze']] + [
+        (c['column_name'], c['data_type'], c['is_nullable'], [m['run_date'] for m in c['quality']])
+        for c in colonnes
+    ]
+    return hashlib.sha1(json.dumps(signature, default=str).encode()).hexdigest()[:16]
+
+
+def _lignes_csv(entree):
+    lignes = []
+    for c in entree['columns']:
+        taux = [m['success_rate'] for m in c['quality']]
+        lignes.append({
+            'table_name': entree['table_name'],
+            **{k: c[k] for k in ('column_name', 'ordinal_position', 'data_type', 'is_nullable', 'max_length',
+                                 'null_frac', 'n_distinct', 'avg_width', 'correlation')},
+            'row_estimate': entree['row_estimate'],
+            'most_common_values': json.dumps([m['value'] for m in c['most_common_values']], ensure_ascii=False),
+            'most_common_freqs': json.dumps([m['freq'] for m in c['most_common_values']]),
+            'last_analyze': entree['last_analyze'],
+            'quality_rules': ";".join(f"{m['rule_name']}={m['success_rate']:.2f}" for m in c['quality']),
+            'quality_min_success_rate': min(taux) if taux else None,
+            'quality_run_date': max((m['run_date'] for m in c['quality']), default=None),
+        })
+    return lignes
+
+
+def exporter_catalogue(engine, dossier, regles, tables_raw, schema='public'):
+    """Écrit `dossier`/<table>.json pour les tables de `tables_raw` modifiées, puis catalog.csv
+    et le manifeste.
+
+    Renvoie (tables réécrites, tables inchangées).
+    """
+    if engine.dialect.name != "postgresql":
+        raise ValueError("L'export du catalogue lit pg_stats : PostgreSQL requis")
+    debut = time.perf_counter()
+    dossier.mkdir(parents=True, exist_ok=True)
+    chemin_manifeste = dossier / "manifest.json"
+    manifeste = json.loads(chemin_manifeste.read_text(encoding='utf-8')) if chemin_manifeste.exists() else {}
+
+    filtre = {'schema': schema, 'tables': sorted(tables_raw.values())}
+    with engine.connect() as conn:
+        tables = {
+            nom: {'relfilenode': fichier, 'row_estimate': int(lignes),
+                  'last_analyze': _texte(max(filter(None, (manuel, auto)), default=None))}
+            for nom, fichier, lignes, manuel, auto in conn.execute(text(REQUETE_TABLES), filtre)
+        }
+        colonnes = {}
+        for ligne in conn.execute(text(REQUETE_COLONNES), filtre):
+            colonnes.setdefault(ligne[0], []).append(ligne)
+        qualite = lire_qualite(conn, regles, tables_raw)
+
+    ecrites, inchangees = [], []
+    nouveau_manifeste = {}
+    for nom, table in tables.items():
+        mesures = qualite.get(nom, {})
+        entree = {
+            'table_name': nom, 'schema': schema, **table,
+            'columns': [_colonne(ligne, table['row_estimate'], mesures.get(ligne[1], []))
+                        for ligne in colonnes.get(nom, [])],
+        }
+        empreinte = _empreinte(table, entree['columns'])
+        nouveau_manifeste[nom] = empreinte
+        chemin = dossier / f"{nom}.json"
+        if manifeste.get(nom) == empreinte and chemin.exists():
+            inchangees.append(nom)
+            continue
+        _ecrire_atomique(chemin, json.dumps(entree, indent=2, ensure_ascii=False, default=str))
+        ecrites.append(nom)
+
+    # Tables supprimées : leur fichier sort du catalogue
+    for nom in set(manifeste) - set(nouveau_manifeste):
+        (dossier / f"{nom}.json").unlink(missing_ok=True)
+
+    if ecrites or set(manifeste) != set(nouveau_manifeste) or not (dossier / "catalog.csv").exists():
+        lignes = []
+        for nom in nouveau_manifeste:
+            lignes.extend(_lignes_csv(json.loads((dossier / f"{nom}.json").read_text(encoding='utf-8'))))
+        temporaire = dossier / ".catalog.csv.tmp"
+        with open(temporaire, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=COLONNES_CATALOGUE)
+            writer.writeheader()
+            writer.writerows(lignes)
+        os.replace(temporaire, dossier / "catalog.csv")
+    _ecrire_atomique(chemin_manifeste, json.dumps(nouveau_manifeste, indent=2))
+
+    print(f"  ✓ Catalogue : {len(ecrites)} table(s) réécrite(s), {len(inchangees)} inchangée(s) "
+          f"en {(time.perf_counter() - debut) * 1000:.0f} ms → {dossier}")
+    non_analysees = [nom for nom, t in tables.items() if t['last_analyze'] is None]
+    if non_analysees:
+        print(f"  ⚠️  Jamais analysées (statistiques de colonnes vides, lancer ANALYZE) : {', '.join(non_analysees)}")
+    return ecrites, inchangees
@@ -0,0 +1,203 @@
+"""
+Contrôle des clés : unicité et intégrité référentielle.
+
+Chaque clé (table + colonnes) est réduite à un hachage int64 par ligne, et les
+hachages distincts sont conservés dans un tableau trié (recherche par
+`searchsorted`). Un même index sert à toutes les règles qui portent sur la même
+clé : `staff.staff_id` alimente à la fois son unicité et la clé étrangère
+`consultations.staffid`. Au-delà de `max_memoire` clés, l'index est déversé sur
+disque en partitions par préfixe de hachage, relues en mémoire mappée.
+
+Les valeurs en échec (doublons, orphelines) sont conservées avec leur nombre
+d'occurrences, dans la limite de `MAX_EXEMPLES` clés par règle.
+
+Deux clés distinctes de même hachage 64 bits seraient confondues : le risque
+est négligeable aux volumes traités (~n² / 2⁶⁵). Les nombres étant hachés en
+float64, deux entiers au-delà de 2⁵³ peuvent aussi se confondre, comme à la
+lecture d'une colonne entière contenant NULL.
+"""
+
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+import pandas as pd
+
+MAX_CLES_MEMOIRE = int(os.getenv("KEY_INDEX_MAX_KEYS", "20000000"))
+DOSSIER_DEVERSEMENT = os.getenv("KEY_INDEX_SPILL_DIR") or None
+MAX_EXEMPLES = 20
+
+BITS_PARTITION = 4  # 16 partitions sur disque
+
+# À incrémenter si `hacher` change : les esquisses persistées (mode incrémental) sont alors reconstruites
+VERSION_HACHAGE = 2
+
+
+def _canonique(serie):
+    """Type de hachage commun à tous les blocs d'une colonne.
+
+    Le hachage de pandas dépend du type : 5 (int8) et 5.0 (float64) diffèrent.
+    Or le type d'une même colonne varie d'un bloc à l'autre (réduction des
+    entiers, NULL qui passe une colonne entière en réels) : les nombres sont
+    donc hachés en float64 et les booléens comme objets. Les textes (objets,
+    chaînes Arrow, catégories) ont déjà le même hachage.
+    """
+    if pd.api.types.is_bool_dtype(serie.dtype):
+        return serie.astype(object)
+    if pd.api.types.is_numeric_dtype(serie.dtype) and serie.dtype != np.float64:
+        return serie.astype(np.float64)
+    return serie
+
+
+def hacher(colonnes):
+    """Hachage uint64 par ligne d'une clé (liste de Series alignées)."""
+    df = pd.DataFrame({i: _canonique(c) for i, c in enumerate(colonnes)})
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _dans_trie(trie, hachages):
+    if len(trie) == 0 or len(hachages) == 0:
+        return np.zeros(len(hachages), dtype=bool)
+    positions = np.searchsorted(trie, hachages)
+    trouve = positions < len(trie)
+    trouve[trouve] = trie[positions[trouve]] == hachages[trouve]
+    return trouve
+
+
+class IndexCles:
+    """Ensemble de hachages distincts, en mémoire puis partitionné sur disque."""
+
+    def __init__(self, max_memoire=MAX_CLES_MEMOIRE, dossier=DOSSIER_DEVERSEMENT):
+        self.max_memoire = max_memoire
+        self.dossier_parent = dossier
+        self.memoire = np.empty(0, dtype=np.uint64)
+        self.partitions = None  # chemins .npy, triés et disjoints de self.memoire
+        self.taille_disque = 0
+        self.contient_nul = False
+
+    def __len__(self):
+        return self.taille_disque + len(self.memoire)
+
+    def contient(self, hachages):
+        trouve = _dans_trie(self.memoire, hachages)
+        if self.partitions:
+            prefixes = hachages >> np.uint64(64 - BITS_PARTITION)
+            for i, chemin in enumerate(self.partitions):
+                selection = prefixes == i
+                if selection.any() and os.path.exists(chemin):
+                    trouve[selection] |= _dans_trie(np.load(chemin, mmap_mode='r'), hachages[selection])
+        return trouve
+
+    def ajouter(self, nouveaux):
+        """Ajoute des hachages distincts, absents de l'index."""
+        if len(nouveaux) == 0:
+            return
+        self.memoire = np.union1d(self.memoire, nouveaux)
+        if len(self.memoire) > self.max_memoire:
+            self._deverser()
+
+    def _deverser(self):
+        if self.partitions is None:
+            dossier = tempfile.mkdtemp(prefix="index_cles_", dir=self.dossier_parent)
+            weakref.finalize(self, shutil.rmtree, dossier, True)
+            self.partitions = [os.path.join(dossier, f"p{i:02d}.npy") for i in range(2 ** BITS_PARTITION)]
+            print(f"  💾 Index de clés déversé sur disque ({len(self.memoire):,} clés) : {dossier}")
+        # Le tableau est trié : chaque partition (préfixe de hachage) en est une tranche contiguë
+        debuts = np.arange(1, 2 ** BITS_PARTITION, dtype=np.uint64) << np.uint64(64 - BITS_PARTITION)
+        bornes = [0, *np.searchsorted(self.memoire, debuts), len(self.memoire)]
+        for i, chemin in enumerate(self.partitions):
+            tranche = self.memoire[bornes[i]:bornes[i + 1]]
+            if len(tranche) == 0:
+                continue
+            if os.path.exists(chemin):
+                tranche = np.union1d(np.load(chemin), tranche)
+            temporaire = f"{chemin}.tmp.npy"
+            np.save(temporaire, tranche)
+            os.replace(temporaire, chemin)
+        self.taille_disque += len(self.memoire)
+        self.memoire = np.empty(0, dtype=np.uint64)
+
+
+def formater(valeur):
+    if isinstance(valeur, tuple):
+        return "(" + ", ".join(formater(v) for v in valeur) + ")"
+    return str(valeur)
+
+
+class Exemples:
+    """Valeurs de clé en échec et leur nombre d'occurrences (au plus `MAX_EXEMPLES` clés).
+
+    Pour les doublons, seules les occurrences en trop sont transmises :
+    `premiere_occurrence` ajoute la première au compte de chaque clé.
+    """
+
+    def __init__(self, premiere_occurrence=False):
+        self.valeurs = {}  # hachage -> [valeur, occurrences]
+        self.decalage = int(premiere_occurrence)
+
+    def ajouter(self, hachages, colonnes):
+        """`colonnes` : valeurs de la clé pour chaque hachage (Series alignées sur `hachages`)."""
+        if len(hachages) == 0:
+            return
+        comptes = pd.Series(hachages).value_counts(sort=False)
+        connus = comptes.index.isin(list(self.valeurs))
+        for h, n in comptes[connus].items():
+            self.valeurs[h][1] += int(n)
+        place = MAX_EXEMPLES - len(self.valeurs)
+        if place <= 0:
+            return
+        premieres = pd.Series(hachages).drop_duplicates()
+        positions = pd.Series(premieres.index, index=premieres.to_numpy())
+        for h, n in comptes[~connus].iloc[:place].items():
+            valeur = tuple(c.iloc[positions[h]] for c in colonnes)
+            self.valeurs[h] = [formater(valeur[0] if len(valeur) == 1 else valeur), int(n) + self.decalage]
+
+    def lister(self):
+        return sorted(self.valeurs.values(), key=lambda v: -v[1])
+
+    def resumer(self, libelle, limite=200):
+        """Texte court pour la colonne error_type (200 caractères en base)."""
+        if not self.valeurs:
+            return None
+        texte = f"{libelle} : " + ", ".join(f"{v} (×{n})" for v, n in self.lister())
+        return texte if len(texte) <= limite else texte[:limite - 1] + "…"
+
+
+class RegistreCles:
+    """Un index par clé (table, expressions), alimenté une seule fois par bloc de données."""
+
+    def __init__(self):
+        self.index = {}
+        self._derniers = {}  # clé -> (plan, résultat du bloc)
+
+    def alimenter(self, table, expressions, plan):
+        """Ajoute les clés du bloc `plan` ; renvoie (hachages, nuls, doublons, colonnes) pour ce bloc.
+
+        `doublons` porte sur les lignes non nulles, dans l'ordre du bloc.
+        """
+        cle = (table, tuple(expressions))
+        dernier = self._derniers.get(cle)
+        if dernier is not None and dernier[0] is plan:
+            return dernier[1]
+
+        index = self.index.setdefault(cle, IndexCles())
+        colonnes = [plan.valeur(e) for e in expressions]
+        hachages = hacher(colonnes)
+        nuls = np.zeros(len(hachages), dtype=bool)
+        for c in colonnes:
+            nuls |= c.isna().to_numpy()
+        index.contient_nul |= bool(nuls.any())
+
+        # Une ligne est un doublon si sa clé est déjà indexée ou répétée plus haut dans le bloc
+        non_nuls = hachages[~nuls]
+        distincts, premieres = np.unique(non_nuls, return_index=True)
+        deja = index.contient(distincts)
+        doublons = np.ones(len(non_nuls), dtype=bool)
+        doublons[premieres[~deja]] = False
+        index.ajouter(distincts[~deja])
+
+        resultat = (hachages, nuls, doublons, colonnes)
+        self._derniers[cle] = (plan, resultat)
+        return resultat
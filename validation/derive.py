@@ -0,0 +1,197 @@
+"""
+Détection des dérives de qualité sur l'historique de validation.
+
+Pour chaque règle, un état de quelques nombres résume tout l'historique de son
+taux de succès. Il est mis à jour en O(1) par règle à la fin de chaque
+exécution, sans relire l'historique :
+  - moyenne et variance exponentielles (EWMA, poids `DRIFT_ALPHA`) : niveau récent ;
+  - moyenne et somme des carrés des écarts (Welford) : référence de long terme ;
+  - CUSUM inférieur : cumul des baisses sous l'EWMA, en écarts-types.
+
+Une exécution est signalée en « chute » si son taux est à plus de `DRIFT_Z`
+écarts-types sous l'EWMA, et en « dérive » si le CUSUM dépasse `DRIFT_CUSUM_H`
+(baisses modérées mais répétées). L'EWMA suit un changement de niveau assumé :
+le CUSUM redescend ensuite de lui-même. Seules les baisses sont signalées, et
+seulement après `DRIFT_MIN_RUNS` exécutions de la règle.
+
+L'état tient dans un petit fichier Parquet, réécrit atomiquement.
+`reconstruire` le recalcule depuis tout l'historique en un seul passage
+vectorisé (mêmes formules que la mise à jour en ligne).
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+DRIFT_ALPHA = float(os.getenv("DRIFT_ALPHA", "0.2"))
+DRIFT_Z = float(os.getenv("DRIFT_Z", "3"))
+DRIFT_CUSUM_K = float(os.getenv("DRIFT_CUSUM_K", "0.5"))
+DRIFT_CUSUM_H = float(os.getenv("DRIFT_CUSUM_H", "5"))
+DRIFT_MIN_RUNS = int(os.getenv("DRIFT_MIN_RUNS", "5"))
+# Écart-type plancher (points de %) : une règle stable ne déclenche pas d'alerte au moindre écart
+DRIFT_MIN_STD = float(os.getenv("DRIFT_MIN_STD", "0.5"))
+
+CLES = ['table_name', 'column_name', 'pilier', 'rule_name']
+COLONNES_ETAT = [*CLES, 'n', 'ewma_moyenne', 'ewma_variance', 'moyenne', 'm2', 'cusum', 'derniere_execution']
+COLONNES_DERIVE = [
+    'run_date', *CLES, 'success_rate', 'ewma_mean', 'ewma_std', 'baseline_mean', 'baseline_std',
+    'z_score', 'cusum', 'alert',
+]
+
+SCHEMA_DERIVE = pa.schema([
+    ('run_date', pa.timestamp('s')),
+    *((nom, pa.string()) for nom in CLES),
+    *((nom, pa.float64()) for nom in COLONNES_DERIVE[5:-1]),
+    ('alert', pa.string()),
+])
+
+
+def etat_vide():
+    types = {nom: object for nom in CLES} | {'derniere_execution': 'datetime64[ns]'}
+    return pd.DataFrame({nom: pd.Series(dtype=types.get(nom, 'float64')) for nom in COLONNES_ETAT})
+
+
+def charger_etat(chemin):
+    if not chemin.exists():
+        return etat_vide()
+    return pd.read_parquet(chemin)
+
+
+def sauver_etat(etat, chemin):
+    """Écriture atomique : un état partiellement écrit n'est jamais relu."""
+    chemin.parent.mkdir(parents=True, exist_ok=True)
+    temporaire = chemin.with_name(f".{chemin.name}.tmp")
+    etat[COLONNES_ETAT].to_parquet(temporaire, index=False)
+    os.replace(temporaire, chemin)
+
+
+def _scores(x, n, ewma_moyenne, ewma_variance, moyenne, m2):
+    """Scores d'une observation `x` face à l'état qui la précède (tableaux alignés)."""
+    mature = n >= DRIFT_MIN_RUNS
+    ewma_std = np.sqrt(ewma_variance)
+    base_std = np.sqrt(m2 / np.maximum(n - 1, 1))
+    z = np.where(mature, (x - ewma_moyenne) / np.maximum(ewma_std, DRIFT_MIN_STD), np.nan)
+    # Écart borné à DRIFT_Z : une chute isolée est signalée par z sans maintenir le CUSUM en alerte
+    baisse = np.where(mature, np.minimum(-z, DRIFT_Z) - DRIFT_CUSUM_K, 0.0)
+    return ewma_std, base_std, z, baisse
+
+
+def _alertes(z, cusum):
+    chute = z <= -DRIFT_Z
+    derive = cusum > DRIFT_CUSUM_H
+    return np.select([chute & derive, chute, derive], ['chute, dérive', 'chute', 'dérive'], None)
+
+
+def mettre_a_jour(etat, df_metriques):
+    """Scores des règles de l'exécution et nouvel état ; renvoie (DataFrame des scores, état).
+
+    Les règles sans contrôle (total nul) et les exécutions déjà prises en compte
+    sont ignorées.
+    """
+    runs = df_metriques.loc[df_metriques['total_expectations'] > 0, ['run_date', *CLES, 'success_rate']].copy()
+    runs['run_date'] = pd.to_datetime(runs['run_date'])
+    df = runs.merge(etat, on=CLES, how='left')
+    df = df[df['derniere_execution'].isna() | (df['run_date'] > df['derniere_execution'])].reset_index(drop=True)
+
+    x = df['success_rate'].to_numpy(dtype=float)
+    n = df['n'].fillna(0).to_numpy()
+    ewma_moyenne = df['ewma_moyenne'].fillna(0).to_numpy()
+    ewma_variance = df['ewma_variance'].fillna(0).to_numpy()
+    moyenne = df['moyenne'].fillna(0).to_numpy()
+    m2 = df['m2'].fillna(0).to_numpy()
+    ewma_std, base_std, z, baisse = _scores(x, n, ewma_moyenne, ewma_variance, moyenne, m2)
+    cusum = np.maximum(0.0, df['cusum'].fillna(0).to_numpy() + baisse)
+
+    scores = pd.DataFrame({
+        'run_date': df['run_date'], **{c: df[c] for c in CLES}, 'success_rate': x,
+        'ewma_mean': np.where(n > 0, ewma_moyenne, np.nan), 'ewma_std': np.where(n > 0, ewma_std, np.nan),
+        'baseline_mean': np.where(n > 0, moyenne, np.nan), 'baseline_std': np.where(n > 1, base_std, np.nan),
+        'z_score': z, 'cusum': cusum, 'alert': _alertes(z, cusum),
+    })
+
+    # EWMA (variance incrémentale de Finch) et Welford ; la première observation initialise l'état
+    ecart = x - ewma_moyenne
+    premier = n == 0
+    nouveau = pd.DataFrame({
+        **{c: df[c] for c in CLES},
+        'n': n + 1,
+        'ewma_moyenne': np.where(premier, x, ewma_moyenne + DRIFT_ALPHA * ecart),
+        'ewma_variance': np.where(premier, 0.0, (1 - DRIFT_ALPHA) * (ewma_variance + DRIFT_ALPHA * ecart ** 2)),
+        'moyenne': moyenne + (x - moyenne) / (n + 1),
+        'cusum': cusum,
+        'derniere_execution': df['run_date'],
+    })
+    nouveau['m2'] = m2 + (x - moyenne) * (x - nouveau['moyenne'].to_numpy())
+
+    cles = pd.MultiIndex.from_frame(nouveau[CLES])
+    conserve = etat[~pd.MultiIndex.from_frame(etat[CLES]).isin(cles)] if len(etat) else etat
+    etat = pd.concat([conserve, nouveau[COLONNES_ETAT]], ignore_index=True) if len(conserve) else nouveau[COLONNES_ETAT]
+    return scores[COLONNES_DERIVE], etat
+
+
+def reconstruire(df_historique):
+    """État recalculé depuis l'historique complet, en un passage vectorisé par règle.
+
+    Renvoie (état, scores de chaque exécution historique) ; un historique vide donne un état vide.
+    """
+    # Un historique vide (ou relu d'un CSV) n'a pas forcément des colonnes numériques
+    total = df_historique['total_expectations'].astype(float)
+    df = df_historique.loc[total > 0, ['run_date', *CLES, 'success_rate']].copy()
+    if df.empty:
+        return etat_vide(), pd.DataFrame(columns=COLONNES_DERIVE)
+    df['run_date'] = pd.to_datetime(df['run_date'])
+    df['success_rate'] = df['success_rate'].astype(float)
+    df = df.sort_values([*CLES, 'run_date'], kind='stable').reset_index(drop=True)
+    groupes = df.groupby(CLES, sort=False)
+    x = df['success_rate'].astype(float)
+
+    # État avant chaque observation : cumuls décalés d'un rang dans chaque règle
+    n = groupes.cumcount().to_numpy()
+    somme = groupes['success_rate'].cumsum().to_numpy() - x.to_numpy()
+    carres = (x ** 2).groupby(groupes.ngroup()).cumsum().to_numpy() - x.to_numpy() ** 2
+    moyenne = np.divide(somme, n, out=np.zeros(len(df)), where=n > 0)
+    m2 = np.maximum(carres - somme * moyenne, 0.0)
+    ewm = groupes['success_rate'].ewm(alpha=DRIFT_ALPHA, adjust=False)
+    ewma_apres = ewm.mean().reset_index(level=list(range(len(CLES))), drop=True).sort_index().to_numpy()
+    ewma_var_apres = np.nan_to_num(
+        ewm.var(bias=True).reset_index(level=list(range(len(CLES))), drop=True).sort_index().to_numpy())
+    ewma_moyenne = np.where(n > 0, np.roll(ewma_apres, 1), 0.0)
+    ewma_variance = np.where(n > 0, np.roll(ewma_var_apres, 1), 0.0)
+
+    ewma_std, base_std, z, baisse = _scores(x.to_numpy(), n, ewma_moyenne, ewma_variance, moyenne, m2)
+    # CUSUM S = max(0, S + baisse) : S_t = C_t - min(0, min des C_s jusqu'à t), C = cumul des baisses
+    cumul = pd.Series(baisse).groupby(groupes.ngroup()).cumsum()
+    cusum = (cumul - np.minimum(cumul.groupby(groupes.ngroup()).cummin(), 0)).to_numpy()
+
+    scores = pd.DataFrame({
+        'run_date': df['run_date'], **{c: df[c] for c in CLES}, 'success_rate': x,
+        'ewma_mean': np.where(n > 0, ewma_moyenne, np.nan), 'ewma_std': np.where(n > 0, ewma_std, np.nan),
+        'baseline_mean': np.where(n > 0, moyenne, np.nan), 'baseline_std': np.where(n > 1, base_std, np.nan),
+        'z_score': z, 'cusum': cusum, 'alert': _alertes(z, cusum),
+    })
+
+    derniers = groupes.tail(1).index
+    nb = n[derniers] + 1
+    somme_finale = somme[derniers] + x.to_numpy()[derniers]
+    etat = df.loc[derniers, CLES].reset_index(drop=True)
+    etat['n'] = nb.astype(float)
+    etat['ewma_moyenne'] = ewma_apres[derniers]
+    etat['ewma_variance'] = ewma_var_apres[derniers]
+    etat['moyenne'] = somme_finale / nb
+    etat['m2'] = np.maximum(carres[derniers] + x.to_numpy()[derniers] ** 2 - somme_finale * etat['moyenne'], 0.0)
+    etat['cusum'] = cusum[derniers]
+    etat['derniere_execution'] = df.loc[derniers, 'run_date'].to_numpy()
+    return etat[COLONNES_ETAT], scores[COLONNES_DERIVE]
+
+
+def afficher_alertes(df_derive):
+    alertes = df_derive[df_derive['alert'].notna()]
+    if alertes.empty:
+        print(f"  ✓ Dérive : aucune alerte sur {len(df_derive)} règles")
+        return
+    print(f"  ⚠️  Dérive : {len(alertes)} règle(s) en alerte")
+    for _, ligne in alertes.iterrows():
+        print(f"     • {ligne['table_name']}.{ligne['rule_name']:45} {ligne['success_rate']:6.2f}% "
+              f"(EWMA {ligne['ewma_mean']:.2f}%, z {ligne['z_score']:+.1f}, CUSUM {ligne['cusum']:.1f}) : {ligne['alert']}")
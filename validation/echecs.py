@@ -0,0 +1,148 @@
+"""
+Magasin des lignes en échec.
+
+Pour chaque règle, les lignes en échec sont comptées par type d'erreur (dérivé
+de la valeur : préfixe ou longueur d'un téléphone, domaine d'un e-mail, borne
+d'une plage...) et un échantillon d'au plus `FAILURE_SAMPLE_SIZE` lignes est
+conservé avec leur clé et les valeurs contrôlées.
+
+L'échantillon est un réservoir à priorités : chaque ligne en échec reçoit une
+priorité aléatoire et seules les plus petites sont gardées. La mémoire reste
+bornée quel que soit le nombre d'échecs ou de blocs, et seules les lignes
+retenues sont mises en forme. Le générateur de chaque règle est initialisé à
+partir de `FAILURE_SAMPLE_SEED` et de la règle : l'échantillon est
+reproductible d'une exécution à l'autre sur les mêmes données.
+"""
+
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from cles import formater
+from regles import CLES_LIGNE
+
+# Lignes échantillonnées par règle (0 = pas de capture des échecs)
+FAILURE_SAMPLE_SIZE = int(os.getenv("FAILURE_SAMPLE_SIZE", "100"))
+FAILURE_SAMPLE_SEED = int(os.getenv("FAILURE_SAMPLE_SEED", "42"))
+
+COLONNES_REGLE = ['run_date', 'table_name', 'column_name', 'pilier', 'rule_name']
+COLONNES_ECHECS = [*COLONNES_REGLE, 'error_type', 'row_key', 'row_values']
+COLONNES_COMPTES = [*COLONNES_REGLE, 'error_type', 'nb_lignes']
+
+SCHEMA_ECHECS = pa.schema([
+    ('run_date', pa.timestamp('s')),
+    *((nom, pa.string()) for nom in COLONNES_ECHECS[1:]),
+])
+
+
+def _formater(valeur):
+    if pd.isna(valeur):
+        return "NULL"
+    if isinstance(valeur, pd.Timestamp) and valeur == valeur.normalize():
+        return valeur.date().isoformat()
+    return formater(valeur)
+
+
+def _decrire(colonnes, positions):
+    """« col=valeur | col2=valeur » pour chaque position."""
+    valeurs = [(nom, serie.iloc[positions].tolist()) for nom, serie in colonnes]
+    return [" | ".join(f"{nom}={_formater(liste[i])}" for nom, liste in valeurs) for i in range(len(positions))]
+
+
+class Reservoir:
+    """Échantillon uniforme d'au plus `taille` lignes parmi toutes celles proposées."""
+
+    def __init__(self, taille, graine):
+        self.taille = taille
+        self.rng = np.random.default_rng(graine)
+        self.priorites = np.empty(0)
+        self.lignes = []  # (type d'erreur, clé, valeurs), alignées sur self.priorites
+
+    def proposer(self, n):
+        """Tire les priorités de `n` nouvelles lignes ; renvoie (positions retenues, priorités)."""
+        nouvelles = self.rng.random(n)
+        if len(self.priorites) + n <= self.taille:
+            return np.arange(n), nouvelles
+        seuil = np.partition(np.concatenate([self.priorites, nouvelles]), self.taille - 1)[self.taille - 1]
+        gardees = self.priorites <= seuil
+        self.priorites = self.priorites[gardees]
+        self.lignes = [ligne for ligne, garder in zip(self.lignes, gardees) if garder]
+        positions = np.flatnonzero(nouvelles <= seuil)
+        return positions, nouvelles[positions]
+
+    def ajouter(self, priorites, lignes):
+        self.priorites = np.concatenate([self.priorites, priorites])
+        self.lignes.extend(lignes)
+
+
+class MagasinEchecs:
+    """Comptes par type d'erreur et échantillon des lignes en échec, par règle."""
+
+    def __init__(self, taille=FAILURE_SAMPLE_SIZE, graine=FAILURE_SAMPLE_SEED):
+        self.taille = taille
+        self.graine = graine
+        self.comptes = {}      # clé de règle -> {type d'erreur: lignes}
+        self.reservoirs = {}   # clé de règle -> Reservoir
+
+    @property
+    def actif(self):
+        return self.taille > 0
+
+    def capturer(self, cle, plan, masque, types, colonnes):
+        """Enregistre les lignes de `masque` (tableau booléen sur `plan.df`).
+
+        `types` : type d'erreur de chaque ligne en échec, dans l'ordre du bloc ;
+        `colonnes` : [(nom, Series)] des valeurs contrôlées, alignées sur `plan.df`.
+        """
+        positions = np.flatnonzero(masque)
+        comptes = self.comptes.setdefault(cle, {})
+        if len(positions) == 0:
+            return
+        for type_erreur, n in pd.Series(types).value_counts(sort=False).items():
+            comptes[type_erreur] = comptes.get(type_erreur, 0) + int(n)
+
+        if cle not in self.reservoirs:
+            graine = [self.graine, zlib.crc32("|".join(cle).encode())]
+            self.reservoirs[cle] = Reservoir(self.taille, graine)
+        reservoir = self.reservoirs[cle]
+        retenues, priorites = reservoir.proposer(len(positions))
+        if len(retenues) == 0:
+            return
+        lignes = positions[retenues]
+        table = cle[0]
+        colonnes_cle = [(nom, plan.df[nom]) for nom in CLES_LIGNE.get(table, ()) if nom in plan.df]
+        reservoir.ajouter(priorites, list(zip(
+            np.asarray(types, dtype=object)[retenues],
+            _decrire(colonnes_cle, lignes) if colonnes_cle else [f"ligne={i}" for i in lignes],
+            _decrire(colonnes, lignes),
+        )))
+
+    def resumer(self, cle, limite=200):
+        """Texte court pour la colonne error_type : « type (lignes), ... »."""
+        comptes = self.comptes.get(cle)
+        if not comptes:
+            return None
+        texte = ", ".join(f"{t} ({n})" for t, n in sorted(comptes.items(), key=lambda c: -c[1]))
+        return texte if len(texte) <= limite else texte[:limite - 1] + "…"
+
+    def fusionner(self, autre):
+        """Ajoute les résultats d'une unité parallèle (règles disjointes)."""
+        self.comptes.update(autre.comptes)
+        self.reservoirs.update(autre.reservoirs)
+
+    def lignes(self, run_date):
+        """Échantillon des lignes en échec, une ligne par échec retenu."""
+        lignes = [
+            (run_date, *cle, *ligne)
+            for cle, reservoir in self.reservoirs.items()
+            for _, ligne in sorted(zip(reservoir.priorites, reservoir.lignes), key=lambda p: p[0])
+        ]
+        return pd.DataFrame(lignes, columns=COLONNES_ECHECS)
+
+    def comptes_par_type(self, run_date):
+        """Nombre exact de lignes en échec par règle et type d'erreur."""
+        lignes = [(run_date, *cle, t, n) for cle, comptes in self.comptes.items() for t, n in comptes.items()]
+        return pd.DataFrame(lignes, columns=COLONNES_COMPTES)
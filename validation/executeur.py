@@ -0,0 +1,40 @@
+"""
+Exécution parallèle de la validation : le registre est découpé en unités
+indépendantes (une par table, une par clé étrangère), exécutées sur un pool
+de processus ou de threads.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from regles import RegleIntegrite
+
+
+def decouper_en_unites(regles):
+    """[(nom, règles)] : une unité par table, plus une unité par clé étrangère."""
+    unites = {}
+    for regle in regles:
+        if isinstance(regle, RegleIntegrite):
+            nom = f"{regle.table}.{regle.colonne} → {regle.table_ref}"
+        else:
+            nom = regle.table
+        unites.setdefault(nom, []).append(regle)
+    return list(unites.items())
+
+
+def _chronometrer(fonction, unite):
+    debut = time.perf_counter()
+    resultat = fonction(unite)
+    return resultat, time.perf_counter() - debut
+
+
+def executer_unites(fonction, unites, workers, pool="process"):
+    """Applique `fonction` à chaque unité ; résultats renvoyés dans l'ordre des unités.
+
+    `fonction` doit être définie au niveau module (sérialisable) en mode "process".
+    Renvoie [(nom, résultat, durée en secondes)].
+    """
+    Executor = ProcessPoolExecutor if pool == "process" else ThreadPoolExecutor
+    with Executor(max_workers=workers) as executor:
+        futures = [executor.submit(_chronometrer, fonction, unite) for unite in unites]
+        return [(nom, *future.result()) for (nom, _), future in zip(unites, futures)]
@@ -0,0 +1,149 @@
+"""
+Historique de validation en ajout seul.
+
+Chaque exécution écrit un nouveau fichier Parquet dans une partition par date
+(`history/date=AAAA-MM-JJ/`), par renommage atomique : l'historique existant
+n'est jamais relu ni réécrit. Les métriques sont aussi chargées par COPY dans
+les tables PostgreSQL `validation_history` et `superset_validation_metrics`,
+avec les agrégats Superset (voir rollups.py) et les lignes en échec (voir
+echecs.py), dans une seule transaction. `compacter_historique` fusionne les
+petits fichiers d'une même date.
+"""
+
+import io
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from rollups import rafraichir_rollups
+
+COLONNES_HISTORIQUE = [
+    'table_name', 'column_name', 'run_date', 'pilier', 'rule_name',
+    'checks_passed', 'checks_failed', 'success_rate', 'error_type', 'total_expectations',
+]
+
+SCHEMA_HISTORIQUE = pa.schema([
+    ('table_name', pa.string()),
+    ('column_name', pa.string()),
+    ('run_date', pa.timestamp('s')),
+    ('pilier', pa.string()),
+    ('rule_name', pa.string()),
+    ('checks_passed', pa.int64()),
+    ('checks_failed', pa.int64()),
+    ('success_rate', pa.float64()),
+    ('error_type', pa.string()),
+    ('total_expectations', pa.int64()),
+])
+
+# Une métrique est identifiée par son exécution et sa règle (dédoublonnage à la lecture)
+CLES_METRIQUE = ['run_date', 'table_name', 'column_name', 'pilier', 'rule_name']
+
+
+def _normaliser(df):
+    df = df[COLONNES_HISTORIQUE].copy()
+    df['run_date'] = pd.to_datetime(df['run_date'])
+    df['error_type'] = df['error_type'].astype(object).where(df['error_type'].notna(), None)
+    return df
+
+
+def _vers_arrow(df, schema=SCHEMA_HISTORIQUE):
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def _ecrire_atomique(table, chemin):
+    temporaire = chemin.with_name(f".{chemin.name}.tmp")
+    pq.write_table(table, temporaire)
+    os.replace(temporaire, chemin)
+
+
+def ajouter_partitions(df, dossier, schema):
+    """Écrit `df` (colonne run_date datetime) dans une partition par date ; renvoie les fichiers créés."""
+    fichiers = []
+    for jour, df_jour in df.groupby(df['run_date'].dt.date):
+        partition = dossier / f"date={jour.isoformat()}"
+        partition.mkdir(parents=True, exist_ok=True)
+        chemin = partition / f"run-{uuid.uuid4().hex}.parquet"
+        _ecrire_atomique(_vers_arrow(df_jour, schema), chemin)
+        fichiers.append(chemin)
+    return fichiers
+
+
+def ajouter_historique(df_metriques, dossier):
+    """Écrit les métriques d'une exécution dans leur partition ; renvoie les fichiers créés."""
+    return ajouter_partitions(_normaliser(df_metriques), dossier, SCHEMA_HISTORIQUE)
+
+
+def lire_historique(dossier, filtre=None):
+    """Historique complet (ou filtré : expression pyarrow.dataset) sous forme de DataFrame."""
+    if not dossier.exists():
+        return pd.DataFrame(columns=COLONNES_HISTORIQUE)
+    dataset = ds.dataset(dossier, format='parquet', partitioning='hive', schema=SCHEMA_HISTORIQUE,
+                         exclude_invalid_files=True)
+    df = dataset.to_table(filter=filtre, columns=COLONNES_HISTORIQUE).to_pandas()
+    # Une compaction interrompue peut laisser une même métrique dans deux fichiers
+    return df.drop_duplicates(subset=CLES_METRIQUE).sort_values('run_date', kind='stable').reset_index(drop=True)
+
+
+def compacter_historique(dossier, fichiers_min=2):
+    """Fusionne les fichiers de chaque partition en un seul ; renvoie le nombre de partitions compactées."""
+    compactees = 0
+    for partition in sorted(dossier.glob("date=*")):
+        fichiers = sorted(partition.glob("*.parquet"))
+        if len(fichiers) < fichiers_min:
+            continue
+        df = pd.concat([pq.read_table(f).to_pandas() for f in fichiers], ignore_index=True)
+        df = df.drop_duplicates(subset=CLES_METRIQUE)
+        # Le fichier fusionné est en place avant la suppression des anciens
+        _ecrire_atomique(_vers_arrow(df), partition / f"compact-{uuid.uuid4().hex}.parquet")
+        for fichier in fichiers:
+            fichier.unlink()
+        compactees += 1
+        print(f"  ✓ {partition.name} : {len(fichiers)} fichiers → 1 ({len(df):,} métriques)")
+    return compactees
+
+
+def migrer_csv(fichier_csv, dossier):
+    """Import unique de l'ancien validation_history.csv dans le magasin Parquet."""
+    if dossier.exists() or not fichier_csv.exists():
+        return False
+    df = pd.read_csv(fichier_csv)
+    if not df.empty:
+        ajouter_historique(df, dossier)
+    return True
+
+
+def _copier(curseur, table_sql, colonnes, df):
+    tampon = io.StringIO()
+    df.to_csv(tampon, index=False, header=False)
+    tampon.seek(0)
+    curseur.copy_expert(f"COPY {table_sql} ({', '.join(colonnes)}) FROM STDIN WITH (FORMAT csv)", tampon)
+
+
+def charger_en_base(engine, df_metriques, df_superset, autres=()):
+    """COPY des métriques dans validation_history et superset_validation_metrics, puis mise à jour
+    des agrégats Superset, dans une seule transaction.
+
+    `autres` : [(table SQL, DataFrame)] chargés dans la même transaction (lignes en échec).
+    """
+    superset = pd.DataFrame({
+        'table_name': df_superset['table'],
+        'pilier': df_superset['pilier'],
+        'regle': df_superset['règle'],
+        'colonne': df_superset['colonne'],
+        'date_run': df_superset['date_run'],
+        'passed': df_superset['passed'],
+        'failed': df_superset['failed'],
+        'pct_succes': df_metriques['success_rate'],
+        'erreurs': df_superset['erreurs'],
+    })
+    with engine.begin() as conn:
+        curseur = conn.connection.cursor()
+        _copier(curseur, 'validation_history', COLONNES_HISTORIQUE, df_metriques[COLONNES_HISTORIQUE])
+        _copier(curseur, 'superset_validation_metrics', list(superset.columns), superset)
+        for table_sql, df in autres:
+            _copier(curseur, table_sql, list(df.columns), df)
+        rafraichir_rollups(conn, df_metriques['run_date'].unique())
@@ -0,0 +1,307 @@
+"""
+Validation incrémentale de la Couche 3.
+
+Chaque table est découpée en partitions selon sa colonne de filigrane (semaine,
+date de consultation, date d'arrivée). PostgreSQL calcule une empreinte par
+partition (nombre de lignes + somme des hachages de lignes) : seules les
+partitions nouvelles ou modifiées sont relues et revalidées. Leurs comptes
+partiels remplacent ceux stockés, et la somme sur toutes les partitions donne
+les mêmes métriques qu'une validation complète.
+
+Les règles d'unicité gardent un index des clés distinctes par partition (ou,
+avec `approx`, une esquisse HyperLogLog par partition, fusionnée à chaque
+exécution), et les clés étrangères la liste de leurs valeurs orphelines,
+recontrôlées à chaque exécution contre les valeurs de référence persistées.
+"""
+
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from cles import VERSION_HACHAGE, hacher
+from regles import (
+    REGLES, RegleLigne, RegleRemplissage, RegleUnicite, RegleIntegrite,
+    PlanCalcul, colonnes_requises,
+)
+
+# Colonne de partitionnement par table ; None = une seule partition (table relue si elle change)
+COLONNES_FILIGRANE = {
+    'staff': None,
+    'patients': 'arrival_date',
+    'consultations': 'consultationdate',
+    'staff_schedule': 'week',
+    'services_weekly': 'week',
+}
+
+PARTITION = '__partition__'
+
+
+def etat_vide():
+    return {
+        'empreintes': {},   # partition -> (lignes, somme des hachages)
+        'comptes': {},      # clé de règle -> {partition: [valides ou remplis, total]}
+        'cles': {},         # clé de règle -> DataFrame [partition, k0..kn] (unicité) ou [partition, valeur, n] (orphelins)
+        'references': {},   # colonne -> DataFrame [partition, valeur] : valeurs distinctes référencées
+        'esquisses': {},    # clé de règle -> {partition: HyperLogLog} (unicité approchée)
+        'hachage': VERSION_HACHAGE,  # version de cles.hacher des esquisses
+    }
+
+
+def charger_etat(dossier, alias):
+    fichier = dossier / f"etat_{alias}.pkl"
+    if not fichier.exists():
+        return etat_vide()
+    with open(fichier, 'rb') as f:
+        return pickle.load(f)
+
+
+def sauver_etat(dossier, alias, etat):
+    """Écriture atomique : un état partiellement écrit n'est jamais relu."""
+    fichier = dossier / f"etat_{alias}.pkl"
+    temporaire = fichier.with_suffix('.tmp')
+    with open(temporaire, 'wb') as f:
+        pickle.dump(etat, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporaire, fichier)
+
+
+def expression_partition(colonne):
+    return f"{colonne}::text" if colonne else "NULL::text"
+
+
+def lire_empreintes(conn, table_name, colonne):
+    """{partition: (lignes, somme des hachages)} calculé entièrement dans PostgreSQL."""
+    lignes = conn.execute(text(
+        f"SELECT {expression_partition(colonne)} AS partition, COUNT(*) AS lignes, "
+        f"SUM(hashtextextended(t::text, 0)::numeric) AS somme "
+        f"FROM {table_name} t GROUP BY 1"
+    ))
+    return {partition: (n, str(somme)) for partition, n, somme in lignes}
+
+
+def lire_partitions(engine, table_name, colonnes, colonne, partitions):
+    """Lignes des partitions demandées (la partition NULL est désignée par None)."""
+    select = f"SELECT {', '.join(colonnes)}, {expression_partition(colonne)} AS {PARTITION} FROM {table_name}"
+    if colonne is None:
+        return pd.read_sql(text(select), engine)
+    valeurs = [p for p in partitions if p is not None]
+    conditions = [f"{colonne}::text = ANY(:partitions)"]
+    if None in partitions:
+        conditions.append(f"{colonne} IS NULL")
+    return pd.read_sql(text(f"{select} WHERE {' OR '.join(conditions)}"), engine,
+                       params={'partitions': valeurs})
+
+
+def _par_partition(serie, partitions):
+    """{partition: somme} ; la partition NaN devient None."""
+    sommes = serie.groupby(partitions, dropna=False).sum()
+    return {(None if pd.isna(p) else p): int(v) for p, v in sommes.items()}
+
+
+def _retirer_partitions(df, partitions):
+    if df is None:
+        return None
+    garder = ~df[PARTITION].isin([p for p in partitions if p is not None])
+    if None in partitions:
+        garder &= df[PARTITION].notna()
+    return df[garder]
+
+
+def ensemble_reference(etats, regle):
+    reference = etats[regle.table_ref]['references'].get(regle.reference)
+    if reference is None:
+        return pd.Index([])
+    return pd.Index(reference['valeur']).unique()
+
+
+def esquisses_par_partition(colonnes, partitions):
+    """{partition: HyperLogLog des combinaisons non nulles de `colonnes`}."""
+    from esquisses import HyperLogLog
+    hachages = hacher(colonnes)
+    non_nuls = ~np.logical_or.reduce([c.isna().to_numpy() for c in colonnes])
+    esquisses = {}
+    for p, positions in pd.Series(np.arange(len(hachages))[non_nuls]).groupby(
+            partitions.to_numpy()[non_nuls], dropna=False):
+        esquisses[None if pd.isna(p) else p] = HyperLogLog()
+        esquisses[None if pd.isna(p) else p].ajouter(hachages[positions.to_numpy()])
+    return esquisses
+
+
+def evaluer_partitions(regle, plan, partitions, etat, etats, approx=False):
+    """Met à jour les comptes partiels (et index) de la règle pour les partitions relues."""
+    comptes = etat['comptes'].setdefault(regle.cle(), {})
+    lignes = _par_partition(pd.Series(1, index=plan.df.index), partitions)
+
+    if isinstance(regle, RegleLigne):
+        valide = plan.valeur(regle.predicat)
+        domaine = plan.valeur(regle.domaine) if regle.domaine is not None else None
+        valides = _par_partition(valide & domaine if domaine is not None else valide, partitions)
+        totaux = _par_partition(domaine, partitions) if domaine is not None else lignes
+        for p in lignes:
+            comptes[p] = [valides.get(p, 0), totaux.get(p, 0)]
+
+    elif isinstance(regle, RegleRemplissage):
+        remplis = _par_partition(plan.valeur(regle.expression).notna(), partitions)
+        for p, n in lignes.items():
+            comptes[p] = [remplis.get(p, 0), n]
+
+    elif isinstance(regle, RegleUnicite) and approx:
+        # comptes : [lignes non nulles, lignes] ; les partitions sans clé non nulle n'ont pas d'esquisse
+        non_nuls = _par_partition(~pd.concat([plan.valeur(e).isna() for e in regle.cles], axis=1).any(axis=1),
+                                  partitions)
+        for p, n in lignes.items():
+            comptes[p] = [non_nuls.get(p, 0), n]
+        esquisses = etat['esquisses'].setdefault(regle.cle(), {})
+        esquisses.update(esquisses_par_partition([plan.valeur(e) for e in regle.cles], partitions))
+
+    elif isinstance(regle, RegleUnicite):
+        for p, n in lignes.items():
+            comptes[p] = [0, n]
+        cles = pd.DataFrame({f"k{i}": plan.valeur(e) for i, e in enumerate(regle.cles)})
+        cles[PARTITION] = partitions
+        nouvelles = cles.dropna(subset=[c for c in cles.columns if c != PARTITION]).drop_duplicates()
+        etat['cles'][regle.cle()] = pd.concat([etat['cles'].get(regle.cle()), nouvelles], ignore_index=True)
+
+    elif isinstance(regle, RegleIntegrite):
+        for p, n in lignes.items():
+            comptes[p] = [0, n]
+        valeurs = plan.valeur(regle.valeur)
+        orphelins = pd.DataFrame({PARTITION: partitions, 'valeur': valeurs})[
+            ~valeurs.isin(ensemble_reference(etats, regle))
+        ]
+        orphelins = orphelins.groupby([PARTITION, 'valeur'], dropna=False).size().reset_index(name='n')
+        etat['cles'][regle.cle()] = pd.concat([etat['cles'].get(regle.cle()), orphelins], ignore_index=True)
+
+
+def mettre_a_jour_references(regles, alias, plan, partitions, etat):
+    """Valeurs distinctes des colonnes de `alias` référencées par une clé étrangère."""
+    for regle in regles:
+        if isinstance(regle, RegleIntegrite) and regle.table_ref == alias:
+            valeurs = pd.DataFrame({PARTITION: partitions, 'valeur': plan.valeur(regle.reference)}).drop_duplicates()
+            etat['references'][regle.reference] = pd.concat(
+                [etat['references'].get(regle.reference), valeurs], ignore_index=True
+            ).drop_duplicates()
+
+
+def rapporter(regle, etats, metriques, approx=False):
+    etat = etats[regle.table]
+    comptes = etat['comptes'].get(regle.cle(), {}).values()
+    a = sum(c[0] for c in comptes)
+    total = sum(c[1] for c in comptes)
+
+    if isinstance(regle, RegleLigne):
+        metriques.ajouter_metrique(*regle.cle(), a, total - a)
+
+    elif isinstance(regle, RegleRemplissage):
+        metriques.ajouter_taux_remplissage(*regle.cle(), a, total, regle.seuil)
+
+    elif isinstance(regle, RegleUnicite) and approx:
+        from esquisses import HyperLogLog
+        fusion = HyperLogLog()
+        for esquisse in etat['esquisses'].get(regle.cle(), {}).values():
+            fusion.fusionner(esquisse)
+        distinctes = min(round(fusion.estimer()), a)
+        metriques.ajouter_metrique(*regle.cle(), distinctes, total - distinctes,
+                                   f"estimation HyperLogLog (erreur relative type {fusion.erreur_relative():.2%})")
+
+    elif isinstance(regle, RegleUnicite):
+        cles = etat['cles'].get(regle.cle())
+        distinctes = 0 if cles is None else len(cles.drop(columns=[PARTITION]).drop_duplicates())
+        metriques.ajouter_metrique(*regle.cle(), distinctes, total - distinctes)
+
+    elif isinstance(regle, RegleIntegrite):
+        # Une valeur orpheline devient valide dès que la référence la contient
+        orphelins = etat['cles'].get(regle.cle())
+        if orphelins is not None:
+            orphelins = orphelins[~orphelins['valeur'].isin(ensemble_reference(etats, regle))]
+            etat['cles'][regle.cle()] = orphelins
+        echecs = 0 if orphelins is None else int(orphelins['n'].sum())
+        metriques.ajouter_metrique(*regle.cle(), total - echecs, echecs)
+
+
+def valider_incremental(engine, metriques, tables, annee, dossier, regles=REGLES, approx=False):
+    """`approx` : unicité estimée par des esquisses HyperLogLog persistées par partition
+    au lieu des clés distinctes (état de taille bornée par partition)."""
+    print("\n📥 VALIDATION INCRÉMENTALE (partitions nouvelles ou modifiées uniquement)...")
+    dossier.mkdir(parents=True, exist_ok=True)
+
+    colonnes_par_table = colonnes_requises(regles)
+    etats = {alias: charger_etat(dossier, alias) for alias in tables}
+    modifiees = {}  # alias -> partitions existantes modifiées ou supprimées
+
+    for alias, table_name in tables.items():
+        if alias not in colonnes_par_table:
+            continue
+        etat = etats[alias]
+        etat.setdefault('esquisses', {})  # état antérieur aux esquisses
+        if etat.get('hachage') != VERSION_HACHAGE:
+            # Esquisses d'un autre hachage : non fusionnables, reconstruites par relecture complète
+            etat['esquisses'], etat['hachage'] = {}, VERSION_HACHAGE
+        colonne = COLONNES_FILIGRANE.get(alias)
+        with engine.connect() as conn:
+            empreintes = lire_empreintes(conn, table_name, colonne)
+
+        anciennes = etat['empreintes']
+        a_relire = {p for p, e in empreintes.items() if anciennes.get(p) != e}
+        modifiees[alias] = {p for p in anciennes if anciennes[p] != empreintes.get(p)}
+
+        # Tout revalider si une règle n'a pas encore d'état (registre enrichi, unicité passée
+        # d'exacte à approchée ou l'inverse), ou si une référence modifiée peut invalider des
+        # lignes déjà validées
+        refs = {r.table_ref for r in regles if isinstance(r, RegleIntegrite) and r.table == alias}
+        sans_etat = any(r.cle() not in etat['comptes'] for r in regles if r.table == alias) or any(
+            (r.cle() in etat['esquisses']) != approx for r in regles
+            if isinstance(r, RegleUnicite) and r.table == alias
+        ) or any(
+            r.reference not in etat['references'] for r in regles
+            if isinstance(r, RegleIntegrite) and r.table_ref == alias
+        )
+        if sans_etat or any(modifiees.get(ref) for ref in refs):
+            a_relire = set(empreintes)
+            modifiees[alias] = set(anciennes)
+
+        perimees = a_relire | (set(anciennes) - set(empreintes))
+        for comptes in etat['comptes'].values():
+            for p in perimees:
+                comptes.pop(p, None)
+        for cle, df in etat['cles'].items():
+            etat['cles'][cle] = _retirer_partitions(df, perimees)
+        for cle, df in etat['references'].items():
+            etat['references'][cle] = _retirer_partitions(df, perimees)
+        for cle, esquisses in list(etat['esquisses'].items()):
+            if not approx:
+                del etat['esquisses'][cle]
+                continue
+            for p in perimees:
+                esquisses.pop(p, None)
+        if approx:
+            for regle in regles:
+                if isinstance(regle, RegleUnicite) and regle.table == alias:
+                    etat['cles'].pop(regle.cle(), None)
+
+        if a_relire:
+            with metriques.profil.mesurer('chargement', alias) as mesure:
+                df = lire_partitions(engine, table_name, colonnes_par_table[alias], colonne, a_relire)
+                mesure['lignes'] = len(df)
+            partitions = df.pop(PARTITION)
+            plan = PlanCalcul(df, annee)
+            mettre_a_jour_references(regles, alias, plan, partitions, etat)
+            for regle in regles:
+                if regle.table == alias:
+                    evaluer_partitions(regle, plan, partitions, etat, etats, approx)
+            lues = len(df)
+        else:
+            lues = 0
+
+        etat['empreintes'] = empreintes
+        total = sum(n for n, _ in empreintes.values())
+        print(f"  ✓ {alias:20} : {len(a_relire)}/{len(empreintes)} partitions relues "
+              f"({lues:,} / {total:,} lignes)")
+
+    for regle in regles:
+        rapporter(regle, etats, metriques, approx)
+
+    for alias, etat in etats.items():
+        sauver_etat(dossier, alias, etat)
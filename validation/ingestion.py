@@ -0,0 +1,211 @@
+"""
+Ingestion des CSV et validation en un seul passage.
+
+Chaque fichier est lu par blocs. Un bloc est envoyé à PostgreSQL par
+`COPY ... FROM STDIN` sur l'une des `INGEST_CONNECTIONS` connexions
+parallèles, et le même bloc est évalué par les règles pendant ce temps. Les
+métriques sont prêtes à la fin du chargement, sans relire les tables.
+
+Deux modes :
+  - "full" : TRUNCATE de la table puis chargement (remplace db-init/02_load_data.sql) ;
+  - "append" : ajout aux lignes existantes. Ces lignes sont relues une fois
+    avant le chargement : les métriques portent sur la table complète, comme
+    une validation classique.
+
+Les COPY d'une table sont validés ensemble en fin de fichier, et annulés
+ensemble si l'un d'eux échoue. En mode "full", le TRUNCATE est validé (COMMIT)
+avant les COPY parallèles, car il bloquerait les autres connexions : si le
+chargement échoue, la table reste vide, là où 02_load_data.sql la restaurerait.
+
+Valeurs NULL : seul un champ vide devient NULL. Les textes « NA », « NULL »,
+« nan » ou « None » restent du texte, comme avec COPY ... CSV. Seule différence
+avec 02_load_data.sql : un champ vide entre guillemets ("") devient aussi NULL,
+alors que COPY le charge comme chaîne vide. pandas ne distingue pas les deux
+formes.
+"""
+
+import io
+import os
+import queue
+import threading
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import text
+
+from profil import ProfilExecution
+from typage import typer
+
+# Connexions COPY parallèles (mode et dossier des CSV : INGEST_MODE et INGEST_DIR, voir validation.py)
+INGEST_CONNECTIONS = int(os.getenv("INGEST_CONNECTIONS", "4"))
+
+# Fichier CSV de chaque table brute (mêmes fichiers que db-init/02_load_data.sql)
+FICHIERS_CSV = {
+    'staff': 'enriched_staff.csv',
+    'patients': 'patients.csv',
+    'consultations': 'consultations.csv',
+    'staff_schedule': 'staff_schedule.csv',
+    'services_weekly': 'services_weekly.csv',
+}
+
+TYPES_ENTIER = {'integer', 'bigint', 'smallint'}
+TYPES_REEL = {'double precision', 'real', 'numeric'}
+TYPES_DATE = {'date', 'timestamp without time zone', 'timestamp with time zone'}
+
+
+def colonnes_table(engine, table_name):
+    """[(colonne, type SQL)] dans l'ordre de la table : ordre des champs du CSV, comme COPY."""
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_name = :table ORDER BY ordinal_position"
+        ), {'table': table_name}).all()
+
+
+def lire_csv(chemin, colonnes, taille_bloc):
+    """Blocs de texte brut, en-tête ignoré (colonnes par position).
+
+    Champ vide, avec ou sans guillemets = NULL ; aucune autre chaîne n'est lue comme NULL.
+    """
+    return pd.read_csv(chemin, header=0, names=colonnes, dtype=str, keep_default_na=False,
+                       na_values=[''], chunksize=taille_bloc)
+
+
+def convertir(bloc, types_sql, compact=True):
+    """Types lus depuis PostgreSQL pour les mêmes valeurs (entiers, réels, dates, heures),
+    puis typage compact comme pour une table lue en base."""
+    df = pd.DataFrame(index=bloc.index)
+    for colonne, serie in bloc.items():
+        type_sql = types_sql.get(colonne)
+        if type_sql in TYPES_ENTIER or type_sql in TYPES_REEL:
+            df[colonne] = pd.to_numeric(serie, errors='coerce')
+        elif type_sql in TYPES_DATE:
+            df[colonne] = pd.to_datetime(serie, errors='coerce')
+        elif type_sql == 'time without time zone':
+            heures = pd.to_datetime(serie, format='mixed', errors='coerce')
+            df[colonne] = heures.dt.time.astype(object).where(heures.notna(), None)
+        else:
+            df[colonne] = serie.astype(object).where(serie.notna(), None)
+    return typer(df, types_sql) if compact else df
+
+
+class ChargeurParallele:
+    """COPY des blocs d'une table sur `connexions` connexions, une transaction chacune.
+
+    `envoyer` rend la main dès que le bloc est en file (au plus deux blocs en attente
+    par connexion) ; `terminer` attend la fin des COPY puis valide ou annule le tout.
+    """
+
+    def __init__(self, engine, table_name, colonnes, connexions=INGEST_CONNECTIONS):
+        self.commande = f"COPY {table_name} ({', '.join(colonnes)}) FROM STDIN WITH (FORMAT csv)"
+        self.file = queue.Queue(maxsize=2 * connexions)
+        self.connexions = [engine.raw_connection() for _ in range(connexions)]
+        self.erreurs = []
+        self.threads = [threading.Thread(target=self._copier, args=(conn,), daemon=True)
+                        for conn in self.connexions]
+        for thread in self.threads:
+            thread.start()
+
+    def _copier(self, conn):
+        curseur = conn.cursor()
+        while (bloc := self.file.get()) is not None:
+            if self.erreurs:
+                continue
+            try:
+                tampon = io.StringIO()
+                bloc.to_csv(tampon, index=False, header=False)
+                tampon.seek(0)
+                curseur.copy_expert(self.commande, tampon)
+            except Exception as e:
+                self.erreurs.append(e)
+
+    def envoyer(self, bloc):
+        self.file.put(bloc)
+
+    def terminer(self, valider=True):
+        for _ in self.threads:
+            self.file.put(None)
+        for thread in self.threads:
+            thread.join()
+        try:
+            for conn in self.connexions:
+                if valider and not self.erreurs:
+                    conn.commit()
+                else:
+                    conn.rollback()
+        finally:
+            for conn in self.connexions:
+                conn.close()
+        if valider and self.erreurs:
+            raise self.erreurs[0]
+
+
+def ingerer(engine, tables_raw, dossier, mode, taille_bloc, colonnes_par_table, valider_bloc,
+            lire_existant, compact=True, connexions=INGEST_CONNECTIONS, profil=None):
+    """Charge les CSV de `dossier` dans les tables brutes et valide chaque bloc au passage.
+
+    `valider_bloc(alias, bloc)` reçoit chaque bloc réduit aux colonnes de
+    `colonnes_par_table` et typé (typage compact si `compact`) : lignes existantes en
+    mode "append", puis lignes du CSV. `lire_existant(alias, table_name)` itère sur les
+    lignes déjà en base, typées de la même façon.
+    Une table sans CSV n'est validée que sur son contenu actuel, une table sans règle
+    est chargée sans validation. Renvoie {alias: lignes chargées}.
+    """
+    if engine.dialect.name != "postgresql":
+        raise ValueError("L'ingestion par COPY nécessite PostgreSQL")
+    if mode not in ("full", "append"):
+        raise ValueError(f"Mode d'ingestion inconnu : {mode}")
+    profil = profil or ProfilExecution()
+    dossier = Path(dossier)
+    print(f"\n📥 INGESTION DES CSV ({mode}, {dossier}, {connexions} connexions COPY, "
+          f"blocs de {taille_bloc:,} lignes)...")
+
+    chargees = {}
+    for alias, table_name in tables_raw.items():
+        chemin = dossier / FICHIERS_CSV[alias]
+        requises = colonnes_par_table.get(alias)
+        if not chemin.exists():
+            print(f"  ⚠️  {alias:20} : {chemin.name} absent, table laissée en l'état")
+            for bloc in (lire_existant(alias, table_name) if requises else ()):
+                valider_bloc(alias, bloc)
+            continue
+
+        if mode == "append" and requises:
+            existantes = 0
+            for bloc in lire_existant(alias, table_name):
+                valider_bloc(alias, bloc)
+                existantes += len(bloc)
+            print(f"    {alias:20} : {existantes:,} lignes existantes validées")
+        elif mode == "full":
+            with engine.begin() as conn:
+                conn.execute(text(f"TRUNCATE TABLE {table_name}"))
+
+        types_sql = colonnes_table(engine, table_name)
+        colonnes = [nom for nom, _ in types_sql]
+        chargeur = ChargeurParallele(engine, table_name, colonnes, connexions)
+        lignes, blocs = 0, 0
+        try:
+            blocs_csv = iter(lire_csv(chemin, colonnes, taille_bloc))
+            while True:
+                with profil.mesurer('chargement', alias) as mesure:
+                    bloc = next(blocs_csv, None)
+                    if bloc is not None:
+                        chargeur.envoyer(bloc)
+                        if requises:
+                            converti = convertir(bloc[requises], dict(types_sql), compact)
+                        mesure['lignes'] = len(bloc)
+                if bloc is None:
+                    break
+                if requises:
+                    valider_bloc(alias, converti)
+                lignes += len(bloc)
+                blocs += 1
+        except BaseException:
+            chargeur.terminer(valider=False)
+            raise
+        with profil.mesurer('copy', alias, lignes=lignes):
+            chargeur.terminer()
+        chargees[alias] = lignes
+        etat = "chargées et validées" if requises else "chargées"
+        print(f"  ✓ {alias:20} : {lignes:,} lignes {etat} ({blocs} blocs)")
+    return chargees
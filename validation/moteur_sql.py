@@ -0,0 +1,98 @@
+"""
+Backend SQL de la Couche 3 : les règles des six piliers sont compilées en
+agrégats COUNT(*) FILTER (WHERE ...) et exécutées dans PostgreSQL.
+Un seul parcours par table ; seuls les compteurs remontent côté Python.
+"""
+
+from sqlalchemy import text
+
+from regles import REGLES, RegleLigne, RegleRemplissage, RegleUnicite, RegleIntegrite
+
+
+def compiler_agregats(regle, tables, params):
+    """Expressions d'agrégat d'une règle, dans l'ordre attendu par `rapporter_regle`."""
+    if isinstance(regle, RegleLigne):
+        predicat = regle.predicat.sql(params)
+        if regle.domaine is None:
+            return [f"COUNT(*) FILTER (WHERE {predicat})", "COUNT(*)"]
+        domaine = regle.domaine.sql(params)
+        return [f"COUNT(*) FILTER (WHERE ({domaine}) AND ({predicat}))",
+                f"COUNT(*) FILTER (WHERE {domaine})"]
+
+    if isinstance(regle, RegleRemplissage):
+        return [f"COUNT({regle.expression.sql(params)})", "COUNT(*)"]
+
+    if isinstance(regle, RegleUnicite):
+        cles = [e.sql(params) for e in regle.cles]
+        if len(cles) == 1:
+            distinctes = f"COUNT(DISTINCT {cles[0]})"
+        else:
+            non_nulles = " AND ".join(f"{c} IS NOT NULL" for c in cles)
+            distinctes = f"COUNT(DISTINCT ({', '.join(cles)})) FILTER (WHERE {non_nulles})"
+        return [distinctes, "COUNT(*)"]
+
+    if isinstance(regle, RegleIntegrite):
+        # Comme côté pandas, une clé nulle est valide si la référence contient NULL
+        valeur, reference = regle.valeur.sql(params), regle.reference.sql(params)
+        table_ref = tables[regle.table_ref]
+        return [f"COUNT(*) FILTER (WHERE {valeur} IN (SELECT {reference} FROM {table_ref})"
+                f" OR ({valeur} IS NULL AND EXISTS (SELECT 1 FROM {table_ref} WHERE {reference} IS NULL)))",
+                "COUNT(*)"]
+
+    raise ValueError(f"Type de règle inconnu : {type(regle).__name__}")
+
+
+def compiler_requete(alias, tables, regles, params):
+    """Une requête par table : toutes ses règles dans un seul SELECT d'agrégats."""
+    expressions, positions = [], {}
+    for regle in regles:
+        if regle.table != alias:
+            continue
+        agregats = compiler_agregats(regle, tables, params)
+        positions[regle] = range(len(expressions), len(expressions) + len(agregats))
+        expressions.extend(agregats)
+    colonnes = ",\n       ".join(f"{expr} AS c{j}" for j, expr in enumerate(expressions))
+    return f"SELECT {colonnes}\nFROM {tables[alias]}", positions
+
+
+def rapporter_regle(regle, compteurs, metriques):
+    if isinstance(regle, RegleRemplissage):
+        remplis, total = compteurs
+        metriques.ajouter_taux_remplissage(*regle.cle(), remplis, total, regle.seuil)
+    else:
+        valid, total = compteurs
+        metriques.ajouter_metrique(*regle.cle(), valid, total - valid)
+
+
+def valider_en_sql(engine, metriques, tables, annee, regles=REGLES):
+    """Exécute les règles dans PostgreSQL (une requête par table)."""
+    print("\n🗄️  VALIDATION EN SQL (agrégats calculés dans PostgreSQL)...")
+
+    compteurs = {}
+    with engine.connect() as conn:
+        for alias in tables:
+            params = {'annee': annee}
+            sql, positions = compiler_requete(alias, tables, regles, params)
+            if not positions:
+                continue
+            with metriques.profil.mesurer('requete_sql', alias):
+                ligne = conn.execute(text(sql), params).one()
+            for regle, colonnes in positions.items():
+                compteurs[regle] = [int(ligne[j] or 0) for j in colonnes]
+            print(f"  ✓ {alias:20} : {len(positions)} règles en un parcours")
+
+    for regle in regles:
+        rapporter_regle(regle, compteurs[regle], metriques)
+
+
+def verifier_parite(df_pandas, df_sql):
+    """Compare passed/failed règle par règle ; renvoie la liste des écarts."""
+    cles = ['table_name', 'column_name', 'pilier', 'rule_name']
+    fusion = df_pandas.merge(df_sql, on=cles, how='outer', suffixes=('_pandas', '_sql'), indicator=True)
+    ecarts = fusion[
+        (fusion['_merge'] != 'both')
+        | (fusion['checks_passed_pandas'] != fusion['checks_passed_sql'])
+        | (fusion['checks_failed_pandas'] != fusion['checks_failed_sql'])
+    ]
+    return ecarts[cles + ['checks_passed_pandas', 'checks_passed_sql',
+                          'checks_failed_pandas', 'checks_failed_sql']].to_dict('records')
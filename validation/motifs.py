@@ -0,0 +1,333 @@
+"""
+Noyau vectorisé des motifs de regles.py : téléphone, e-mail, code postal, dossier médical.
+
+Les valeurs sont traitées dans les tampons d'une chaîne Arrow (décalages et
+octets UTF-8), sans créer d'objet Python par ligne :
+  - le masque des valeurs conformes est calculé par pyarrow.compute, avec une
+    traduction RE2 de la regex (automate, sans retour arrière) compilée une
+    fois par validateur ;
+  - le type d'erreur des valeurs non conformes est calculé sur leurs octets, en
+    un passage numpy par bloc de `TAILLE_BLOC` lignes (mêmes libellés que les
+    diagnostics de regles.py).
+
+Les résultats sont ceux de la regex avec le module `re` (str.match sur des
+objets Python) : la traduction RE2 accepte le saut de ligne final que `$`
+tolère, et \\s, \\d y deviennent les classes d'octets ASCII reconnues par `re`.
+Les lignes contenant un caractère non ASCII, où \\d et \\s sont Unicode, sont
+confiées à la regex et au diagnostic Python, de même que les colonnes dont les
+valeurs ne sont pas toutes des chaînes.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from regles import (
+    DIAGNOSTICS_MOTIF, REGEX_DOSSIER_MEDICAL, REGEX_EMAIL, REGEX_NON_CHIFFRE, REGEX_PHONE_FR, REGEX_POSTAL_FR,
+    compiler_regex,
+)
+from typage import TYPE_TEXTE
+
+# Lignes diagnostiquées par passage : la mémoire de travail (un index de ligne par octet) reste bornée
+TAILLE_BLOC = 1 << 20
+
+
+def _classe(motif):
+    """Table de 256 booléens : octets ASCII reconnus par la classe regex `motif` (module `re`)."""
+    regex = re.compile(motif)
+    return np.array([c < 128 and regex.fullmatch(chr(c)) is not None for c in range(256)])
+
+
+CHIFFRE = _classe(r'\d')
+CHIFFRE_NON_NUL = _classe(r'[1-9]')
+ESPACE = _classe(r'\s')
+LETTRE = _classe(r'[a-zA-Z]')
+
+
+def _classe_re2(classe):
+    return "[" + "".join(f"\\x{octet:02x}" for octet in np.flatnonzero(classe)) + "]"
+
+
+def traduire_re2(regex):
+    """Regex RE2 équivalente à `regex` (module `re`) sur du texte ASCII.
+
+    Prévu pour les motifs de regles.py : \\d, \\s hors classes entre crochets, `$` final.
+    """
+    if not regex.endswith('$') or re.search(r'\\\\|\[[^\]]*\\[ds]', regex):
+        raise ValueError(f"Motif non traduisible en RE2 : {regex}")
+    return regex[:-1].replace(r'\d', _classe_re2(CHIFFRE)).replace(r'\s', _classe_re2(ESPACE)) + r'\n?$'
+
+
+def _dans(classe, octets):
+    """Octets (-1 = absent) appartenant à `classe`."""
+    return (octets >= 0) & classe[np.maximum(octets, 0)]
+
+
+def _numpy(tableau_booleen, nul):
+    return tableau_booleen.fill_null(nul).to_numpy(zero_copy_only=False)
+
+
+def lignes_non_ascii(tableau):
+    """Lignes contenant un caractère non ASCII ; test global du tampon d'abord (cas rare)."""
+    donnees = tableau.buffers()[2]
+    if donnees is None or donnees.size == 0 or np.frombuffer(donnees, dtype=np.uint8).max() < 128:
+        return np.zeros(len(tableau), dtype=bool)
+    return ~_numpy(pc.string_is_ascii(tableau), True)
+
+
+# =========================
+# OCTETS D'UNE CHAÎNE ARROW
+# =========================
+
+def en_arrow(valeurs):
+    """Chaîne Arrow des valeurs (sans copie si elles y sont déjà) ; None si ce ne sont pas des chaînes."""
+    dtype = valeurs.dtype
+    texte_arrow = isinstance(dtype, pd.ArrowDtype) and (
+        pa.types.is_string(dtype.pyarrow_dtype) or pa.types.is_large_string(dtype.pyarrow_dtype))
+    try:
+        if isinstance(dtype, pd.StringDtype) or texte_arrow:
+            tableau = pa.array(valeurs)
+        elif dtype == object and pd.api.types.infer_dtype(valeurs, skipna=True) in ('string', 'empty'):
+            tableau = pa.array(valeurs.to_numpy(), type=pa.large_string(), from_pandas=True)
+        else:
+            return None
+    except (pa.ArrowException, UnicodeError):  # chaînes non encodables en UTF-8
+        return None
+    return tableau.combine_chunks() if isinstance(tableau, pa.ChunkedArray) else tableau
+
+
+class Octets:
+    """Bloc de chaînes Arrow vu comme un tableau d'octets : la ligne i est octets[debuts[i]:debuts[i] + longueurs[i]]."""
+
+    def __init__(self, tableau):
+        if not pa.types.is_string(tableau.type) and not pa.types.is_large_string(tableau.type):
+            tableau = tableau.cast(pa.large_string())
+        self.n = len(tableau)
+        _, decalages, donnees = tableau.buffers()
+        type_decalage = np.int64 if pa.types.is_large_string(tableau.type) else np.int32
+        decalages = np.frombuffer(decalages, dtype=type_decalage)[tableau.offset:tableau.offset + self.n + 1]
+        decalages = decalages.astype(np.int64)
+        donnees = np.empty(0, dtype=np.uint8) if donnees is None else np.frombuffer(donnees, dtype=np.uint8)
+        self.octets = donnees[decalages[0]:decalages[-1]]
+        self.debuts = decalages[:-1] - decalages[0]
+        self.longueurs = np.diff(decalages)
+        self.ligne = np.repeat(np.arange(self.n), self.longueurs)
+        self.position = np.arange(len(self.octets)) - self.debuts[self.ligne]
+
+    def compter(self, marques):
+        """Octets marqués de chaque ligne."""
+        cumul = np.concatenate([[0], np.cumsum(marques)])
+        return cumul[self.debuts + self.longueurs] - cumul[self.debuts]
+
+    def octet(self, position):
+        """Octet à `position` (scalaire ou par ligne) de chaque ligne, -1 hors de la valeur."""
+        position = np.broadcast_to(position, (self.n,))
+        dedans = (position >= 0) & (position < self.longueurs)
+        if not dedans.any():
+            return np.full(self.n, -1, dtype=np.int16)
+        return np.where(dedans, self.octets[np.where(dedans, self.debuts + position, 0)].astype(np.int16), -1)
+
+    def commence(self, prefixe):
+        """Lignes qui commencent par les octets `prefixe`."""
+        resultat = np.ones(self.n, dtype=bool)
+        for k, octet in enumerate(prefixe):
+            resultat &= self.octet(k) == octet
+        return resultat
+
+    def _extremes(self, marques, dernier):
+        """Position du premier (ou dernier) octet marqué de chaque ligne, -1 s'il n'y en a pas."""
+        index = np.flatnonzero(marques)
+        lignes = self.ligne[index]
+        bords = np.ones(len(index), dtype=bool)
+        if dernier:
+            bords[:-1] = lignes[1:] != lignes[:-1]
+        else:
+            bords[1:] = lignes[1:] != lignes[:-1]
+        resultat = np.full(self.n, -1, dtype=np.int64)
+        resultat[lignes[bords]] = self.position[index[bords]]
+        return resultat
+
+    def premier(self, marques):
+        return self._extremes(marques, dernier=False)
+
+    def dernier(self, marques, fin):
+        """Position du dernier octet marqué avant `fin` (par ligne), -1 s'il n'y en a pas."""
+        return self._extremes(marques & (self.position < fin[self.ligne]), dernier=True)
+
+    def premiers(self, marques, nombre):
+        """Les `nombre` premiers octets marqués de chaque ligne (n × nombre, -1 au-delà)."""
+        avant = np.cumsum(marques) - marques
+        rang = avant - avant[self.debuts[self.ligne]]
+        retenus = marques & (rang < nombre)
+        resultat = np.full((self.n, nombre), -1, dtype=np.int16)
+        resultat[self.ligne[retenus], rang[retenus]] = self.octets[retenus]
+        return resultat
+
+    def fin_utile(self):
+        """Longueur sans le saut de ligne final, que `$` accepte avant la fin de la valeur."""
+        return self.longueurs - (self.octet(self.longueurs - 1) == ord('\n'))
+
+
+# =========================
+# VALIDATEURS
+# =========================
+
+def verifier_regex(valeurs, regex):
+    """Référence ligne à ligne : str.match avec `re` et diagnostic Python de regles.py.
+
+    Renvoie (masque, types d'erreur) ; le type d'une valeur conforme est None.
+    """
+    valeurs = pd.Series(np.asarray(valeurs, dtype=object), dtype=object)
+    masque = valeurs.str.match(compiler_regex(regex), na=False).to_numpy(dtype=bool)
+    erreurs = np.full(len(valeurs), None, dtype=object)
+    renseignees = valeurs.notna().to_numpy()
+    erreurs[~masque & ~renseignees] = 'valeur manquante'
+    a_diagnostiquer = ~masque & renseignees
+    diagnostic = DIAGNOSTICS_MOTIF.get(regex)
+    if diagnostic is None:
+        erreurs[a_diagnostiquer] = 'format invalide'
+    elif a_diagnostiquer.any():
+        erreurs[a_diagnostiquer] = diagnostic(pd.Series([str(v) for v in valeurs[a_diagnostiquer]], dtype=object))
+    return masque, erreurs
+
+
+class Validateur:
+    """Masque des valeurs conformes à `regex` et type d'erreur des autres."""
+
+    regex = None
+
+    def __init__(self):
+        self.options = pc.MatchSubstringOptions(traduire_re2(self.regex))
+
+    def diagnostiquer(self, bloc):
+        """Type d'erreur de chaque ligne de `bloc` (valeurs ASCII non conformes)."""
+        raise NotImplementedError
+
+    def verifier(self, valeurs):
+        """(masque, types d'erreur) de chaque valeur de la Series `valeurs` ; None pour une valeur conforme."""
+        if isinstance(valeurs.dtype, pd.CategoricalDtype):
+            # Une seule vérification par catégorie ; code -1 = valeur absente
+            masque, erreurs = self.verifier(pd.Series(valeurs.cat.categories))
+            codes = valeurs.cat.codes.to_numpy()
+            return np.append(masque, False)[codes], np.append(erreurs, 'valeur manquante')[codes]
+        tableau = en_arrow(valeurs)
+        if tableau is None:
+            return verifier_regex(valeurs, self.regex)
+
+        masque = _numpy(pc.match_substring_regex(tableau, options=self.options), False)
+        non_ascii = lignes_non_ascii(tableau)
+        renseignees = tableau.is_valid().to_numpy(zero_copy_only=False)
+        erreurs = np.full(len(tableau), None, dtype=object)
+        erreurs[~renseignees] = 'valeur manquante'
+        a_diagnostiquer = np.flatnonzero(~masque & renseignees & ~non_ascii)
+        for debut in range(0, len(a_diagnostiquer), TAILLE_BLOC):
+            positions = a_diagnostiquer[debut:debut + TAILLE_BLOC]
+            erreurs[positions] = self.diagnostiquer(Octets(tableau.take(positions)))
+        if non_ascii.any():
+            positions = np.flatnonzero(non_ascii)
+            masque[positions], erreurs[positions] = verifier_regex(tableau.take(positions).to_pylist(), self.regex)
+        return masque, erreurs
+
+
+class ValidateurTelephone(Validateur):
+    regex = REGEX_PHONE_FR
+
+    def diagnostiquer(self, bloc):
+        octets = bloc.octets
+        espace = ESPACE[octets]
+        invalides = bloc.compter(~(CHIFFRE[octets] | espace | (octets == ord('+')))) > 0
+        # Préfixe et longueur lus sur la valeur sans espaces ; « 0033 » essayé avant « 0 »
+        compact = bloc.premiers(~espace, 5)
+        prefixe = np.select(
+            [np.all(compact[:, :len(p)] == np.frombuffer(p, dtype=np.uint8), axis=1) for p in (b'0033', b'0', b'+33')],
+            [4, 1, 3], -1)
+        prefixe_valide = (prefixe >= 0) & _dans(CHIFFRE_NON_NUL, compact[np.arange(bloc.n), np.clip(prefixe, 0, 4)])
+        longueur = bloc.longueurs - bloc.compter(espace) - prefixe
+        return np.select(
+            [invalides, ~prefixe_valide, longueur != 9],
+            ['caractères invalides', 'préfixe invalide', 'longueur invalide'],
+            'espacement invalide',
+        )
+
+
+class ValidateurEmail(Validateur):
+    regex = REGEX_EMAIL
+
+    def diagnostiquer(self, bloc):
+        arobase = bloc.octets == ord('@')
+        arobases = bloc.compter(arobase)
+        # @[^@]+\.[a-zA-Z]{2,}$ : point juste avant la suite finale de lettres, au moins un caractère après « @ »
+        fin = bloc.fin_utile()
+        point = bloc.dernier(~LETTRE[bloc.octets], fin)
+        domaine = (fin - point > 2) & (bloc.octet(point) == ord('.')) & (point >= bloc.premier(arobase) + 2)
+        return np.select(
+            [arobases == 0, arobases > 1, ~domaine],
+            ['arobase manquante', 'plusieurs arobases', 'domaine invalide'],
+            'caractères invalides',
+        )
+
+
+class ValidateurCodePostal(Validateur):
+    regex = REGEX_POSTAL_FR
+
+    def diagnostiquer(self, bloc):
+        return np.select(
+            [bloc.longueurs == 0, bloc.longueurs != 5, bloc.octet(0) == ord('0')],
+            ['valeur manquante', 'longueur invalide', 'commence par 0'],
+            'format invalide',
+        )
+
+
+class ValidateurDossierMedical(Validateur):
+    regex = REGEX_DOSSIER_MEDICAL
+
+    def diagnostiquer(self, bloc):
+        return np.select(
+            [~bloc.commence(b'MRN-'), bloc.longueurs != 9],
+            ['préfixe invalide', 'longueur invalide'],
+            'caractères invalides',
+        )
+
+
+VALIDATEURS = {v.regex: v for v in (ValidateurTelephone(), ValidateurEmail(), ValidateurCodePostal(),
+                                    ValidateurDossierMedical())}
+
+
+def verifier(valeurs, regex):
+    """(masque, types d'erreur) de `valeurs` pour `regex` : noyau vectorisé si le motif en a un."""
+    validateur = VALIDATEURS.get(regex)
+    if validateur is None:
+        return verifier_regex(valeurs, regex)
+    return validateur.verifier(valeurs)
+
+
+# =========================
+# NETTOYAGE
+# =========================
+
+def chiffres_seuls(valeurs):
+    """Chiffres seuls de chaque valeur, '' si elle est absente (CodePostalNettoye), en chaîne Arrow.
+
+    None si les valeurs ne sont pas toutes des chaînes.
+    """
+    if isinstance(valeurs.dtype, pd.CategoricalDtype):
+        propres = chiffres_seuls(pd.Series(valeurs.cat.categories))
+        if propres is None:
+            return None
+        tableau = pa.array(np.append(propres.to_numpy(dtype=object), '')[valeurs.cat.codes.to_numpy()],
+                           type=pa.large_string())
+        return pd.Series(pd.array(tableau, dtype=TYPE_TEXTE), index=valeurs.index)
+    tableau = en_arrow(valeurs)
+    if tableau is None:
+        return None
+    # Texte ASCII : \D équivaut à [^0-9]
+    propres = pc.replace_substring_regex(tableau, pattern='[^0-9]', replacement='').fill_null('')
+    non_ascii = lignes_non_ascii(tableau)
+    if non_ascii.any():
+        regex = compiler_regex(REGEX_NON_CHIFFRE)
+        remplacements = [regex.sub('', v) for v in tableau.filter(pa.array(non_ascii)).to_pylist()]
+        propres = pc.replace_with_mask(propres, pa.array(non_ascii), pa.array(remplacements, type=propres.type))
+    return pd.Series(pd.array(propres, dtype=TYPE_TEXTE), index=valeurs.index)
@@ -0,0 +1,149 @@
+"""
+Profil d'exécution de la validation.
+
+Chaque étape mesurée (chargement d'une table, règle, requête SQL, exécution
+complète) cumule ses appels, son temps horloge, son temps CPU, les lignes
+parcourues et la hausse du pic de mémoire résidente du processus. En mode
+streaming, les blocs successifs d'une même table ou règle sont cumulés sur une
+seule ligne. Les lignes par pilier sont la somme des règles du pilier.
+
+Le profil est écrit à côté de l'historique (partitions Parquet `run_profile/`,
+table `validation_run_profile`) pour suivre le coût du pipeline dans le temps.
+`PROFILE_DUMP` ajoute un profil détaillé des appels (cProfile ou pyinstrument).
+"""
+
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+
+# Profil détaillé des appels : "" (aucun), "cprofile" (.prof) ou "pyinstrument" (.html, paquet optionnel)
+PROFILE_DUMP = os.getenv("PROFILE_DUMP", "")
+
+COLONNES_PROFIL = [
+    'run_date', 'stage', 'table_name', 'column_name', 'pilier', 'rule_name',
+    'calls', 'wall_s', 'cpu_s', 'rows', 'peak_mem_delta_mb',
+]
+
+SCHEMA_PROFIL = pa.schema([
+    ('run_date', pa.timestamp('s')),
+    ('stage', pa.string()),
+    ('table_name', pa.string()),
+    ('column_name', pa.string()),
+    ('pilier', pa.string()),
+    ('rule_name', pa.string()),
+    ('calls', pa.int64()),
+    ('wall_s', pa.float64()),
+    ('cpu_s', pa.float64()),
+    ('rows', pa.int64()),
+    ('peak_mem_delta_mb', pa.float64()),
+])
+
+# ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+_OCTETS_MAXRSS = 1 if sys.platform == 'darwin' else 1024
+
+
+def _pic_memoire():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _OCTETS_MAXRSS
+
+
+class ProfilExecution:
+    """Mesures cumulées par étape : (stage, table, colonne, pilier, règle) -> compteurs."""
+
+    def __init__(self):
+        self.mesures = {}
+
+    @contextmanager
+    def mesurer(self, stage, table_name=None, column_name=None, pilier=None, rule_name=None, lignes=0):
+        """Mesure le bloc `with` ; la mesure produite (dict) accepte `lignes` connu en fin de bloc."""
+        mesure = {'lignes': lignes}
+        debut, debut_cpu, pic = time.perf_counter(), time.process_time(), _pic_memoire()
+        try:
+            yield mesure
+        finally:
+            cle = (stage, table_name, column_name, pilier, rule_name)
+            cumul = self.mesures.setdefault(cle, [0, 0.0, 0.0, 0, 0])
+            cumul[0] += 1
+            cumul[1] += time.perf_counter() - debut
+            cumul[2] += time.process_time() - debut_cpu
+            cumul[3] += int(mesure['lignes'])
+            cumul[4] = max(cumul[4], _pic_memoire() - pic)
+
+    def fusionner(self, autre):
+        """Ajoute les mesures d'une unité parallèle."""
+        for cle, (appels, duree, cpu, lignes, memoire) in autre.mesures.items():
+            cumul = self.mesures.setdefault(cle, [0, 0.0, 0.0, 0, 0])
+            cumul[0] += appels
+            cumul[1] += duree
+            cumul[2] += cpu
+            cumul[3] += lignes
+            cumul[4] = max(cumul[4], memoire)
+
+    def to_dataframe(self, run_date):
+        lignes = [(run_date, *cle, *cumul) for cle, cumul in self.mesures.items()]
+        df = pd.DataFrame(lignes, columns=COLONNES_PROFIL)
+        regles = df[df['stage'] == 'regle']
+        piliers = regles.groupby('pilier', sort=False).agg(
+            calls=('calls', 'sum'), wall_s=('wall_s', 'sum'), cpu_s=('cpu_s', 'sum'),
+            rows=('rows', 'sum'), peak_mem_delta_mb=('peak_mem_delta_mb', 'max'),
+        ).reset_index()
+        piliers = piliers.assign(run_date=run_date, stage='pilier', table_name=None, column_name=None, rule_name=None)
+        df = pd.concat([df, piliers[COLONNES_PROFIL]], ignore_index=True)
+        df['run_date'] = pd.to_datetime(df['run_date'])
+        df['wall_s'] = df['wall_s'].round(4)
+        df['cpu_s'] = df['cpu_s'].round(4)
+        df['peak_mem_delta_mb'] = (df['peak_mem_delta_mb'] / 2 ** 20).round(1)
+        return df
+
+
+def afficher_profil(df_profil, limite=5):
+    """Résumé console : étapes hors règles, puis les règles les plus coûteuses."""
+    print("\n⏱️  PROFIL D'EXÉCUTION")
+    for _, ligne in df_profil[df_profil['stage'] != 'regle'].iterrows():
+        nom = ligne['table_name'] or ligne['pilier'] or ''
+        print(f"  • {ligne['stage']:12} {nom:20} : {ligne['wall_s']:8.2f} s "
+              f"(CPU {ligne['cpu_s']:.2f} s, {ligne['rows']:,} lignes, pic +{ligne['peak_mem_delta_mb']:.1f} Mo)")
+    regles = df_profil[df_profil['stage'] == 'regle'].nlargest(limite, 'wall_s')
+    for _, ligne in regles.iterrows():
+        nom = f"{ligne['table_name']}.{ligne['rule_name']}"
+        print(f"  • {'règle':12} {nom:50} : {ligne['wall_s']:8.3f} s")
+
+
+@contextmanager
+def profil_appels(mode, dossier, horodatage):
+    """Profil détaillé des appels du bloc `with` (processus principal uniquement)."""
+    if mode == "cprofile":
+        import cProfile
+        profileur = cProfile.Profile()
+        profileur.enable()
+        try:
+            yield
+        finally:
+            profileur.disable()
+            dossier.mkdir(parents=True, exist_ok=True)
+            fichier = dossier / f"run-{horodatage}.prof"
+            profileur.dump_stats(fichier)
+            print(f"  ✓ Profil cProfile : {fichier}")
+    elif mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("  ⚠️  pyinstrument non installé : profil détaillé ignoré")
+            yield
+            return
+        profileur = Profiler()
+        profileur.start()
+        try:
+            yield
+        finally:
+            profileur.stop()
+            dossier.mkdir(parents=True, exist_ok=True)
+            fichier = dossier / f"run-{horodatage}.html"
+            fichier.write_text(profileur.output_html(), encoding='utf-8')
+            print(f"  ✓ Profil pyinstrument : {fichier}")
+    else:
+        yield
@@ -0,0 +1,628 @@
+"""
+Registre déclaratif des règles de validation (6 piliers).
+
+Chaque règle déclare sa table, ses colonnes, son pilier et son prédicat sous forme
+d'expressions. Les expressions s'évaluent en pandas (via `PlanCalcul`, qui calcule
+chaque colonne dérivée une seule fois par table) et se compilent en SQL pour le
+backend PostgreSQL.
+"""
+
+import operator
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Regex FR
+REGEX_PHONE_FR = r'^(\+33|0033|0)[1-9](\s?\d{2}){4}$'
+REGEX_EMAIL = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+REGEX_POSTAL_FR = r'^[1-9]\d{4}$'  # 5 chiffres sans 0 initial
+REGEX_DOSSIER_MEDICAL = r'^MRN-\d{5}$'
+REGEX_NON_CHIFFRE = r'\D'
+
+# Énumérations
+VALID_ROLES = ('doctor', 'nurse', 'nursing_assistant')
+VALID_SERVICES = ('emergency', 'surgery', 'general_medicine', 'ICU', 'cardiology', 'neurology', 'pediatrics')
+VALID_GENRES = ('Male', 'Female', 'Other')
+
+# Seuils
+SEUIL_REMPLISSAGE_TELEPHONE = 0.7
+DATE_ACTUALITE = pd.Timestamp('2020-01-01')
+
+
+@lru_cache(maxsize=None)
+def compiler_regex(motif):
+    return re.compile(motif)
+
+
+def _etiqueter(conditions, etiquettes, defaut):
+    """Première étiquette dont la condition est vraie, ligne par ligne."""
+    return np.select([np.asarray(c, dtype=bool) for c in conditions], etiquettes, default=defaut).astype(object)
+
+
+def _borne(valeur):
+    return valeur.date().isoformat() if isinstance(valeur, pd.Timestamp) else str(valeur)
+
+
+def diagnostic_telephone(valeurs):
+    compact = valeurs.str.replace(r'\s', '', regex=True)
+    return _etiqueter(
+        [valeurs.str.contains(r'[^\d\s+]'),
+         ~compact.str.match(r'(\+33|0033|0)[1-9]'),
+         compact.str.replace(r'^(\+33|0033|0)', '', regex=True).str.len() != 9],
+        ['caractères invalides', 'préfixe invalide', 'longueur invalide'],
+        'espacement invalide',
+    )
+
+
+def diagnostic_email(valeurs):
+    arobases = valeurs.str.count('@')
+    return _etiqueter(
+        [arobases == 0, arobases > 1, ~valeurs.str.contains(r'@[^@]+\.[a-zA-Z]{2,}$')],
+        ['arobase manquante', 'plusieurs arobases', 'domaine invalide'],
+        'caractères invalides',
+    )
+
+
+def diagnostic_code_postal(valeurs):
+    return _etiqueter(
+        [valeurs == '', valeurs.str.len() != 5, valeurs.str.startswith('0')],
+        ['valeur manquante', 'longueur invalide', 'commence par 0'],
+        'format invalide',
+    )
+
+
+def diagnostic_dossier_medical(valeurs):
+    return _etiqueter(
+        [~valeurs.str.startswith('MRN-'), valeurs.str.len() != 9],
+        ['préfixe invalide', 'longueur invalide'],
+        'caractères invalides',
+    )
+
+
+# Type d'erreur dérivé d'une valeur non nulle qui ne respecte pas le motif
+# (référence des noyaux vectorisés de motifs.py)
+DIAGNOSTICS_MOTIF = {
+    REGEX_PHONE_FR: diagnostic_telephone,
+    REGEX_EMAIL: diagnostic_email,
+    REGEX_POSTAL_FR: diagnostic_code_postal,
+    REGEX_DOSSIER_MEDICAL: diagnostic_dossier_medical,
+}
+
+
+def parametre(params, valeur):
+    """Ajoute une valeur liée à `params` et renvoie son marqueur SQL."""
+    nom = f"p{len(params)}"
+    params[nom] = valeur
+    return f":{nom}"
+
+
+# =========================
+# EXPRESSIONS
+# =========================
+# Dataclasses figées : deux expressions identiques sont égales et partagent
+# la même entrée dans le cache de `PlanCalcul`.
+
+class Expression:
+    def enfants(self):
+        return ()
+
+    def colonnes(self):
+        return set().union(*(e.colonnes() for e in self.enfants()))
+
+    def calculer(self, plan):
+        raise NotImplementedError
+
+    def sql(self, params):
+        raise NotImplementedError
+
+    def diagnostiquer(self, plan, masque):
+        """Type d'erreur de chaque ligne de `masque` où ce prédicat est faux."""
+        return np.full(int(masque.sum()), 'règle non respectée', dtype=object)
+
+
+@dataclass(frozen=True)
+class Col(Expression):
+    nom: str
+
+    def colonnes(self):
+        return {self.nom}
+
+    def calculer(self, plan):
+        return plan.df[self.nom]
+
+    def sql(self, params):
+        return self.nom
+
+
+@dataclass(frozen=True)
+class Date(Expression):
+    """Colonne convertie en datetime (valeurs invalides -> NaT)."""
+    colonne: str
+
+    def enfants(self):
+        return (Col(self.colonne),)
+
+    def calculer(self, plan):
+        return pd.to_datetime(plan.valeur(Col(self.colonne)), errors='coerce')
+
+    def sql(self, params):
+        return self.colonne  # déjà de type DATE dans PostgreSQL
+
+
+@dataclass(frozen=True)
+class AgeDepuis(Expression):
+    """Âge calculé : année d'exécution - année de la date."""
+    colonne: str
+
+    def enfants(self):
+        return (Date(self.colonne),)
+
+    def calculer(self, plan):
+        return plan.annee - plan.valeur(Date(self.colonne)).dt.year
+
+    def sql(self, params):
+        return f"(:annee - EXTRACT(YEAR FROM {self.colonne}))"
+
+
+@dataclass(frozen=True)
+class CodePostalNettoye(Expression):
+    """Chiffres seuls ; une valeur absente devient une chaîne vide."""
+    colonne: str
+
+    def enfants(self):
+        return (Col(self.colonne),)
+
+    def calculer(self, plan):
+        from motifs import chiffres_seuls
+        valeurs = plan.valeur(Col(self.colonne))
+        propres = chiffres_seuls(valeurs)  # texte : directement sur les octets Arrow
+        if propres is not None:
+            return propres
+        if isinstance(valeurs.dtype, pd.CategoricalDtype):
+            valeurs = valeurs.astype(object)  # '' n'est pas une catégorie existante
+        return valeurs.fillna('').astype(str).str.replace(REGEX_NON_CHIFFRE, '', regex=True)
+
+    def sql(self, params):
+        return f"regexp_replace(COALESCE({self.colonne}, ''), {parametre(params, REGEX_NON_CHIFFRE)}, '', 'g')"
+
+
+def _elargir(serie):
+    """Entiers et réels réduits au chargement repassés sur 64 bits avant un calcul (pas de débordement)."""
+    if pd.api.types.is_integer_dtype(serie):
+        return serie.astype('int64')
+    if pd.api.types.is_float_dtype(serie):
+        return serie.astype('float64')
+    return serie
+
+
+@dataclass(frozen=True)
+class Somme(Expression):
+    gauche: Expression
+    droite: Expression
+
+    def enfants(self):
+        return (self.gauche, self.droite)
+
+    def calculer(self, plan):
+        return _elargir(plan.valeur(self.gauche)) + _elargir(plan.valeur(self.droite))
+
+    def sql(self, params):
+        return f"({self.gauche.sql(params)} + {self.droite.sql(params)})"
+
+
+@dataclass(frozen=True)
+class Ecart(Expression):
+    """Valeur absolue de la différence."""
+    gauche: Expression
+    droite: Expression
+
+    def enfants(self):
+        return (self.gauche, self.droite)
+
+    def calculer(self, plan):
+        return abs(_elargir(plan.valeur(self.gauche)) - _elargir(plan.valeur(self.droite)))
+
+    def sql(self, params):
+        return f"ABS({self.gauche.sql(params)} - {self.droite.sql(params)})"
+
+
+# --- Prédicats (expressions booléennes) ---
+
+@dataclass(frozen=True)
+class NonNul(Expression):
+    expression: Expression
+
+    def enfants(self):
+        return (self.expression,)
+
+    def calculer(self, plan):
+        return plan.valeur(self.expression).notna()
+
+    def sql(self, params):
+        return f"{self.expression.sql(params)} IS NOT NULL"
+
+    def diagnostiquer(self, plan, masque):
+        return np.full(int(masque.sum()), 'valeur manquante', dtype=object)
+
+
+@dataclass(frozen=True)
+class EstNul(Expression):
+    expression: Expression
+
+    def enfants(self):
+        return (self.expression,)
+
+    def calculer(self, plan):
+        return plan.valeur(self.expression).isna()
+
+    def sql(self, params):
+        return f"{self.expression.sql(params)} IS NULL"
+
+    def diagnostiquer(self, plan, masque):
+        return np.full(int(masque.sum()), 'valeur renseignée', dtype=object)
+
+
+@dataclass(frozen=True)
+class Dans(Expression):
+    expression: Expression
+    valeurs: tuple
+
+    def enfants(self):
+        return (self.expression,)
+
+    def calculer(self, plan):
+        return plan.valeur(self.expression).isin(self.valeurs)
+
+    def sql(self, params):
+        marqueurs = ", ".join(parametre(params, v) for v in self.valeurs)
+        return f"{self.expression.sql(params)} IN ({marqueurs})"
+
+    def diagnostiquer(self, plan, masque):
+        valeurs = plan.valeur(self.expression)[masque]
+        return _etiqueter([valeurs.isna()], ['valeur manquante'], 'hors domaine')
+
+
+@dataclass(frozen=True)
+class Plage(Expression):
+    """Bornes incluses ; une borne à None n'est pas contrôlée."""
+    expression: Expression
+    minimum: object = None
+    maximum: object = None
+
+    def enfants(self):
+        return (self.expression,)
+
+    def calculer(self, plan):
+        valeurs = plan.valeur(self.expression)
+        masque = pd.Series(True, index=valeurs.index)
+        if self.minimum is not None:
+            masque &= valeurs >= self.minimum
+        if self.maximum is not None:
+            masque &= valeurs <= self.maximum
+        return masque
+
+    def sql(self, params):
+        expr = self.expression.sql(params)
+        conditions = []
+        if self.minimum is not None:
+            conditions.append(f"{expr} >= {parametre(params, self.minimum)}")
+        if self.maximum is not None:
+            conditions.append(f"{expr} <= {parametre(params, self.maximum)}")
+        return " AND ".join(conditions)
+
+    def diagnostiquer(self, plan, masque):
+        valeurs = plan.valeur(self.expression)[masque]
+        conditions, etiquettes = [valeurs.isna()], ['valeur manquante']
+        if self.minimum is not None:
+            conditions.append(valeurs < self.minimum)
+            etiquettes.append(f"inférieur à {_borne(self.minimum)}")
+        if self.maximum is not None:
+            conditions.append(valeurs > self.maximum)
+            etiquettes.append(f"supérieur à {_borne(self.maximum)}")
+        return _etiqueter(conditions, etiquettes, 'hors plage')
+
+
+@dataclass(frozen=True)
+class VerificationMotif(Expression):
+    """(masque, types d'erreur) d'un motif, calculés ensemble en un passage (voir motifs.py)."""
+    expression: Expression
+    regex: str
+
+    def enfants(self):
+        return (self.expression,)
+
+    def calculer(self, plan):
+        from motifs import verifier
+        return verifier(plan.valeur(self.expression), self.regex)
+
+
+@dataclass(frozen=True)
+class Motif(Expression):
+    """Correspondance regex depuis le début de la valeur (équivalent de str.match avec `re`)."""
+    expression: Expression
+    regex: str
+
+    def verification(self):
+        return VerificationMotif(self.expression, self.regex)
+
+    def enfants(self):
+        return (self.verification(),)
+
+    def calculer(self, plan):
+        masque, _ = plan.valeur(self.verification())
+        return pd.Series(masque, index=plan.df.index)
+
+    def sql(self, params):
+        return f"{self.expression.sql(params)} ~ {parametre(params, self.regex)}"
+
+    def diagnostiquer(self, plan, masque):
+        _, erreurs = plan.valeur(self.verification())
+        return erreurs[np.asarray(masque, dtype=bool)]
+
+
+@dataclass(frozen=True)
+class Compare(Expression):
+    gauche: Expression
+    operateur: str  # '<=' ou '>='
+    droite: Expression
+
+    OPERATEURS = {'<=': operator.le, '>=': operator.ge}
+
+    def enfants(self):
+        return (self.gauche, self.droite)
+
+    def calculer(self, plan):
+        return self.OPERATEURS[self.operateur](plan.valeur(self.gauche), plan.valeur(self.droite))
+
+    def sql(self, params):
+        return f"{self.gauche.sql(params)} {self.operateur} {self.droite.sql(params)}"
+
+    def diagnostiquer(self, plan, masque):
+        manquantes = plan.valeur(self.gauche)[masque].isna() | plan.valeur(self.droite)[masque].isna()
+        return _etiqueter([manquantes], ['valeur manquante'], 'incohérence')
+
+
+@dataclass(frozen=True)
+class Ou(Expression):
+    gauche: Expression
+    droite: Expression
+
+    def enfants(self):
+        return (self.gauche, self.droite)
+
+    def calculer(self, plan):
+        return plan.valeur(self.gauche) | plan.valeur(self.droite)
+
+    def sql(self, params):
+        return f"({self.gauche.sql(params)}) OR ({self.droite.sql(params)})"
+
+    def diagnostiquer(self, plan, masque):
+        # Les deux branches sont fausses ; la première est le cas d'exception (ex. date absente)
+        return self.droite.diagnostiquer(plan, masque)
+
+
+# =========================
+# RÈGLES
+# =========================
+
+@dataclass(frozen=True)
+class Regle:
+    table: str
+    colonne: str  # libellé rapporté dans les métriques
+    pilier: str
+    nom: str
+
+    def expressions(self):
+        """Expressions évaluées sur `self.table`."""
+        return ()
+
+    def cle(self):
+        return (self.table, self.colonne, self.pilier, self.nom)
+
+
+@dataclass(frozen=True)
+class RegleLigne(Regle):
+    """Ligne valide si `predicat` est vrai ; seules les lignes du `domaine` sont comptées."""
+    predicat: Expression
+    domaine: Expression = None
+
+    def expressions(self):
+        return (self.predicat,) if self.domaine is None else (self.domaine, self.predicat)
+
+
+@dataclass(frozen=True)
+class RegleRemplissage(Regle):
+    """Au moins `seuil` des lignes renseignées pour `expression`."""
+    expression: Expression
+    seuil: float
+
+    def expressions(self):
+        return (self.expression,)
+
+
+@dataclass(frozen=True)
+class RegleUnicite(Regle):
+    """Combinaisons distinctes non nulles de `cles` vs nombre de lignes."""
+    cles: tuple
+
+    def expressions(self):
+        return self.cles
+
+
+@dataclass(frozen=True)
+class RegleIntegrite(Regle):
+    """Clé étrangère : `valeur` doit exister dans `reference` de `table_ref`."""
+    valeur: Expression
+    table_ref: str
+    reference: Expression
+
+    def expressions(self):
+        return (self.valeur,)
+
+
+def _ligne(table, colonne, pilier, nom, predicat, domaine=None):
+    return RegleLigne(table, colonne, pilier, nom, predicat, domaine)
+
+
+def _format(table, colonne, nom, regex):
+    return _ligne(table, colonne, 'EXACTITUDE', nom, Motif(Col(colonne), regex), NonNul(Col(colonne)))
+
+
+# Colonnes identifiant une ligne de chaque table (clé des lignes en échec, voir echecs.py)
+CLES_LIGNE = {
+    'staff': ('staff_id',),
+    'patients': ('patient_id',),
+    'consultations': ('patientid', 'consultationdate', 'consultationtime'),
+    'staff_schedule': ('week', 'staff_id'),
+    'services_weekly': ('week', 'service'),
+}
+
+AGE_COHERENT = Plage(Ecart(Col('age'), AgeDepuis('date_naissance')), maximum=1)
+
+# Ordre du registre = ordre des métriques dans les livrables
+REGLES = [
+    # COMPLÉTUDE
+    _ligne('staff', 'staff_id', 'COMPLÉTUDE', 'staff_id_not_null', NonNul(Col('staff_id'))),
+    RegleRemplissage('staff', 'telephone', 'COMPLÉTUDE', 'telephone_70pct_filled',
+                     Col('telephone'), SEUIL_REMPLISSAGE_TELEPHONE),
+    _ligne('patients', 'patient_id', 'COMPLÉTUDE', 'patient_id_not_null', NonNul(Col('patient_id'))),
+    RegleRemplissage('patients', 'telephone', 'COMPLÉTUDE', 'telephone_70pct_filled',
+                     Col('telephone'), SEUIL_REMPLISSAGE_TELEPHONE),
+    _ligne('consultations', 'consultationdate', 'COMPLÉTUDE', 'consultationdate_not_null',
+           NonNul(Col('consultationdate'))),
+    # EXACTITUDE
+    _format('staff', 'telephone', 'telephone_format_FR', REGEX_PHONE_FR),
+    _format('staff', 'email', 'email_format_rfc5322', REGEX_EMAIL),
+    _ligne('staff', 'code_postal', 'EXACTITUDE', 'code_postal_5chiffres_sans0',
+           Motif(CodePostalNettoye('code_postal'), REGEX_POSTAL_FR)),
+    _format('patients', 'telephone', 'telephone_format_FR', REGEX_PHONE_FR),
+    _format('patients', 'email', 'email_format_rfc5322', REGEX_EMAIL),
+    _ligne('patients', 'code_postal', 'EXACTITUDE', 'code_postal_5chiffres_sans0',
+           Motif(CodePostalNettoye('code_postal'), REGEX_POSTAL_FR)),
+    _ligne('staff_schedule', 'present', 'EXACTITUDE', 'present_binary_valid', Dans(Col('present'), (0, 1))),
+    _ligne('staff_schedule', 'week', 'EXACTITUDE', 'week_range_1_52', Plage(Col('week'), 1, 52)),
+    # VALIDITÉ
+    _ligne('staff', 'role', 'VALIDITÉ', 'role_in_allowed_values', Dans(Col('role'), VALID_ROLES)),
+    _ligne('staff', 'service', 'VALIDITÉ', 'service_in_allowed_values', Dans(Col('service'), VALID_SERVICES)),
+    _ligne('staff', 'genre', 'VALIDITÉ', 'genre_in_allowed_values', Dans(Col('genre'), VALID_GENRES)),
+    _ligne('staff', 'age', 'VALIDITÉ', 'age_range_18_75', Plage(Col('age'), 18, 75)),
+    _ligne('patients', 'genre', 'VALIDITÉ', 'genre_in_allowed_values', Dans(Col('genre'), VALID_GENRES)),
+    _ligne('patients', 'satisfaction', 'VALIDITÉ', 'satisfaction_range_0_100', Plage(Col('satisfaction'), 0, 100)),
+    _ligne('patients', 'service', 'VALIDITÉ', 'service_in_allowed_values', Dans(Col('service'), VALID_SERVICES)),
+    _ligne('services_weekly', 'availablebeds', 'VALIDITÉ', 'availablebeds_non_negative',
+           Plage(Col('availablebeds'), minimum=0)),
+    _ligne('services_weekly', 'service', 'VALIDITÉ', 'service_in_allowed_values', Dans(Col('service'), VALID_SERVICES)),
+    # COHÉRENCE
+    _ligne('staff', 'age', 'COHÉRENCE', 'age_date_naissance_coherent', AGE_COHERENT),
+    _ligne('patients', 'departure_date', 'COHÉRENCE', 'departure_after_arrival',
+           Ou(EstNul(Date('departure_date')), Compare(Date('departure_date'), '>=', Date('arrival_date')))),
+    _ligne('patients', 'age', 'COHÉRENCE', 'age_date_naissance_coherent', AGE_COHERENT),
+    _ligne('services_weekly', 'patientsrequest', 'COHÉRENCE', 'admitted_refused_le_requested',
+           Compare(Somme(Col('patientsadmitted'), Col('patientsrefused')), '<=', Col('patientsrequest'))),
+    RegleIntegrite('consultations', 'patientid', 'COHÉRENCE', 'patientid_fk_valid',
+                   Col('patientid'), 'patients', Col('patient_id')),
+    RegleIntegrite('consultations', 'staffid', 'COHÉRENCE', 'staffid_fk_valid',
+                   Col('staffid'), 'staff', Col('staff_id')),
+    # UNICITÉ
+    RegleUnicite('staff', 'staff_id', 'UNICITÉ', 'staff_id_unique', (Col('staff_id'),)),
+    RegleUnicite('patients', 'patient_id', 'UNICITÉ', 'patient_id_unique', (Col('patient_id'),)),
+    RegleUnicite('staff_schedule', 'week,staff_id', 'UNICITÉ', 'week_staff_id_combination_unique',
+                 (Col('week'), Col('staff_id'))),
+    RegleUnicite('consultations', 'patientid,consultationdate,consultationtime', 'UNICITÉ',
+                 'patient_consultation_unique',
+                 (Col('patientid'), Date('consultationdate'), Col('consultationtime'))),
+    # ACTUALITÉ
+    _ligne('patients', 'arrival_date', 'ACTUALITÉ', 'arrival_date_since_2020',
+           Plage(Date('arrival_date'), minimum=DATE_ACTUALITE)),
+]
+
+
+# =========================
+# PLANIFICATION
+# =========================
+
+def _sans_accents(texte):
+    return unicodedata.normalize('NFKD', texte).encode('ascii', 'ignore').decode().lower()
+
+
+def selectionner(regles, tables=None, piliers=None, noms=None):
+    """Règles retenues par les filtres (None = pas de filtre), dans l'ordre du registre.
+
+    Piliers sans tenir compte de la casse ni des accents (« unicite ») ; règles par
+    nom (« telephone_70pct_filled », toutes tables) ou par « table.nom ». Un filtre
+    qui ne correspond à aucune règle lève ValueError.
+    """
+    filtres = {
+        'table inconnue': (tables, lambda r: {r.table}, str),
+        'pilier inconnu': (piliers, lambda r: {r.pilier}, _sans_accents),
+        'règle inconnue': (noms, lambda r: {r.nom, f"{r.table}.{r.nom}"}, str),
+    }
+    retenues = list(regles)
+    for libelle, (valeurs, identifiants, normaliser) in filtres.items():
+        if not valeurs:
+            continue
+        valeurs = {normaliser(v) for v in valeurs}
+        connues = set().union(*(map(normaliser, identifiants(r)) for r in regles))
+        inconnues = valeurs - connues
+        if inconnues:
+            raise ValueError(f"{libelle} : {', '.join(sorted(inconnues))}")
+        retenues = [r for r in retenues if valeurs & set(map(normaliser, identifiants(r)))]
+    if not retenues:
+        raise ValueError("aucune règle ne correspond à la sélection")
+    return retenues
+
+
+def expressions_par_table(regles):
+    """{table: [expressions racines]} ; inclut les colonnes de référence des clés étrangères."""
+    par_table = {}
+    for regle in regles:
+        par_table.setdefault(regle.table, []).extend(regle.expressions())
+        if isinstance(regle, RegleIntegrite):
+            par_table.setdefault(regle.table_ref, []).append(regle.reference)
+    return par_table
+
+
+def colonnes_requises(regles):
+    """{table: colonnes à charger} : les colonnes non référencées ne sont pas lues.
+
+    Les colonnes de `CLES_LIGNE` sont toujours lues pour identifier les lignes en échec.
+    """
+    return {
+        table: sorted(set(CLES_LIGNE.get(table, ())).union(*(e.colonnes() for e in expressions)))
+        for table, expressions in expressions_par_table(regles).items()
+    }
+
+
+def planifier(regles):
+    """{table: colonnes dérivées distinctes}, dans l'ordre où elles seront calculées."""
+    def parcourir(expression, vues):
+        for enfant in expression.enfants():
+            parcourir(enfant, vues)
+        if not isinstance(expression, Col):
+            vues.setdefault(expression, None)
+
+    plan = {}
+    for table, expressions in expressions_par_table(regles).items():
+        vues = {}
+        for expression in expressions:
+            parcourir(expression, vues)
+        plan[table] = list(vues)
+    return plan
+
+
+class PlanCalcul:
+    """Évalue les expressions sur un DataFrame ; chaque expression n'est calculée qu'une fois."""
+
+    def __init__(self, df, annee):
+        self.df = df
+        self.annee = annee
+        self._cache = {}
+
+    def valeur(self, expression):
+        if expression not in self._cache:
+            self._cache[expression] = expression.calculer(self)
+        return self._cache[expression]
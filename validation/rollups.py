@@ -0,0 +1,75 @@
+"""
+Agrégats pré-calculés pour les tableaux de bord Superset.
+
+Trois tables typées et indexées (définies dans db-init/01_schema.sql) sont
+tenues à jour à chaque exécution, dans la transaction qui charge l'historique :
+seules les lignes des exécutions et des jours concernés sont recalculées.
+
+    - validation_rollup_run_pilier : exécution × pilier (onglet Overview),
+    - validation_rollup_run_table  : exécution × table (filtres par table),
+    - validation_rollup_jour_regle : jour × règle (Trends over time, Detailed Analysis).
+"""
+
+from datetime import timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+# Taux pondéré (somme des succès / somme des contrôles) et moyenne des taux par règle
+_TAUX = """ROUND(COALESCE(100.0 * SUM(checks_passed) / NULLIF(SUM(checks_passed + checks_failed), 0), 0), 2),
+       ROUND(AVG(success_rate), 2)"""
+
+SQL_RUN_PILIER = f"""
+INSERT INTO validation_rollup_run_pilier
+    (run_date, pilier, nb_regles, checks_passed, checks_failed, pct_succes, pct_moyen)
+SELECT run_date, pilier, COUNT(*), SUM(checks_passed), SUM(checks_failed),
+       {_TAUX}
+FROM validation_history
+WHERE run_date = ANY(CAST(:runs AS timestamp[]))
+GROUP BY run_date, pilier
+ON CONFLICT (run_date, pilier) DO UPDATE SET
+    nb_regles = EXCLUDED.nb_regles, checks_passed = EXCLUDED.checks_passed,
+    checks_failed = EXCLUDED.checks_failed, pct_succes = EXCLUDED.pct_succes,
+    pct_moyen = EXCLUDED.pct_moyen
+"""
+
+SQL_RUN_TABLE = f"""
+INSERT INTO validation_rollup_run_table
+    (run_date, table_name, nb_regles, checks_passed, checks_failed, pct_succes, pct_moyen)
+SELECT run_date, table_name, COUNT(*), SUM(checks_passed), SUM(checks_failed),
+       {_TAUX}
+FROM validation_history
+WHERE run_date = ANY(CAST(:runs AS timestamp[]))
+GROUP BY run_date, table_name
+ON CONFLICT (run_date, table_name) DO UPDATE SET
+    nb_regles = EXCLUDED.nb_regles, checks_passed = EXCLUDED.checks_passed,
+    checks_failed = EXCLUDED.checks_failed, pct_succes = EXCLUDED.pct_succes,
+    pct_moyen = EXCLUDED.pct_moyen
+"""
+
+# Plage [debut, fin) plutôt que run_date::date : l'index sur run_date reste utilisable
+SQL_JOUR_REGLE = f"""
+INSERT INTO validation_rollup_jour_regle
+    (jour, table_name, column_name, pilier, rule_name,
+     nb_runs, checks_passed, checks_failed, pct_succes, pct_moyen, pct_min)
+SELECT CAST(:debut AS date), table_name, column_name, pilier, rule_name,
+       COUNT(*), SUM(checks_passed), SUM(checks_failed),
+       {_TAUX},
+       MIN(success_rate)
+FROM validation_history
+WHERE run_date >= :debut AND run_date < :fin
+GROUP BY table_name, column_name, pilier, rule_name
+ON CONFLICT (jour, table_name, column_name, pilier, rule_name) DO UPDATE SET
+    nb_runs = EXCLUDED.nb_runs, checks_passed = EXCLUDED.checks_passed,
+    checks_failed = EXCLUDED.checks_failed, pct_succes = EXCLUDED.pct_succes,
+    pct_moyen = EXCLUDED.pct_moyen, pct_min = EXCLUDED.pct_min
+"""
+
+
+def rafraichir_rollups(conn, runs):
+    """Recalcule les agrégats des exécutions `runs` et de leurs jours (dans la transaction de `conn`)."""
+    runs = sorted({str(r) for r in runs})
+    conn.execute(text(SQL_RUN_PILIER), {'runs': runs})
+    conn.execute(text(SQL_RUN_TABLE), {'runs': runs})
+    for jour in sorted({pd.Timestamp(r).date() for r in runs}):
+        conn.execute(text(SQL_JOUR_REGLE), {'debut': jour, 'fin': jour + timedelta(days=1)})
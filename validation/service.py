@@ -0,0 +1,213 @@
+"""
+Mode service de la validation.
+
+Le processus reste en vie entre deux exécutions : engine et pool de
+connexions, registre des règles et index des clés référencées restent en
+mémoire. Les triggers des tables `*_raw` (db-init/01_schema.sql) émettent une
+notification `NOTIFY` à chaque modification. Le service ne réévalue alors que
+les unités (voir executeur.py) qui lisent une table modifiée. Les résultats des
+autres unités sont repris tels quels.
+
+Un petit serveur HTTP local expose les dernières métriques :
+  - GET /metrics : métriques de la dernière exécution (JSON) ;
+  - GET /health : état du service et date de la dernière exécution ;
+  - POST /refresh?tables=staff,patients : demande une réévaluation (toutes les
+    tables sans paramètre). Remplace LISTEN/NOTIFY hors PostgreSQL.
+"""
+
+import json
+import os
+import queue
+import select
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from regles import RegleIntegrite
+
+# Adresse du serveur HTTP, canal des notifications, délai de regroupement des modifications (s)
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
+SERVICE_CHANNEL = os.getenv("SERVICE_CHANNEL", "dq_raw_changes")
+SERVICE_DEBOUNCE = float(os.getenv("SERVICE_DEBOUNCE", "2"))
+
+
+def tables_lues(regles):
+    """Tables parcourues par un ensemble de règles (clés étrangères : les deux tables)."""
+    return {t for regle in regles for t in (regle.table, getattr(regle, 'table_ref', None)) if t}
+
+
+def cles_referencees(regles):
+    """Index de clés référencés par les clés étrangères : (table, expressions)."""
+    return [(regle.table_ref, (regle.reference,)) for regle in regles if isinstance(regle, RegleIntegrite)]
+
+
+class Ecouteur:
+    """LISTEN sur une connexion dédiée ; `attendre` renvoie les tables notifiées."""
+
+    def __init__(self, engine, canal=SERVICE_CHANNEL):
+        self.connexion = engine.raw_connection()
+        self.pg = self.connexion.driver_connection
+        self.pg.autocommit = True
+        with self.pg.cursor() as curseur:
+            curseur.execute(f"LISTEN {canal}")
+
+    def attendre(self, delai):
+        if select.select([self.pg], [], [], delai) == ([], [], []):
+            return set()
+        self.pg.poll()
+        tables = {notification.payload for notification in self.pg.notifies}
+        self.pg.notifies.clear()
+        return tables
+
+    def fermer(self):
+        self.connexion.close()
+
+
+class _Requetes(BaseHTTPRequestHandler):
+    service = None
+
+    def _repondre(self, code, contenu):
+        corps = json.dumps(contenu, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def do_GET(self):
+        chemin = urlparse(self.path).path
+        if chemin == "/metrics":
+            self._repondre(200, self.service.etat(metriques=True))
+        elif chemin == "/health":
+            self._repondre(200, self.service.etat())
+        else:
+            self._repondre(404, {'erreur': f"chemin inconnu : {chemin}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/refresh":
+            self._repondre(404, {'erreur': f"chemin inconnu : {url.path}"})
+            return
+        tables = {t for valeur in parse_qs(url.query).get('tables', []) for t in valeur.split(',') if t}
+        inconnues = tables - set(self.service.tables_raw)
+        if inconnues:
+            self._repondre(400, {'erreur': f"tables inconnues : {', '.join(sorted(inconnues))}"})
+            return
+        self.service.demandes.put(tables or set(self.service.tables_raw))
+        self._repondre(202, {'tables': sorted(tables or self.service.tables_raw)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ServiceValidation:
+    """Exécutions successives par unités, déclenchées par notification ou requête HTTP.
+
+    `executer(unite, references)` évalue une unité en réutilisant les index de clés
+    `references` ({(table, expressions): IndexCles}) ; renvoie (résultat, index
+    référencés construits). `publier(resultats, executees)` fusionne les résultats
+    de toutes les unités [(nom, résultat, durée)] et renvoie le DataFrame des métriques.
+    `demarrer()` est appelé au début de chaque exécution (date d'exécution).
+    """
+
+    def __init__(self, unites, tables_raw, executer, publier, demarrer=None):
+        self.unites = unites
+        self.tables_raw = tables_raw
+        self.executer = executer
+        self.publier = publier
+        self.demarrer = demarrer
+        self.resultats = {}   # unité -> (résultat, durée)
+        self.references = {}  # (table, expressions) -> IndexCles des clés référencées
+        self.demandes = queue.Queue()
+        self.verrou = threading.Lock()
+        self.metriques = None
+        self.derniere_execution = None
+        self.executions = 0
+
+    def etat(self, metriques=False):
+        with self.verrou:
+            contenu = {
+                'statut': 'pret' if self.metriques is not None else 'demarrage',
+                'derniere_execution': self.derniere_execution,
+                'executions': self.executions,
+            }
+            if metriques:
+                contenu['metriques'] = [] if self.metriques is None else self.metriques.to_dict('records')
+        return contenu
+
+    def rafraichir(self, modifiees):
+        """Réévalue les unités qui lisent une table de `modifiees`, puis publie."""
+        debut = time.perf_counter()
+        if self.demarrer is not None:
+            self.demarrer()
+        a_executer = [u for u in self.unites if u[0] not in self.resultats or tables_lues(u[1]) & modifiees]
+        print(f"\n🔄 TABLES MODIFIÉES : {', '.join(sorted(modifiees))} → {len(a_executer)} unité(s) sur {len(self.unites)}")
+        for cle in list(self.references):
+            if cle[0] in modifiees:
+                del self.references[cle]
+        # Une unité en erreur reste sans résultat : elle est réévaluée à l'exécution suivante
+        for nom, _ in a_executer:
+            self.resultats.pop(nom, None)
+        for nom, regles in a_executer:
+            references = {cle: self.references[cle] for cle in cles_referencees(regles) if cle in self.references}
+            debut_unite = time.perf_counter()
+            resultat, construits = self.executer((nom, regles), references)
+            self.resultats[nom] = (resultat, time.perf_counter() - debut_unite)
+            self.references.update(construits)
+            print(f"  ⏱️  {nom:40} : {self.resultats[nom][1]:7.2f} s"
+                  f"{' (index de clés réutilisé)' if references else ''}")
+
+        resultats = [(nom, *self.resultats[nom]) for nom, _ in self.unites]
+        df_metriques = self.publier(resultats, {nom for nom, _ in a_executer})
+        with self.verrou:
+            self.metriques = df_metriques
+            self.derniere_execution = df_metriques['run_date'].iloc[0] if len(df_metriques) else None
+            self.executions += 1
+        print(f"  ✓ Métriques à jour en {time.perf_counter() - debut:.2f} s")
+
+    def servir(self, engine, host=SERVICE_HOST, port=SERVICE_PORT, delai=SERVICE_DEBOUNCE):
+        """Exécution complète, puis attente des modifications jusqu'à interruption."""
+        _Requetes.service = self
+        serveur = ThreadingHTTPServer((host, port), _Requetes)
+        threading.Thread(target=serveur.serve_forever, daemon=True).start()
+        print(f"\n🛰️  SERVICE DE VALIDATION : http://{host}:{port}/metrics")
+
+        alias = {table_name: a for a, table_name in self.tables_raw.items()}
+        ecouteur = Ecouteur(engine) if engine.dialect.name == "postgresql" else None
+        if ecouteur is not None:
+            print(f"  ✓ Écoute des notifications sur le canal {SERVICE_CHANNEL}")
+        try:
+            self.rafraichir(set(self.tables_raw))
+            while True:
+                modifiees = self._attendre(ecouteur, alias, 0.5)
+                if not modifiees:
+                    continue
+                # Regroupe les modifications rapprochées (COPY par blocs, plusieurs connexions)
+                limite = time.monotonic() + delai
+                while (reste := limite - time.monotonic()) > 0:
+                    modifiees |= self._attendre(ecouteur, alias, reste)
+                try:
+                    self.rafraichir(modifiees)
+                except Exception as e:
+                    print(f"  ❌ Exécution en erreur : {e}")
+        except KeyboardInterrupt:
+            print("\n🛑 Arrêt du service")
+        finally:
+            serveur.shutdown()
+            if ecouteur is not None:
+                ecouteur.fermer()
+
+    def _attendre(self, ecouteur, alias, delai):
+        modifiees = set()
+        while not self.demandes.empty():
+            modifiees |= self.demandes.get_nowait()
+        if modifiees:
+            return modifiees
+        if ecouteur is None:
+            try:
+                return self.demandes.get(timeout=delai)
+            except queue.Empty:
+                return set()
+        return {alias[t] for t in ecouteur.attendre(delai) if t in alias}
@@ -0,0 +1,49 @@
+"""Les modules de la validation s'importent entre eux par leur nom (PYTHONPATH du Dockerfile).
+
+Les tests du backend SQL utilisent TEST_DATABASE_URL (schéma jetable), sinon une
+base PostgreSQL embarquée (paquet `pgserver`) ; ils sont ignorés si aucune n'est
+disponible.
+"""
+
+import os
+import re
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+RACINE = Path(__file__).resolve().parents[2]
+for dossier in (RACINE / "validation", RACINE / "commun"):
+    if str(dossier) not in sys.path:
+        sys.path.insert(0, str(dossier))
+
+
+@pytest.fixture(scope="session")
+def postgres():
+    """Engine PostgreSQL dont le schéma courant contient les tables *_raw de db-init, vides."""
+    from sqlalchemy import create_engine, text
+
+    serveur = None
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pgserver = pytest.importorskip("pgserver", reason="TEST_DATABASE_URL ou pgserver requis")
+        serveur = pgserver.get_server(tempfile.mkdtemp(prefix="dq_test_pgdata_"), cleanup_mode="delete")
+        url = serveur.get_uri().replace("postgresql://", "postgresql+psycopg2://", 1)
+    schema = f"test_{uuid.uuid4().hex[:8]}"
+    with create_engine(url).begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_engine(url, connect_args={'options': f"-csearch_path={schema}"})
+    ddl = (RACINE / "db-init" / "01_schema.sql").read_text(encoding='utf-8')
+    with engine.begin() as conn:
+        for table in re.findall(r"CREATE TABLE IF NOT EXISTS \w+_raw \(.*?\);", ddl, re.S):
+            conn.execute(text(table))
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+        with create_engine(url).begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        if serveur is not None:
+            serveur.cleanup()
@@ -0,0 +1,42 @@
+"""Unicité d'une clé dont les copies tombent dans des blocs de types différents."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import validation
+from cles import hacher
+from regles import REGLES, PlanCalcul
+
+REGLE = next(r for r in REGLES if r.nom == 'week_staff_id_combination_unique')
+
+# (5, 'S1') en double, réparti sur deux blocs : le NULL du second bloc le passe en float64,
+# la réduction des entiers laisse le premier en int8
+STAFF_SCHEDULE = pd.DataFrame({'week': [5, 6, 5, None], 'staff_id': ['S1', 'S2', 'S1', 'S2']})
+BLOCS = [
+    pd.DataFrame({'week': pd.Series([5, 6], dtype='int8'), 'staff_id': ['S1', 'S2']}),
+    pd.DataFrame({'week': pd.Series([5, None], dtype='float64'), 'staff_id': ['S1', 'S2']},
+                 index=[2, 3]),
+]
+
+
+def unicite(blocs):
+    metriques = validation.ValidationMetriques()
+    for bloc in blocs:
+        validation.evaluer_regle(REGLE, {'staff_schedule': PlanCalcul(bloc, 2025)}, metriques)
+    ligne = metriques.metriques[0]
+    return ligne['checks_passed'], ligne['total_expectations']
+
+
+@pytest.mark.parametrize('approx', [False, True])
+def test_doublon_reparti_sur_deux_blocs(monkeypatch, approx):
+    monkeypatch.setattr(validation, 'VALIDATION_APPROX', approx)
+    assert unicite([STAFF_SCHEDULE]) == (2, 4)
+    assert unicite(BLOCS) == (2, 4)
+
+
+@pytest.mark.parametrize('type_colonne', ['int8', 'int16', 'int64', 'Int64', 'float32', 'float64'])
+def test_hachage_independant_du_type(type_colonne):
+    reference = hacher([pd.Series([-1, 5], dtype='float64'), pd.Series(['a', 'b'])])
+    valeurs = hacher([pd.Series([-1, 5], dtype=type_colonne), pd.Series(['a', 'b'], dtype='category')])
+    np.testing.assert_array_equal(valeurs, reference)
@@ -0,0 +1,44 @@
+"""Reconstruction de l'état des dérives (`--drift-backfill`)."""
+
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+import validation
+from derive import charger_etat, reconstruire
+
+HISTORIQUE_CSV = Path(__file__).resolve().parents[2] / "results" / "validation_history.csv"
+
+
+def dossiers(monkeypatch, resultats):
+    monkeypatch.setattr(validation, 'RESULTS_DIR', resultats)
+    monkeypatch.setattr(validation, 'HISTORY_DIR', resultats / "history")
+    monkeypatch.setattr(validation, 'DRIFT_STATE', resultats / "drift_state.parquet")
+
+
+def test_backfill_depuis_le_csv_seul(monkeypatch, tmp_path):
+    shutil.copy(HISTORIQUE_CSV, tmp_path / "validation_history.csv")
+    dossiers(monkeypatch, tmp_path)
+
+    assert validation.main(['--drift-backfill']) == 0
+
+    historique = pd.read_csv(HISTORIQUE_CSV)
+    historique = historique[historique['total_expectations'] > 0]
+    etat = charger_etat(tmp_path / "drift_state.parquet")
+    assert len(etat) == len(historique.groupby(['table_name', 'column_name', 'pilier', 'rule_name']))
+    assert etat['n'].sum() == len(historique)
+    assert etat['derniere_execution'].max() == pd.to_datetime(historique['run_date']).max()
+
+
+def test_backfill_sans_historique(monkeypatch, tmp_path):
+    dossiers(monkeypatch, tmp_path)
+
+    assert validation.main(['--drift-backfill']) == 0
+    assert not (tmp_path / "drift_state.parquet").exists()
+
+
+def test_reconstruire_historique_vide():
+    etat, scores = reconstruire(pd.DataFrame(columns=['run_date', 'table_name', 'column_name', 'pilier',
+                                                      'rule_name', 'success_rate', 'total_expectations']))
+    assert etat.empty and scores.empty
@@ -0,0 +1,22 @@
+"""Justesse de l'HyperLogLog entre le comptage linéaire et l'estimateur brut."""
+
+import numpy as np
+import pytest
+
+from esquisses import HyperLogLog
+
+
+@pytest.mark.parametrize('facteur', [2.5, 3, 4])
+def test_hyperloglog_sans_biais_autour_de_3m(facteur):
+    m = len(HyperLogLog().registres)
+    n = int(facteur * m)
+    erreurs = []
+    for graine in range(10):
+        esquisse = HyperLogLog()
+        esquisse.ajouter(np.random.default_rng(graine).integers(0, 2 ** 64, n, dtype=np.uint64))
+        erreurs.append(esquisse.estimer() / n - 1)
+    assert abs(np.mean(erreurs)) <= esquisse.erreur_relative()
+
+
+def test_hyperloglog_vide():
+    assert HyperLogLog().estimer() == 0.0
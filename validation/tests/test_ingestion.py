@@ -0,0 +1,17 @@
+"""Lecture des CSV en mode ingest : mêmes NULL que COPY ... CSV, hors champ vide entre guillemets."""
+
+import pandas as pd
+
+from ingestion import lire_csv
+
+
+def test_seuls_les_champs_vides_sont_nuls(tmp_path):
+    chemin = tmp_path / "staff.csv"
+    chemin.write_text('id,nom,service\n1,NA,NULL\n2,,nan\n3,"",None\n', encoding='utf-8')
+
+    bloc = pd.concat(lire_csv(chemin, ['staff_id', 'name', 'service'], 2))
+
+    assert bloc['name'].tolist()[0] == 'NA'
+    assert bloc['service'].tolist() == ['NULL', 'nan', 'None']
+    # Champ vide, avec ou sans guillemets : NULL (COPY garderait "" comme chaîne vide)
+    assert bloc['name'].iloc[1:].isna().all()
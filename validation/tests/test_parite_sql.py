@@ -0,0 +1,109 @@
+"""Parité des backends : mêmes checks_passed / checks_failed en pandas et en SQL (moteur_sql).
+
+Chaque table contient les cas limites des règles : NULL, motifs non conformes,
+valeurs hors domaine ou hors plage, dates inversées, admis + refusés > demandes,
+clés orphelines ou en double.
+"""
+
+from datetime import date, time
+
+import pandas as pd
+import pytest
+
+import validation
+from moteur_sql import valider_en_sql, verifier_parite
+from regles import REGLES, colonnes_requises
+
+NUL = None
+
+TABLES = {
+    'staff_raw': pd.DataFrame({
+        'staff_id': ['S1', 'S1', NUL, 'S2', 'S3'],
+        'staff_name': ['A', 'B', 'C', 'D', 'E'],
+        'role': ['doctor', 'nurse', 'chef', NUL, 'nursing_assistant'],
+        'service': ['ICU', 'surgery', 'icu', NUL, 'pediatrics'],
+        'adresse_postale': ['1 rue A', NUL, '2 rue B', '3 rue C', '4 rue D'],
+        'code_postal': ['75001', '07500', '75 001', NUL, '7500A'],
+        'genre': ['Male', 'male', NUL, 'Other', 'Female'],
+        'date_naissance': [date(1980, 5, 1), NUL, date(2000, 1, 1), date(1950, 12, 31), date(1990, 6, 15)],
+        'age': [45.0, 17.0, NUL, 80.5, 30.0],
+        'telephone': ['01 23 45 67 89', '0123456789', NUL, '+33 1 23 45 67 89', '12345'],
+        'email': ['a@b.fr', 'bad@', NUL, 'x.y@z.com', 'a@b.c'],
+        'departement': ['75', '13', NUL, '69', '33'],
+    }),
+    'patients_raw': pd.DataFrame({
+        'patient_id': ['P1', 'P2', 'P2', NUL, 'P3'],
+        'name': ['A', 'B', 'C', 'D', 'E'],
+        'age': [30.0, 200.0, NUL, 5.0, 40.0],
+        'arrival_date': [date(2019, 12, 31), date(2024, 1, 1), NUL, date(2021, 1, 1), date(2020, 1, 1)],
+        'departure_date': [date(2019, 12, 1), NUL, date(2022, 1, 1), date(2021, 1, 1), date(2020, 1, 2)],
+        'service': ['ICU', 'Emergency', NUL, 'cardiology', 'neurology'],
+        'satisfaction': [-1.0, 50.0, 100.5, NUL, 100.0],
+        'adresse_postale': ['1 rue A', '2 rue B', NUL, '3 rue C', '4 rue D'],
+        'code_postal': ['13001', '1300', NUL, '99999', '01000'],
+        'genre': ['Female', 'F', NUL, 'Other', 'Male'],
+        'date_naissance': [date(1995, 1, 1), date(1990, 1, 1), date(2000, 1, 1), NUL, date(1985, 3, 3)],
+        'telephone': [NUL, NUL, '0033123456789', '01 23 45 67 8', '+33612345678'],
+        'email': ['p@q.fr', 'p q@r.fr', NUL, 'p@q', 'P.Q@R.ORG'],
+        'numero_dossier_medical': ['MRN-12345', 'MRN12345', NUL, 'MRN-1234', 'MRN-54321'],
+    }),
+    'consultations_raw': pd.DataFrame({
+        'patientid': ['P1', 'P9', NUL, 'P1', 'P2'],
+        'staffid': ['S1', 'S9', NUL, 'S2', NUL],
+        'consultationdate': [date(2024, 1, 1), date(2024, 1, 2), NUL, date(2024, 1, 1), date(2024, 1, 3)],
+        'consultationtime': [time(9, 0), time(10, 30), NUL, time(9, 0), NUL],
+        'description': ['a', NUL, 'c', 'd', 'e'],
+    }),
+    'staff_schedule_raw': pd.DataFrame({
+        'week': [5, 6, 5, NUL, 53, 0],
+        'staff_id': ['S1', 'S2', 'S1', 'S2', 'S3', NUL],
+        'staff_name': ['A', 'D', 'A', 'D', 'E', NUL],
+        'role': ['doctor'] * 6,
+        'service': ['ICU'] * 6,
+        'present': [1, 0, 2, NUL, 1, 0],
+    }, dtype=object),
+    'services_weekly_raw': pd.DataFrame({
+        'week': [1, 2, 3, 4, 5],
+        'month': [1, 1, 1, 1, 2],
+        'service': ['ICU', 'surgery', 'unknown', NUL, 'cardiology'],
+        'availablebeds': [-1, 0, 10, NUL, 5],
+        'patientsrequest': [10, 10, NUL, 5, 0],
+        'patientsadmitted': [5, 8, 3, NUL, 0],
+        'patientsrefused': [5, 3, 1, 1, NUL],
+        'patientsatisfaction': [80, 70, NUL, 60, 50],
+        'staffmorale': [70, 60, 50, NUL, 40],
+        'event': ['none', 'flu', NUL, 'none', 'strike'],
+    }, dtype=object),
+}
+
+
+@pytest.fixture(scope="module")
+def base(postgres):
+    for table, df in TABLES.items():
+        df.to_sql(table, postgres, if_exists='append', index=False)
+    return postgres
+
+
+def metriques_sql(engine):
+    metriques = validation.ValidationMetriques()
+    valider_en_sql(engine, metriques, validation.TABLES_RAW, validation.RUN_DATE.year, REGLES)
+    return metriques.to_dataframe()
+
+
+@pytest.mark.parametrize('types', ['compact', 'default'])
+def test_parite_memoire(monkeypatch, base, types):
+    monkeypatch.setattr(validation, 'VALIDATION_DTYPES', types)
+    metriques = validation.ValidationMetriques()
+    validation.executer_piliers(validation.charger_donnees(base, colonnes_requises(REGLES)), metriques)
+    df_pandas = metriques.to_dataframe()
+
+    assert verifier_parite(df_pandas, metriques_sql(base)) == []
+    # Le jeu de données fait échouer chaque règle au moins une fois
+    assert len(df_pandas) == len(REGLES) and (df_pandas['checks_failed'] > 0).all()
+
+
+def test_parite_streaming(base):
+    metriques = validation.ValidationMetriques()
+    validation.valider_en_streaming(base, metriques, 2)
+
+    assert verifier_parite(metriques.to_dataframe(), metriques_sql(base)) == []
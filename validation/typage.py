@@ -0,0 +1,77 @@
+"""
+Typage compact des tables chargées.
+
+Les types cibles sont déduits de information_schema (dates, entiers, réels,
+texte) puis des données : texte à faible cardinalité en catégorie, autre texte
+en chaînes Arrow, entiers réduits au plus petit type suffisant, réels en
+float32 quand la conversion est sans perte, dates analysées dès le chargement.
+Toutes les conversions conservent les valeurs : les règles donnent les mêmes
+résultats qu'avec les types par défaut.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+# Texte converti en catégorie si au plus MAX_CATEGORIES valeurs distinctes (et au plus une ligne sur deux)
+MAX_CATEGORIES = int(os.getenv("MAX_CATEGORIES", "64"))
+
+TYPES_DATE = {'date', 'timestamp without time zone', 'timestamp with time zone'}
+# Chaînes Arrow à valeur manquante NaN, comme le type objet (pandas >= 2.3)
+TYPE_TEXTE = pd.StringDtype("pyarrow", na_value=np.nan)
+
+
+def lire_types(engine, table_name):
+    """{colonne: type SQL} ; vide hors PostgreSQL (typage déduit des données seules)."""
+    if engine.dialect.name != "postgresql":
+        return {}
+    with engine.connect() as conn:
+        return dict(conn.execute(text(
+            "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = :table"
+        ), {'table': table_name}).all())
+
+
+def _reel_compact(serie):
+    reduite = serie.astype('float32')
+    sans_perte = (reduite.astype('float64') == serie) | serie.isna()
+    return reduite if sans_perte.all() else serie
+
+
+def _texte_compact(serie):
+    distinctes = serie.nunique()
+    if distinctes <= MAX_CATEGORIES and distinctes * 2 <= len(serie):
+        return serie.astype('category')
+    return serie.astype(TYPE_TEXTE)
+
+
+def typer(df, types_sql):
+    """Convertit chaque colonne de `df` (en place) vers son type compact."""
+    for colonne in df.columns:
+        serie = df[colonne]
+        if types_sql.get(colonne) in TYPES_DATE:
+            df[colonne] = pd.to_datetime(serie, errors='coerce')
+        elif pd.api.types.is_bool_dtype(serie):
+            continue
+        elif pd.api.types.is_integer_dtype(serie):
+            df[colonne] = pd.to_numeric(serie, downcast='integer')
+        elif pd.api.types.is_float_dtype(serie):
+            df[colonne] = _reel_compact(serie)
+        elif pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            # Objets Python non textuels (heures, décimaux) : laissés tels quels
+            if pd.api.types.infer_dtype(serie, skipna=True) == 'string':
+                df[colonne] = _texte_compact(serie)
+    return df
+
+
+def memoire(df):
+    """Empreinte mémoire en octets, chaînes comprises."""
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def formater_octets(n):
+    for unite in ("o", "Ko", "Mo", "Go"):
+        if n < 1024 or unite == "Go":
+            return f"{n:,.1f} {unite}"
+        n /= 1024